@@ -0,0 +1,25 @@
+# backend/admin.py
+"""Admin-only access for operational endpoints: callers must send X-Admin-Token equal to
+the ADMIN_TOKEN env var. With ADMIN_TOKEN unset, admin endpoints are disabled."""
+import os
+import hmac
+from functools import wraps
+from flask import request, jsonify
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+ADMIN_HEADER = "X-Admin-Token"
+
+def is_admin(req=None) -> bool:
+    req = req or request
+    if not ADMIN_TOKEN:
+        return False
+    supplied = req.headers.get(ADMIN_HEADER, "")
+    return hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode())
+
+def admin_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_admin():
+            return jsonify({"error": "Admin access required"}), 403
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,147 @@
+# backend/admission.py
+"""
+Admission control for /predict_all:
+
+- AdmissionController: bounded number of in-flight predictions. A request waits at most
+  `max_queue_wait_s` for a slot, then is shed (the route answers 503 + Retry-After).
+- TokenBucketLimiter: in-memory per-client rate limiting (429 + Retry-After), keyed on
+  the client address or an authenticated identity, never on a body field.
+
+Both take an injectable `clock` so their behaviour is deterministic under test.
+"""
+import os
+import math
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Any, Hashable, Optional, Tuple
+
+Clock = Callable[[], float]
+
+# ---------------------------------------------------------------------
+# Bounded in-flight limit with queue-wait accounting
+# ---------------------------------------------------------------------
+class AdmissionController:
+    def __init__(self, max_in_flight: int, max_queue_wait_s: float = 0.1,
+                 retry_after_s: int = 1, clock: Clock = time.monotonic, window: int = 1024):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be >= 1")
+        self.max_in_flight = max_in_flight
+        self.max_queue_wait_s = max_queue_wait_s
+        self.retry_after_s = retry_after_s
+        self._clock = clock
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._admitted = 0
+        self._shed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_waits = deque(maxlen=window)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Try to take a slot, waiting up to `timeout` (default: max_queue_wait_s).
+        Returns False when the request should be shed."""
+        timeout = self.max_queue_wait_s if timeout is None else timeout
+        start = self._clock()
+        ok = self._slots.acquire(timeout=timeout) if timeout > 0 else self._slots.acquire(blocking=False)
+        waited = max(0.0, self._clock() - start)
+        with self._lock:
+            if ok:
+                self._in_flight += 1
+                self._admitted += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+                self._recent_waits.append(waited)
+            else:
+                self._shed += 1
+        return ok
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._recent_waits)
+            pct = lambda q: round(waits[min(len(waits) - 1, int(q * len(waits)))] * 1000, 3) if waits else 0.0
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self._in_flight,
+                "admitted": self._admitted,
+                "shed": self._shed,
+                "queue_wait_ms": {
+                    "mean": round(self._wait_total / self._admitted * 1000, 3) if self._admitted else 0.0,
+                    "p50": pct(0.50),
+                    "p99": pct(0.99),
+                    "max": round(self._wait_max * 1000, 3),
+                },
+            }
+
+# ---------------------------------------------------------------------
+# Per-key token bucket
+# ---------------------------------------------------------------------
+class TokenBucketLimiter:
+    def __init__(self, rate_per_s: float, burst: float, clock: Clock = time.monotonic, max_keys: int = 10000):
+        if rate_per_s <= 0 or burst < 1:
+            raise ValueError("rate_per_s must be > 0 and burst >= 1")
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self._clock = clock
+        self._max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._limited = 0
+
+    def allow(self, key: Hashable, cost: float = 1.0) -> Tuple[bool, float]:
+        """Consume `cost` tokens for `key`. Returns (allowed, retry_after_seconds)."""
+        now = self._clock()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate_per_s)
+            if tokens >= cost:
+                tokens -= cost
+                allowed, retry_after = True, 0.0
+            else:
+                allowed, retry_after = False, (cost - tokens) / self.rate_per_s
+                self._limited += 1
+            self._buckets[key] = (tokens, now)
+            # bounded memory: forget the least recently seen keys
+            while len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"rate_per_s": self.rate_per_s, "burst": self.burst,
+                    "tracked_keys": len(self._buckets), "limited": self._limited}
+
+def retry_after_header(seconds: float) -> str:
+    """Retry-After value for a wait of `seconds`: whole seconds, rounded up, at least 1."""
+    return str(max(1, math.ceil(seconds)))
+
+# ---------------------------------------------------------------------
+# Configuration from environment
+# ---------------------------------------------------------------------
+def from_env():
+    """Build (admission, limiter) from env vars; either may be None (disabled).
+      PREDICT_MAX_IN_FLIGHT       in-flight /predict_all limit per worker (0 = off)
+      PREDICT_MAX_QUEUE_WAIT_MS   how long a request may wait for a slot
+      PREDICT_RETRY_AFTER_S       Retry-After sent with 503
+      RATE_LIMIT_PER_MINUTE       per-client sustained rate (0 = off)
+      RATE_LIMIT_BURST            per-client burst size"""
+    admission = None
+    max_in_flight = int(os.getenv("PREDICT_MAX_IN_FLIGHT", 0))
+    if max_in_flight > 0:
+        admission = AdmissionController(
+            max_in_flight,
+            max_queue_wait_s=float(os.getenv("PREDICT_MAX_QUEUE_WAIT_MS", 100)) / 1000.0,
+            retry_after_s=int(os.getenv("PREDICT_RETRY_AFTER_S", 1)),
+        )
+
+    limiter = None
+    per_minute = float(os.getenv("RATE_LIMIT_PER_MINUTE", 0))
+    if per_minute > 0:
+        limiter = TokenBucketLimiter(per_minute / 60.0, float(os.getenv("RATE_LIMIT_BURST", 5)))
+    return admission, limiter
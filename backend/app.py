@@ -1,5 +1,7 @@
 # backend/app.py
-from flask import Flask, request, jsonify
+import threading_config
+threading_config.apply()  # before anything that loads NumPy / TensorFlow
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
@@ -7,8 +9,20 @@ import os
 import json
 import traceback
 from datetime import datetime
-from main import predict_all_diseases, load_all_models
-from database import get_db_connection, init_db
+from inference_pool import resolve_predictor, resolve_function
+from database import (get_db_connection, get_predictions_connection, prediction_shards, init_db,
+                      shard_for, PREDICTION_SHARDS)
+import rollups
+import outcomes
+import export
+import bulk
+import maintenance
+import admission as admission_control
+import profiling
+from admin import admin_required, is_admin
+from memory_debug import SnapshotStore, current_rss_bytes, model_memory_report
+from explain import parse_method
+from drift import DriftMonitor
 
 # -------------------------
 # Load environment variables
@@ -30,20 +44,62 @@ app.config["SECRET_KEY"] = os.getenv("FLASK_SECRET_KEY", "fallback-secret-key")
 init_db()
 
 # -------------------------
-# Load ML models
+# Load ML models (in-process, or via the shared inference pool)
 # -------------------------
-models = load_all_models()
-if models is None:
+predict_all_diseases, models = resolve_predictor()
+what_if = resolve_function("what_if")
+# Per-user incremental re-scoring (sessions.py): only models fed by changed fields rerun
+INCREMENTAL_RESCORING = os.getenv("INCREMENTAL_RESCORING", "1") == "1"
+predict_incremental = resolve_function("predict_all_diseases_incremental") if INCREMENTAL_RESCORING else None
+if not models:
     print("❌ Warning: models not loaded at startup. Check backend/models/*")
 else:
     print("✅ Models loaded at startup.")
 
+# -------------------------
+# Input-drift monitor (drift.py): live /predict_all inputs vs the training datasets
+# -------------------------
+drift_monitor = DriftMonitor() if os.getenv("DRIFT_MONITOR", "1") == "1" else None
+
+# -------------------------
+# Retention / downsampling / incremental vacuum of users.db (maintenance.py)
+# -------------------------
+maintenance_job = maintenance.from_env()
+maintenance_job.start()
+
+# -------------------------
+# Admission control / rate limiting for /predict_all
+# -------------------------
+admission, rate_limiter = admission_control.from_env()
+# per-model budgets / circuit breakers (resilience.py) live next to the models: in-process only
+model_guard_stats = None if os.getenv("INFERENCE_POOL_ADDRESS") else resolve_function("model_guard_stats")
+
+def _rate_limit_key():
+    # the body's "email" is not authenticated: keying on it would let a client pick a fresh bucket
+    return request.remote_addr
+
+def _admit_prediction():
+    """Return an error response if the request must be rejected, else None.
+    On success the caller owns an admission slot and must release it."""
+    if rate_limiter is not None:
+        allowed, retry_after = rate_limiter.allow(_rate_limit_key())
+        if not allowed:
+            resp = jsonify({"error": "Rate limit exceeded"})
+            resp.headers["Retry-After"] = admission_control.retry_after_header(retry_after)
+            return resp, 429
+    if admission is not None and not admission.acquire():
+        resp = jsonify({"error": "Server busy, please retry"})
+        resp.headers["Retry-After"] = str(admission.retry_after_s)
+        return resp, 503
+    return None
+
 # -------------------------
 # Health route
 # -------------------------
 @app.route("/", methods=["GET"])
 def health():
-    return jsonify({"status": "ok", "models_loaded": bool(models)})
+    return jsonify({"status": "ok", "models_loaded": bool(models),
+                    "threads": threading_config.effective_settings()})
 
 # -------------------------
 # SIGNUP route
@@ -120,6 +176,16 @@ def login():
 # -------------------------
 @app.route("/predict_all", methods=["POST"])
 def predict_all():
+    rejected = _admit_prediction()
+    if rejected is not None:
+        return rejected
+    try:
+        return _predict_all()
+    finally:
+        if admission is not None:
+            admission.release()
+
+def _predict_all():
     try:
         payload = request.get_json()
         if payload is None:
@@ -131,25 +197,51 @@ def predict_all():
         if "data" in payload and isinstance(payload["data"], dict):
             payload = payload["data"]
 
+        if drift_monitor is not None:
+            drift_monitor.observe(payload)
+
+        # ?explain=1 (integrated gradients) or ?explain=grad_input adds per-field attributions
+        try:
+            explain = parse_method(request.args.get("explain"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         print("\n📥 [BACKEND] Received JSON from frontend:")
         print(json.dumps(payload, indent=2))
 
-        result = predict_all_diseases(payload)
+        if user_email and predict_incremental is not None:
+            result = predict_incremental(payload, user_email, explain)
+        else:
+            result = predict_all_diseases(payload, explain)
 
         print("\n✅ [BACKEND] Prediction response to frontend:")
         print(json.dumps(result, indent=2))
 
-        # ✅ Store predictions in DB
-        if user_email:
-            conn = get_db_connection()
+        # ✅ Store predictions in DB, with the inputs they were scored from (outcomes.py)
+        # timeout / busy / circuit_open entries (resilience.py) have no score: not stored
+        scored = {d: data for d, data in result.get("predictions", {}).items() if "score" in data}
+        if user_email and scored:
+            features = outcomes.snapshot(payload)
+            conn = get_predictions_connection(user_email)
             cursor = conn.cursor()
-            for disease, data in result["predictions"].items():
+            request_id = None
+            if features is not None:
+                # one snapshot per request, referenced by each of its rows
+                cursor.execute("INSERT INTO prediction_requests (features) VALUES (?)", (features,))
+                request_id = cursor.lastrowid
+            prediction_ids = {}
+            for disease, data in scored.items():
                 cursor.execute('''
-                    INSERT INTO predictions (email, disease_name, score, risk)
-                    VALUES (?, ?, ?, ?)
-                ''', (user_email, disease, data["score"], data["risk"]))
+                    INSERT INTO predictions (email, disease_name, score, risk, request_id)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (user_email, disease, data["score"], data["risk"], request_id))
+                prediction_ids[disease] = cursor.lastrowid
             conn.commit()
             conn.close()
+            # references for POST /outcomes
+            result["prediction_ids"] = prediction_ids
+            if PREDICTION_SHARDS > 1:
+                result["prediction_shard"] = shard_for(user_email)
 
         return jsonify(result)
 
@@ -158,6 +250,227 @@ def predict_all():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+# -------------------------
+# Bulk scoring (bulk.py): chunked NDJSON / CSV upload in, NDJSON results out as each
+# batch of BULK_BATCH_ROWS finishes. Admin token or HTTP Basic auth (as for exports);
+# each batch takes an admission slot of its own. ?format=ndjson|csv (else Content-Type)
+# -------------------------
+predict_batch = resolve_function("predict_all_diseases_batch")
+
+def _bulk_predict(payloads):
+    if admission is not None and not admission.acquire(timeout=bulk.ADMISSION_WAIT_S):
+        raise bulk.BulkAborted("Server busy, please retry")
+    try:
+        return predict_batch(payloads)
+    finally:
+        if admission is not None:
+            admission.release()
+
+@app.route("/predict_bulk", methods=["POST"])
+def predict_bulk():
+    try:
+        export.authorize(request.args, request.authorization, is_admin())
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 401
+    try:
+        fmt = bulk.parse_format(request.args, request.content_type)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if rate_limiter is not None:
+        # not _rate_limit_key(): that would read the body before it is streamed
+        auth = request.authorization
+        allowed, retry_after = rate_limiter.allow(auth.username if auth and auth.username else request.remote_addr)
+        if not allowed:
+            resp = jsonify({"error": "Rate limit exceeded"})
+            resp.headers["Retry-After"] = admission_control.retry_after_header(retry_after)
+            return resp, 429
+    scorer = bulk.BulkScorer(fmt, _bulk_predict, observe=drift_monitor.observe if drift_monitor is not None else None)
+    return Response(stream_with_context(bulk.stream(request.stream.read, scorer)),
+                    mimetype=bulk.FORMATS["ndjson"], headers={"X-Accel-Buffering": "no"})
+
+# -------------------------
+# What-if sweep: risk curves over one or two field grids
+# body: {"data": {...base patient...}, "grid": [{"field": "systolic_bp", "min": 100, "max": 200, "steps": 50}]}
+# -------------------------
+@app.route("/what_if", methods=["POST"])
+def what_if_sweep():
+    rejected = _admit_prediction()
+    if rejected is not None:
+        return rejected
+    try:
+        payload = request.get_json()
+        if not isinstance(payload, dict):
+            return jsonify({"error": "No JSON body received"}), 400
+        result = what_if(payload.get("data") or {}, payload.get("grid"))
+        return jsonify(result), (400 if "error" in result else 200)
+    except Exception as e:
+        print("❌ Exception in /what_if:", e)
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+    finally:
+        if admission is not None:
+            admission.release()
+
+# -------------------------
+# Capacity stats (queue wait, shed counts)
+# -------------------------
+@app.route("/admission_stats", methods=["GET"])
+def admission_stats():
+    return jsonify({
+        "admission": admission.stats() if admission is not None else None,
+        "rate_limit": rate_limiter.stats() if rate_limiter is not None else None,
+        "models": model_guard_stats() if model_guard_stats is not None else None,
+    })
+
+# -------------------------
+# Streaming export of prediction history (export.py): admin token, or HTTP Basic
+# auth (email, password) for a user's own rows. ?format=csv|ndjson&gzip=1&after=<id>
+# -------------------------
+@app.route("/export/predictions", methods=["GET"])
+def export_predictions():
+    try:
+        email = export.authorize(request.args, request.authorization, is_admin())
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 401
+    try:
+        options = export.parse_options(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if options["until"] is None:
+        options["until"] = export.snapshot_ids()
+    return Response(export.stream(email, options), headers=export.response_headers(options))
+
+# -------------------------
+# Population risk dashboard (admin only); reads the rollup tables, never raw predictions
+# ?from=YYYY-MM-DD&to=YYYY-MM-DD&disease=stroke (all optional)
+# -------------------------
+def _dashboard_query(fn):
+    conns = [conn for _, conn in prediction_shards()]
+    try:
+        for conn in conns:
+            rollups.compact(conn)   # no-op unless ROLLUP_MODE=compaction
+        return fn(conns, request.args.get("from"), request.args.get("to"), request.args.get("disease"))
+    finally:
+        for conn in conns:
+            conn.close()
+
+@app.route("/dashboard/risk_counts", methods=["GET"])
+@admin_required
+def dashboard_risk_counts():
+    return jsonify(_dashboard_query(rollups.risk_counts))
+
+@app.route("/dashboard/score_histogram", methods=["GET"])
+@admin_required
+def dashboard_score_histogram():
+    return jsonify(_dashboard_query(rollups.score_histogram))
+
+# -------------------------
+# Database maintenance (admin only)
+# -------------------------
+@app.route("/maintenance", methods=["GET"])
+@admin_required
+def maintenance_stats():
+    return jsonify(maintenance_job.stats())
+
+@app.route("/maintenance/run", methods=["POST"])
+@admin_required
+def maintenance_run():
+    return jsonify(maintenance_job.run_once())
+
+# -------------------------
+# Follow-up outcomes for stored predictions (admin only), see outcomes.py
+# body: {"outcomes": [{"prediction_id": 123, "shard": 0, "label": 1, "observed_at": "2026-03-01"}],
+#        "recorded_by": "dr.smith"}
+# -------------------------
+@app.route("/outcomes", methods=["POST"])
+@admin_required
+def record_outcomes():
+    body = request.get_json(silent=True)
+    try:
+        labels = outcomes.parse_labels(body)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    recorded_by = body.get("recorded_by") if isinstance(body, dict) else None
+    return jsonify(outcomes.record(labels, PREDICTION_SHARDS, lambda shard: get_predictions_connection(shard=shard),
+                                   recorded_by))
+
+@app.route("/outcomes", methods=["GET"])
+@admin_required
+def outcome_stats():
+    conns = [conn for _, conn in prediction_shards()]
+    try:
+        return jsonify(outcomes.stats(conns))
+    finally:
+        for conn in conns:
+            conn.close()
+
+# -------------------------
+# Per-disease input drift (admin only)
+# -------------------------
+@app.route("/drift", methods=["GET"])
+@admin_required
+def drift_report():
+    if drift_monitor is None:
+        return jsonify({"error": "drift monitor disabled (DRIFT_MONITOR=0)"}), 404
+    return jsonify(drift_monitor.report())
+
+@app.route("/drift/reset", methods=["POST"])
+@admin_required
+def drift_reset():
+    if drift_monitor is None:
+        return jsonify({"error": "drift monitor disabled (DRIFT_MONITOR=0)"}), 404
+    drift_monitor.reset()
+    return jsonify({"reset": True})
+
+# -------------------------
+# Admin-only memory debugging
+# -------------------------
+snapshots = SnapshotStore()
+
+@app.route("/debug/memory", methods=["GET"])
+@admin_required
+def debug_memory():
+    return jsonify({
+        "rss_bytes": current_rss_bytes(),
+        "model_memory": model_memory_report(),
+        "tracemalloc": snapshots.status(),
+    })
+
+@app.route("/debug/tracemalloc/start", methods=["POST"])
+@admin_required
+def debug_tracemalloc_start():
+    return jsonify(snapshots.start(frames=request.args.get("frames", 10, type=int)))
+
+@app.route("/debug/tracemalloc/stop", methods=["POST"])
+@admin_required
+def debug_tracemalloc_stop():
+    return jsonify(snapshots.stop())
+
+@app.route("/debug/tracemalloc/snapshot", methods=["POST"])
+@admin_required
+def debug_tracemalloc_snapshot():
+    try:
+        return jsonify(snapshots.take(limit=request.args.get("limit", 20, type=int)))
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+
+@app.route("/debug/tracemalloc/diff", methods=["GET"])
+@admin_required
+def debug_tracemalloc_diff():
+    try:
+        return jsonify(snapshots.diff(
+            request.args.get("from", type=int),
+            request.args.get("to", type=int),
+            limit=request.args.get("limit", 20, type=int),
+        ))
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+
+# -------------------------
+# Opt-in request profiling (no-op unless PROFILING_ENABLED / PROFILE_SAMPLE_RATE)
+# -------------------------
+profiling.install(app, endpoints=["predict_all"])
+
 # -------------------------
 # RUN APP
 # -------------------------
@@ -0,0 +1,375 @@
+# backend/asgi_app.py
+"""
+ASGI serving mode: same routes as app.py (/, /signup, /login, /predict_all), but
+request parsing and SQLite I/O are async (Quart + aiosqlite) and CPU-bound work
+(model inference, password hashing) runs in a thread pool, so a slow client or a
+locked database no longer ties up a whole worker.
+
+Run with:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+"""
+import threading_config
+threading_config.apply()  # before anything that loads NumPy / TensorFlow
+from quart import Quart, Response, request, jsonify, stream_with_context
+from quart_cors import cors
+from werkzeug.security import generate_password_hash, check_password_hash
+from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+import os
+import asyncio
+import traceback
+from inference_pool import resolve_predictor, resolve_function
+from database import (get_async_db_connection, get_async_predictions_connection, get_predictions_connection,
+                      prediction_shards, init_db, shard_for, PREDICTION_SHARDS)
+import admission as admission_control
+from explain import parse_method
+from drift import DriftMonitor
+from admin import is_admin
+import export
+import bulk
+import outcomes
+
+# -------------------------
+# Load environment variables
+# -------------------------
+load_dotenv()
+
+# -------------------------
+# Quart setup
+# -------------------------
+app = Quart(__name__)
+app = cors(app)
+
+app.config["SECRET_KEY"] = os.getenv("FLASK_SECRET_KEY", "fallback-secret-key")
+
+# Thread pool for CPU-bound work; sized independently of connection count
+EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("ASGI_INFERENCE_THREADS", 2)),
+    thread_name_prefix="inference",
+)
+
+# -------------------------
+# Initialize Database
+# -------------------------
+init_db()
+
+# -------------------------
+# Load ML models (in-process, or via the shared inference pool)
+# -------------------------
+predict_all_diseases, models = resolve_predictor()
+what_if = resolve_function("what_if")
+# Per-user incremental re-scoring (sessions.py): only models fed by changed fields rerun
+INCREMENTAL_RESCORING = os.getenv("INCREMENTAL_RESCORING", "1") == "1"
+predict_incremental = resolve_function("predict_all_diseases_incremental") if INCREMENTAL_RESCORING else None
+if not models:
+    print("❌ Warning: models not loaded at startup. Check backend/models/*")
+else:
+    print("✅ Models loaded at startup.")
+
+# Input-drift monitor (drift.py); observe() runs on the event loop, so one shard is used
+drift_monitor = DriftMonitor() if os.getenv("DRIFT_MONITOR", "1") == "1" else None
+
+admission, rate_limiter = admission_control.from_env()
+
+async def _run_blocking(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(EXECUTOR, fn, *args)
+
+# -------------------------
+# Health route
+# -------------------------
+@app.route("/", methods=["GET"])
+async def health():
+    return jsonify({"status": "ok", "models_loaded": bool(models),
+                    "threads": threading_config.effective_settings()})
+
+# -------------------------
+# SIGNUP route
+# -------------------------
+@app.route("/signup", methods=["POST"])
+async def signup():
+    try:
+        data = await request.get_json()
+        username = data.get("username")
+        email = data.get("email")
+        password = data.get("password")
+
+        if not all([username, email, password]):
+            return jsonify({"error": "All fields required"}), 400
+
+        conn = await get_async_db_connection()
+        try:
+            async with conn.execute("SELECT * FROM users WHERE email = ?", (email,)) as cursor:
+                if await cursor.fetchone():
+                    return jsonify({"error": "User already exists"}), 409
+
+            hashed_pw = await _run_blocking(generate_password_hash, password)
+            await conn.execute(
+                "INSERT INTO users (email, username, password) VALUES (?, ?, ?)",
+                (email, username, hashed_pw),
+            )
+            await conn.commit()
+        finally:
+            await conn.close()
+
+        return jsonify({"message": "Signup successful!"}), 201
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+# -------------------------
+# LOGIN route
+# -------------------------
+@app.route("/login", methods=["POST"])
+async def login():
+    try:
+        data = await request.get_json()
+        email = data.get("email")
+        password = data.get("password")
+
+        if not all([email, password]):
+            return jsonify({"error": "Email and password required"}), 400
+
+        conn = await get_async_db_connection()
+        try:
+            async with conn.execute("SELECT * FROM users WHERE email = ?", (email,)) as cursor:
+                user = await cursor.fetchone()
+        finally:
+            await conn.close()
+
+        if not user or not await _run_blocking(check_password_hash, user["password"], password):
+            return jsonify({"error": "Invalid credentials"}), 401
+
+        return jsonify({
+            "message": "Login successful",
+            "username": user["username"],
+            "email": email
+        }), 200
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+# -------------------------
+# PREDICT_ALL route
+# -------------------------
+@app.route("/predict_all", methods=["POST"])
+async def predict_all():
+    try:
+        payload = await request.get_json()
+        if payload is None:
+            return jsonify({"error": "No JSON body received"}), 400
+
+        user_email = payload.get("email")
+
+        # unwrap { "data": {...} }
+        if "data" in payload and isinstance(payload["data"], dict):
+            payload = payload["data"]
+
+        if drift_monitor is not None:
+            drift_monitor.observe(payload)
+
+        try:
+            explain = parse_method(request.args.get("explain"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if rate_limiter is not None:
+            # remote_addr, not the unauthenticated "email" a client could change per request
+            allowed, retry_after = rate_limiter.allow(request.remote_addr)
+            if not allowed:
+                return jsonify({"error": "Rate limit exceeded"}), 429, {"Retry-After": admission_control.retry_after_header(retry_after)}
+        # timeout=0: shed immediately rather than blocking the event loop
+        if admission is not None and not admission.acquire(timeout=0):
+            return jsonify({"error": "Server busy, please retry"}), 503, {"Retry-After": str(admission.retry_after_s)}
+        try:
+            if user_email and predict_incremental is not None:
+                result = await _run_blocking(predict_incremental, payload, user_email, explain)
+            else:
+                result = await _run_blocking(predict_all_diseases, payload, explain)
+        finally:
+            if admission is not None:
+                admission.release()
+
+        # ✅ Store predictions in DB, with the inputs they were scored from (outcomes.py)
+        # timeout / busy / circuit_open entries (resilience.py) have no score: not stored
+        scored = {d: data for d, data in result.get("predictions", {}).items() if "score" in data}
+        if user_email and scored:
+            features = outcomes.snapshot(payload)
+            prediction_ids = {}
+            conn = await get_async_predictions_connection(user_email)
+            try:
+                request_id = None
+                if features is not None:
+                    # one snapshot per request, referenced by each of its rows
+                    cursor = await conn.execute("INSERT INTO prediction_requests (features) VALUES (?)", (features,))
+                    request_id = cursor.lastrowid
+                for disease, data in scored.items():
+                    cursor = await conn.execute('''
+                        INSERT INTO predictions (email, disease_name, score, risk, request_id)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (user_email, disease, data["score"], data["risk"], request_id))
+                    prediction_ids[disease] = cursor.lastrowid
+                await conn.commit()
+            finally:
+                await conn.close()
+            # references for POST /outcomes
+            result["prediction_ids"] = prediction_ids
+            if PREDICTION_SHARDS > 1:
+                result["prediction_shard"] = shard_for(user_email)
+
+        return jsonify(result)
+
+    except Exception as e:
+        print("❌ Exception in /predict_all:", e)
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+# -------------------------
+# What-if sweep (see app.py)
+# -------------------------
+@app.route("/what_if", methods=["POST"])
+async def what_if_sweep():
+    try:
+        payload = await request.get_json()
+        if not isinstance(payload, dict):
+            return jsonify({"error": "No JSON body received"}), 400
+        if admission is not None and not admission.acquire(timeout=0):
+            return jsonify({"error": "Server busy, please retry"}), 503, {"Retry-After": str(admission.retry_after_s)}
+        try:
+            result = await _run_blocking(what_if, payload.get("data") or {}, payload.get("grid"))
+        finally:
+            if admission is not None:
+                admission.release()
+        return jsonify(result), (400 if "error" in result else 200)
+    except Exception as e:
+        print("❌ Exception in /what_if:", e)
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+# -------------------------
+# Capacity stats (queue wait, shed counts)
+# -------------------------
+@app.route("/admission_stats", methods=["GET"])
+async def admission_stats():
+    return jsonify({
+        "admission": admission.stats() if admission is not None else None,
+        "rate_limit": rate_limiter.stats() if rate_limiter is not None else None,
+    })
+
+# -------------------------
+# Streaming export of prediction history (export.py); the body generator runs on a
+# worker thread, one chunk at a time
+# -------------------------
+@app.route("/export/predictions", methods=["GET"])
+async def export_predictions():
+    try:
+        email = await _run_blocking(export.authorize, request.args, request.authorization,
+                                   is_admin(request))
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 401
+    try:
+        options = export.parse_options(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if options["until"] is None:
+        options["until"] = await _run_blocking(export.snapshot_ids)
+    return Response(export.stream(email, options), headers=export.response_headers(options))
+
+# -------------------------
+# Bulk scoring (bulk.py; see app.py). Upload chunks are parsed and scored on the
+# executor; the next chunk is only awaited once the previous results were sent.
+# -------------------------
+predict_batch = resolve_function("predict_all_diseases_batch")
+
+def _bulk_predict(payloads):
+    # runs on the executor, so waiting for a slot does not block the event loop
+    if admission is not None and not admission.acquire(timeout=bulk.ADMISSION_WAIT_S):
+        raise bulk.BulkAborted("Server busy, please retry")
+    try:
+        return predict_batch(payloads)
+    finally:
+        if admission is not None:
+            admission.release()
+
+@app.route("/predict_bulk", methods=["POST"])
+async def predict_bulk():
+    try:
+        await _run_blocking(export.authorize, request.args, request.authorization, is_admin(request))
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 401
+    try:
+        fmt = bulk.parse_format(request.args, request.content_type)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    scorer = bulk.BulkScorer(fmt, _bulk_predict, observe=drift_monitor.observe if drift_monitor is not None else None)
+
+    @stream_with_context
+    async def body():
+        try:
+            async for chunk in request.body:
+                for out in await _run_blocking(lambda: list(scorer.feed(chunk))):
+                    yield out
+            for out in await _run_blocking(lambda: list(scorer.finish())):
+                yield out
+        except bulk.BulkAborted as e:
+            yield scorer.abort(str(e))
+
+    return Response(body(), mimetype=bulk.FORMATS["ndjson"], headers={"X-Accel-Buffering": "no"})
+
+# -------------------------
+# Follow-up outcomes for stored predictions (admin only; see app.py)
+# -------------------------
+@app.route("/outcomes", methods=["POST"])
+async def record_outcomes():
+    if not is_admin(request):
+        return jsonify({"error": "Admin access required"}), 403
+    body = await request.get_json(silent=True)
+    try:
+        labels = outcomes.parse_labels(body)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    recorded_by = body.get("recorded_by") if isinstance(body, dict) else None
+    return jsonify(await _run_blocking(outcomes.record, labels, PREDICTION_SHARDS,
+                                       lambda shard: get_predictions_connection(shard=shard), recorded_by))
+
+def _outcome_stats():
+    conns = [conn for _, conn in prediction_shards()]
+    try:
+        return outcomes.stats(conns)
+    finally:
+        for conn in conns:
+            conn.close()
+
+@app.route("/outcomes", methods=["GET"])
+async def outcome_stats():
+    if not is_admin(request):
+        return jsonify({"error": "Admin access required"}), 403
+    return jsonify(await _run_blocking(_outcome_stats))
+
+# -------------------------
+# Per-disease input drift (admin only)
+# -------------------------
+@app.route("/drift", methods=["GET"])
+async def drift_report():
+    if not is_admin(request):
+        return jsonify({"error": "Admin access required"}), 403
+    if drift_monitor is None:
+        return jsonify({"error": "drift monitor disabled (DRIFT_MONITOR=0)"}), 404
+    return jsonify(drift_monitor.report())
+
+@app.route("/drift/reset", methods=["POST"])
+async def drift_reset():
+    if not is_admin(request):
+        return jsonify({"error": "Admin access required"}), 403
+    if drift_monitor is None:
+        return jsonify({"error": "drift monitor disabled (DRIFT_MONITOR=0)"}), 404
+    drift_monitor.reset()
+    return jsonify({"reset": True})
+
+# -------------------------
+# RUN APP
+# -------------------------
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", 8000)))
@@ -0,0 +1,123 @@
+# backend/benchmarks/bench_asgi_vs_wsgi.py
+"""
+Load-test the Flask (gunicorn sync) and ASGI (uvicorn + asgi_app) serving paths side by side.
+
+For each server we hold `--slow-clients` connections open that trickle their request body
+(a slow upload), then measure throughput and latency of `--concurrency` normal clients
+calling /predict_all. A sync worker is pinned by each slow upload; the ASGI worker is not.
+
+Usage (from backend/):
+    python benchmarks/bench_asgi_vs_wsgi.py --concurrency 32 --slow-clients 4 --duration 15
+"""
+import os
+import json
+import time
+import socket
+import argparse
+import threading
+import subprocess
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    "flask_sync": lambda port, workers: ["gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{port}", "app:app"],
+    "asgi": lambda port, workers: ["uvicorn", "asgi_app:app", "--workers", str(workers),
+                                   "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+}
+
+PAYLOAD = json.dumps({"data": {"Age": 58, "Sex": "Male", "systolic_bp": 150, "cholesterol": 240}}).encode()
+
+def _wait_ready(port: int, timeout: float = 300.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=2):
+                return
+        except Exception:
+            time.sleep(0.5)
+    raise RuntimeError(f"server on port {port} did not become ready")
+
+def _slow_client(port: int, stop: threading.Event):
+    """Send headers, then dribble the body one byte per second."""
+    while not stop.is_set():
+        try:
+            s = socket.create_connection(("127.0.0.1", port))
+            s.sendall(
+                b"POST /predict_all HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(PAYLOAD)}\r\n\r\n".encode()
+            )
+            for b in PAYLOAD:
+                if stop.is_set():
+                    break
+                s.send(bytes([b]))
+                time.sleep(1.0)
+            s.close()
+        except OSError:
+            time.sleep(0.5)
+
+def _client(port: int, stop: threading.Event, latencies: list, errors: list):
+    req = lambda: urllib.request.Request(f"http://127.0.0.1:{port}/predict_all", data=PAYLOAD,
+                                         headers={"Content-Type": "application/json"})
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req(), timeout=30) as resp:
+                resp.read()
+            latencies.append(time.perf_counter() - t0)
+        except Exception as e:
+            errors.append(type(e).__name__)
+
+def run(name: str, port: int, workers: int, concurrency: int, slow_clients: int, duration: float):
+    proc = subprocess.Popen(SERVERS[name](port, workers), cwd=BACKEND_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_ready(port)
+        stop = threading.Event()
+        latencies, errors = [], []
+        slow = [threading.Thread(target=_slow_client, args=(port, stop), daemon=True) for _ in range(slow_clients)]
+        fast = [threading.Thread(target=_client, args=(port, stop, latencies, errors), daemon=True)
+                for _ in range(concurrency)]
+        for t in slow:
+            t.start()
+        time.sleep(1.0)
+        for t in fast:
+            t.start()
+        time.sleep(duration)
+        stop.set()
+        for t in fast:
+            t.join(timeout=35)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    latencies.sort()
+    pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else None
+    return {
+        "server": name,
+        "workers": workers,
+        "concurrency": concurrency,
+        "slow_clients": slow_clients,
+        "completed": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / duration, 2),
+        "p50_ms": pct(0.50),
+        "p99_ms": pct(0.99),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--slow-clients", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--output", help="optional JSON file for the results")
+    args = parser.parse_args()
+
+    results = []
+    for i, name in enumerate(SERVERS):
+        results.append(run(name, 8100 + i, args.workers, args.concurrency, args.slow_clients, args.duration))
+        print(json.dumps(results[-1]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
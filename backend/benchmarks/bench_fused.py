@@ -0,0 +1,58 @@
+# backend/benchmarks/bench_fused.py
+"""
+Sequential per-model Keras inference vs. the fused ensemble (fused.py).
+
+Feeds the same preprocessed inputs (sample payloads through each disease's deployed
+preprocessor) to both paths, reports latency for one patient and for a batch, and
+the max absolute difference in probabilities.
+
+Usage (from backend/):
+    python benchmarks/bench_fused.py [--batch 64] [--repeats 50]
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+def _time(fn, repeats: int) -> float:
+    fn()  # warm-up
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - t0) / repeats * 1000
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import main
+    from fused import FusedEnsemble
+    from sample_payloads import synthetic_payloads
+
+    models = {n: a for n, a in main.MODELS.items() if a["family"] == "mlp"}
+    fused = FusedEnsemble.from_models({n: a["model"] for n, a in models.items()})
+    rows = [main._merge_with_template(p) for p in synthetic_payloads(args.batch, args.seed)]
+    Xs = {n: a["preprocessor"].transform(main._prepare_dataframe_for_model(rows, a, n)) for n, a in models.items()}
+    X1 = {n: X[:1] for n, X in Xs.items()}
+
+    def sequential(inputs):
+        return {n: a["model"].predict(inputs[n], verbose=0).reshape(-1) for n, a in models.items()}
+
+    ref, out = sequential(Xs), fused.predict(Xs)
+    max_diff = max(float(np.max(np.abs(ref[n] - out[n]))) for n in models)
+
+    print(f"models: {', '.join(models)}  fused weights: {fused.nbytes / 1024:.1f} KiB")
+    print(f"{'':<12}{'1 row ms':>12}{f'{args.batch} rows ms':>14}")
+    print(f"{'sequential':<12}{_time(lambda: sequential(X1), args.repeats):>12.3f}"
+          f"{_time(lambda: sequential(Xs), args.repeats):>14.3f}")
+    print(f"{'fused':<12}{_time(lambda: fused.predict(X1), args.repeats):>12.3f}"
+          f"{_time(lambda: fused.predict(Xs), args.repeats):>14.3f}")
+    print(f"max |sequential - fused| = {max_diff:.2e}")
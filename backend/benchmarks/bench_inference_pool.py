@@ -0,0 +1,141 @@
+# backend/benchmarks/bench_inference_pool.py
+"""
+Compare the two serving topologies on throughput and memory:
+
+  inline : K "HTTP worker" processes, each loading every model and calling
+           predict_all_diseases() itself (today's gunicorn layout)
+  pool   : K lightweight client processes (no TensorFlow) sending requests to an
+           InferencePoolServer with P model processes that batch across callers
+
+Usage (from backend/):
+    python benchmarks/bench_inference_pool.py --http-workers 4 --threads 4 --pool-size 2 --requests 400
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import multiprocessing as mp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_pool import InferencePoolServer, InferencePoolClient  # noqa: E402
+
+def _rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+def _payload(rng: random.Random):
+    return {
+        "Age": rng.randint(25, 85),
+        "Sex": rng.choice(["Male", "Female"]),
+        "BMI": round(rng.uniform(18, 40), 1),
+        "systolic_bp": rng.randint(95, 190),
+        "diastolic_bp": rng.randint(60, 110),
+        "cholesterol": rng.randint(140, 320),
+        "glucose_level": rng.randint(70, 220),
+        "heart_rate": rng.randint(55, 120),
+        "Troponin": round(rng.uniform(0.0, 0.5), 3),
+    }
+
+def _drive(predict, n_requests: int, threads: int, seed: int, latencies):
+    """Issue n_requests through `predict` from `threads` concurrent threads."""
+    counter = iter(range(n_requests))
+    lock = threading.Lock()
+
+    def run(tid):
+        rng = random.Random(seed * 1000 + tid)
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            t0 = time.perf_counter()
+            predict(_payload(rng))
+            latencies.append(time.perf_counter() - t0)
+
+    ts = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+
+def _http_worker(mode, address, n_requests, threads, seed, start_evt, out_q):
+    if mode == "inline":
+        import main
+        main.print = lambda *a, **k: None  # keep logging out of the measurement
+        predict = main.predict_all_diseases
+    else:
+        predict = InferencePoolClient(address).predict_all_diseases
+    out_q.put(("ready", os.getpid(), _rss_bytes(os.getpid())))
+    start_evt.wait()
+    latencies = []
+    _drive(predict, n_requests, threads, seed, latencies)
+    out_q.put(("done", os.getpid(), {"rss": _rss_bytes(os.getpid()), "latencies": latencies}))
+
+def run_topology(mode, http_workers, threads, pool_size, n_requests, address):
+    server = None
+    extra_rss = 0
+    if mode == "pool":
+        server = InferencePoolServer(address, pool_size).start()
+
+    ctx = mp.get_context("spawn")
+    start_evt, out_q = ctx.Event(), ctx.Queue()
+    per_worker = n_requests // http_workers
+    procs = [ctx.Process(target=_http_worker, args=(mode, address, per_worker, threads, i, start_evt, out_q))
+             for i in range(http_workers)]
+    for p in procs:
+        p.start()
+    for _ in procs:
+        out_q.get()  # ready
+
+    t0 = time.perf_counter()
+    start_evt.set()
+    done = [out_q.get()[2] for _ in procs]
+    wall = time.perf_counter() - t0
+
+    if server is not None:
+        extra_rss = _rss_bytes(os.getpid()) + sum(_rss_bytes(w["pid"]) for w in server.stats()["workers"])
+    for p in procs:
+        p.join()
+    if server is not None:
+        server.stop()
+
+    latencies = sorted(l for d in done for l in d["latencies"])
+    pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0.0
+    return {
+        "topology": mode,
+        "http_workers": http_workers,
+        "threads_per_worker": threads,
+        "model_processes": pool_size if mode == "pool" else http_workers,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "p50_ms": round(pct(0.50), 2),
+        "p99_ms": round(pct(0.99), 2),
+        "total_rss_mb": round((sum(d["rss"] for d in done) + extra_rss) / 2**20, 1),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--http-workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4, help="concurrent requests per HTTP worker")
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--address", default="/tmp/cardiopredict-bench.sock")
+    parser.add_argument("--output", help="optional JSON file for the results")
+    args = parser.parse_args()
+
+    results = [run_topology(mode, args.http_workers, args.threads, args.pool_size, args.requests, args.address)
+               for mode in ("inline", "pool")]
+    for r in results:
+        print(json.dumps(r))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
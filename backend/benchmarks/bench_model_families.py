@@ -0,0 +1,84 @@
+# backend/benchmarks/bench_model_families.py
+"""
+Accuracy vs. serving latency for each model family (mlp / logreg / gbt), per disease.
+
+Uses the held-out split from model_training/train.py, transformed with the deployed
+preprocessor, and times the model call the backend makes (model.predict(X, verbose=0))
+for a single row and for a 256-row batch. Families without an artifact are skipped;
+train them with model_training/families.py.
+
+Usage (from backend/):
+    python benchmarks/bench_model_families.py [--diseases cad,stroke] [--output families.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "..", "model_training"))
+
+from fast_models import FAMILIES, load_fast_model  # noqa: E402
+
+MODELS_DIR = os.path.join(BACKEND_DIR, "models")
+
+def _time(fn, repeats: int) -> float:
+    fn()  # warm-up
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - t0) / repeats * 1000
+
+def _load(name: str, family: str):
+    if family == "mlp":
+        import tensorflow as tf
+        return tf.keras.models.load_model(os.path.join(MODELS_DIR, name, f"{name}_model.keras"))
+    path = os.path.join(MODELS_DIR, name, f"{name}_{family}.npz")
+    return load_fast_model(path) if os.path.exists(path) else None
+
+def bench(name: str, repeats: int):
+    from families import deployed_split
+    from sklearn.metrics import accuracy_score, precision_score, recall_score
+
+    data = deployed_split(name, MODELS_DIR)
+    X, y = data["X_test"], data["y_test"]
+    batch = np.repeat(X, int(np.ceil(256 / len(X))), axis=0)[:256]
+    rows = []
+    for family in FAMILIES:
+        model = _load(name, family)
+        if model is None:
+            continue
+        pred = (np.asarray(model.predict(X, verbose=0)).reshape(-1) > 0.5).astype(int)
+        rows.append({
+            "disease": name,
+            "family": family,
+            "accuracy": round(float(accuracy_score(y, pred)), 4),
+            "precision": round(float(precision_score(y, pred, zero_division=0)), 4),
+            "recall": round(float(recall_score(y, pred, zero_division=0)), 4),
+            "params": int(model.count_params()),
+            "row_ms": round(_time(lambda: model.predict(X[:1], verbose=0), repeats), 4),
+            "batch256_ms": round(_time(lambda: model.predict(batch, verbose=0), max(5, repeats // 10)), 4),
+        })
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--diseases", default="stroke,heart_failure,hypertension,heart_attack,cad")
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--output", help="optional JSON file for the results")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'disease':<14}{'family':<8}{'acc':>8}{'prec':>8}{'recall':>8}{'params':>9}{'row ms':>10}{'b256 ms':>10}")
+    for name in args.diseases.split(","):
+        for r in bench(name.strip(), args.repeats):
+            results.append(r)
+            print(f"{r['disease']:<14}{r['family']:<8}{r['accuracy']:>8}{r['precision']:>8}{r['recall']:>8}"
+                  f"{r['params']:>9}{r['row_ms']:>10}{r['batch256_ms']:>10}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,138 @@
+# backend/benchmarks/bench_rollups.py
+"""
+Dashboard aggregates: raw GROUP BY over predictions vs the rollup tables (rollups.py).
+
+Builds a synthetic history in a scratch SQLite file (--rows predictions spread over
+--days days, 5 diseases per submission), backfills the rollups, then times the same
+questions both ways -- risk counts per day x disease x risk and the score histogram,
+over the whole history and over the last 7 days -- and the cost the insert trigger
+adds to the /predict_all write (one 5-row transaction per request).
+
+Usage (from backend/):
+    python benchmarks/bench_rollups.py [--rows 20000000] [--days 365] [--db /tmp/bench_rollups.db]
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import rollups
+
+DISEASES = ["stroke", "heart_failure", "hypertension", "heart_attack", "cad"]
+PREDICTIONS_TABLE = '''
+    CREATE TABLE predictions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT NOT NULL,
+        disease_name TEXT NOT NULL,
+        score REAL,
+        risk TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+def _rows(n: int, days: int, users: int, seed: int):
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=days)
+    for i in range(n // len(DISEASES)):
+        day = start + timedelta(days=i * days * len(DISEASES) // n)
+        ts = f"{day.isoformat()} {rng.randrange(24):02d}:{rng.randrange(60):02d}:00"
+        email = f"user{rng.randrange(users)}@example.com"
+        for disease in DISEASES:
+            score = round(min(100.0, rng.betavariate(2, 4) * 100), 2)
+            risk = "High" if score > 70 else ("Moderate" if score > 50 else "Low")
+            yield email, disease, score, risk, ts
+
+def _time(fn, repeats: int) -> float:
+    fn()  # warm-up (page cache)
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - t0) / repeats * 1000
+
+def raw_risk_counts(conn, start=None):
+    where, params = ("WHERE date(timestamp) >= ?", [start]) if start else ("", [])
+    return conn.execute(f'''
+        SELECT date(timestamp), disease_name, risk, COUNT(*), COUNT(DISTINCT email), AVG(score)
+        FROM predictions {where} GROUP BY 1, 2, 3
+    ''', params).fetchall()
+
+def raw_histogram(conn, start=None):
+    where, params = ("WHERE date(timestamp) >= ?", [start]) if start else ("", [])
+    return conn.execute(f'''
+        SELECT disease_name, MIN(CAST(score / {rollups.HIST_BUCKET_WIDTH} AS INTEGER), {rollups.HIST_BUCKETS - 1}), COUNT(*)
+        FROM predictions {where} GROUP BY 1, 2
+    ''', params).fetchall()
+
+def _insert_cost(path: str, trigger: bool, requests: int, seed: int) -> float:
+    conn = sqlite3.connect(path)
+    rollups.install(conn, "trigger" if trigger else "compaction")
+    batch = list(_rows(requests * len(DISEASES), 1, 1000, seed))
+    t0 = time.perf_counter()
+    for i in range(0, len(batch), len(DISEASES)):
+        conn.executemany("INSERT INTO predictions (email, disease_name, score, risk, timestamp) VALUES (?, ?, ?, ?, ?)",
+                         batch[i:i + len(DISEASES)])
+        conn.commit()
+    elapsed = (time.perf_counter() - t0) / requests * 1000
+    conn.execute("DELETE FROM predictions WHERE id > (SELECT MAX(id) - ? FROM predictions)", (len(batch),))
+    conn.commit()
+    conn.close()
+    return elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--db", default=os.path.join("/tmp", "bench_rollups.db"))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--insert-requests", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="reuse / keep the scratch database")
+    args = parser.parse_args()
+
+    scratch = [args.db, args.db + "-wal", args.db + "-shm"]
+    if not (args.keep and os.path.exists(args.db)):
+        for path in filter(os.path.exists, scratch):
+            os.remove(path)
+        conn = sqlite3.connect(args.db)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(PREDICTIONS_TABLE)
+        t0 = time.perf_counter()
+        conn.executemany("INSERT INTO predictions (email, disease_name, score, risk, timestamp) VALUES (?, ?, ?, ?, ?)",
+                         _rows(args.rows, args.days, args.users, args.seed))
+        conn.commit()
+        print(f"📝 {args.rows:,} synthetic predictions written in {time.perf_counter() - t0:.1f}s")
+        t0 = time.perf_counter()
+        rollups.install(conn, "compaction")   # first install backfills
+        print(f"📝 Rollups backfilled in {time.perf_counter() - t0:.1f}s")
+        conn.close()
+
+    conn = sqlite3.connect(args.db)
+    n = conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+    rollup_rows = conn.execute("SELECT COUNT(*) FROM rollup_risk_daily").fetchone()[0]
+    week = (date.today() - timedelta(days=7)).isoformat()
+    print(f"predictions: {n:,}  rollup_risk_daily rows: {rollup_rows:,}  db: {os.path.getsize(args.db) / 2**20:.0f} MiB")
+    print(f"{'query':<28}{'raw scan ms':>14}{'rollups ms':>12}{'speed-up':>10}")
+    for label, raw, rolled in [
+        ("risk counts, all days", lambda: raw_risk_counts(conn), lambda: rollups.risk_counts(conn)),
+        ("risk counts, last 7 days", lambda: raw_risk_counts(conn, week), lambda: rollups.risk_counts(conn, week)),
+        ("score histogram, all days", lambda: raw_histogram(conn), lambda: rollups.score_histogram(conn)),
+        ("score histogram, 7 days", lambda: raw_histogram(conn, week), lambda: rollups.score_histogram(conn, week)),
+    ]:
+        t_raw, t_rollup = _time(raw, args.repeats), _time(rolled, args.repeats * 10)
+        print(f"{label:<28}{t_raw:>14.1f}{t_rollup:>12.2f}{t_raw / t_rollup:>9.0f}x")
+    conn.close()
+
+    plain = _insert_cost(args.db, trigger=False, requests=args.insert_requests, seed=args.seed + 1)
+    triggered = _insert_cost(args.db, trigger=True, requests=args.insert_requests, seed=args.seed + 1)
+    print(f"insert, 5 rows per request: {plain:.3f} ms without trigger, {triggered:.3f} ms with trigger")
+    if not args.keep:
+        for path in filter(os.path.exists, scratch):
+            os.remove(path)
@@ -0,0 +1,126 @@
+# backend/benchmarks/bench_schema.py
+"""
+Per-request input handling: the typed decoder (input_schema.py) vs. the template merge
++ pandas coercion it replaces, from the request body up to the five aligned model
+DataFrames (preprocessors and models excluded, they are the same for both).
+
+    legacy   json.loads -> _merge_with_template -> _prepare_dataframe_for_model x 5
+    decoded  json.loads -> decode_input -> SCHEMA.frame x 5
+
+Payload sets: "synthetic" (clean JSON numbers and strings), "csv" (training-set rows,
+Y/N flags as strings) and "form" (every value a string, as the frontend's manual
+inputs send them, plus some of its field names the template does not know).
+
+Checks, per payload and model:
+  - parity: the decoded frame transforms to exactly the matrix the legacy pandas path
+    builds from the same decoded row
+  - changed: payloads whose model input differs from the legacy merge of the raw
+    payload, i.e. values the old path dropped or zeroed (with the reported fields)
+Exits 1 if parity fails or decoding is not faster than the legacy path.
+
+Usage (from backend/):
+    python benchmarks/bench_schema.py [--payloads 300] [--repeats 3]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import warnings
+from collections import Counter
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Frontend field names (pages/Prediction.jsx) that are not template fields
+_FORM_EXTRAS = {"CK_MB": "2.1", "cigsPerDay": "10", "BP_Medications": "No", "Fasting_bs": "1",
+                "Region": "North", "Weight": "80", "Length": "175"}
+
+def form_payloads(base):
+    """Every value as a string, as typed into the frontend form, plus frontend-only names."""
+    rng = random.Random(1)
+    out = []
+    for p in base:
+        form = {k: str(v) for k, v in p.items()}
+        form.update({k: v for k, v in _FORM_EXTRAS.items() if rng.random() < 0.5})
+        out.append(form)
+    return out
+
+def _bodies(payloads):
+    return [json.dumps({"email": "bench@example.com", "data": p}).encode() for p in payloads]
+
+def legacy(main, body):
+    merged = main._merge_with_template(json.loads(body)["data"])
+    return {n: main._prepare_dataframe_for_model(merged, a, n) for n, a in main.MODELS.items()}
+
+def decoded(main, body):
+    row, _ = main.decode_input(json.loads(body)["data"])
+    return {n: main._prepare_dataframe_for_model(row, a, n) for n, a in main.MODELS.items()}
+
+def _time(fn, main, bodies, repeats: int):
+    per_request = []
+    for _ in range(repeats):
+        for body in bodies:
+            t0 = time.perf_counter()
+            fn(main, body)
+            per_request.append(time.perf_counter() - t0)
+    per_request.sort()
+    return {"mean_us": float(np.mean(per_request)) * 1e6, "p50_us": per_request[len(per_request) // 2] * 1e6,
+            "p99_us": per_request[int(len(per_request) * 0.99)] * 1e6}
+
+def check(main, payloads):
+    """(parity failures, changed payloads, Counter of reported field problems)."""
+    failures, changed, reported = 0, 0, Counter()
+    for p in payloads:
+        row, report = main.decode_input(p)
+        for section in ("errors", "aliased", "ignored"):
+            reported.update(f"{section}:{k}" for k in report[section])
+        merged = main._merge_with_template(p)
+        differs = False
+        for name, assets in main.MODELS.items():
+            pre = assets["preprocessor"]
+            X = pre.transform(main._prepare_dataframe_for_model(row, assets, name))
+            X_pandas = pre.transform(main._prepare_dataframe_for_model(dict(row), assets, name))
+            X_raw = pre.transform(main._prepare_dataframe_for_model(merged, assets, name))
+            if not np.array_equal(np.asarray(X, dtype=float), np.asarray(X_pandas, dtype=float)):
+                failures += 1
+                print(f"❌ parity: {name} differs for {p}")
+            differs |= not np.array_equal(np.asarray(X, dtype=float), np.asarray(X_raw, dtype=float))
+        changed += differs
+    return failures, changed, reported
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payloads", type=int, default=300, help="payloads per set")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ.setdefault("INPUT_SCHEMA", "1")
+    import main
+    from sample_payloads import synthetic_payloads, load_csv_payloads
+    if main.SCHEMA is None:
+        sys.exit("INPUT_SCHEMA is disabled; nothing to compare")
+    main.print = lambda *a, **k: None  # column-alignment / merge logging
+    warnings.filterwarnings("ignore", message="Found unknown categories")
+
+    synthetic = synthetic_payloads(args.payloads)
+    sets = {"synthetic": synthetic, "csv": load_csv_payloads(limit=args.payloads), "form": form_payloads(synthetic)}
+
+    ok = True
+    print(f"{'set':>10}{'legacy mean/p99 us':>22}{'decoded mean/p99 us':>22}{'speedup':>9}{'changed':>9}")
+    for name, payloads in sets.items():
+        bodies = _bodies(payloads)
+        old = _time(legacy, main, bodies, args.repeats)
+        new = _time(decoded, main, bodies, args.repeats)
+        failures, changed, reported = check(main, payloads)
+        speedup = old["mean_us"] / new["mean_us"]
+        ok &= failures == 0 and speedup > 1
+        print(f"{name:>10}{old['mean_us']:>13.0f} /{old['p99_us']:>7.0f}{new['mean_us']:>13.0f} /{new['p99_us']:>7.0f}"
+              f"{speedup:>8.1f}x{changed:>6}/{len(payloads)}")
+        if reported:
+            print(f"{'':>10}reported: " + ", ".join(f"{k} ({n})" for k, n in reported.most_common(6)))
+    print("✅ decoded path faster, frames identical" if ok else "❌ parity failure or no speedup")
+    sys.exit(0 if ok else 1)
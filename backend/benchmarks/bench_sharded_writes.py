@@ -0,0 +1,90 @@
+# backend/benchmarks/bench_sharded_writes.py
+"""
+Insert throughput of the /predict_all write path vs. number of worker processes, for
+the single users.db layout and for PREDICTION_SHARDS files (database.py).
+
+Each worker process mimics one gunicorn worker storing results: per request it opens
+the user's predictions connection, inserts the five disease rows in one transaction
+(rollup trigger included, as installed by init_db) and closes it. Users are drawn
+uniformly from --users emails.
+
+Usage (from backend/):
+    python benchmarks/bench_sharded_writes.py [--workers 1,2,4,8] [--shards 1,4,8] [--requests 2000]
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import multiprocessing as mp
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import database
+
+DISEASES = ["stroke", "heart_failure", "hypertension", "heart_attack", "cad"]
+
+def _configure(db_path: str, shards: int):
+    database.DB_NAME = db_path
+    database.PREDICTION_SHARDS = shards
+
+def _worker(db_path: str, shards: int, requests: int, users: int, seed: int, start, out):
+    _configure(db_path, shards)
+    rng = random.Random(seed)
+    latencies = []
+    start.wait()
+    for _ in range(requests):
+        email = f"user{rng.randrange(users)}@example.com"
+        rows = [(email, d, round(rng.uniform(0, 100), 2), "Low") for d in DISEASES]
+        t0 = time.perf_counter()
+        conn = database.get_predictions_connection(email)
+        conn.executemany("INSERT INTO predictions (email, disease_name, score, risk) VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+        conn.close()
+        latencies.append(time.perf_counter() - t0)
+    out.put(latencies)
+
+def run(workers: int, shards: int, requests: int, users: int) -> dict:
+    tmp = tempfile.mkdtemp(prefix="bench_shards_")
+    try:
+        db_path = os.path.join(tmp, "users.db")
+        _configure(db_path, shards)
+        database.init_db()
+        ctx = mp.get_context("fork")
+        start, out = ctx.Event(), ctx.Queue()
+        procs = [ctx.Process(target=_worker, args=(db_path, shards, requests, users, i, start, out))
+                 for i in range(workers)]
+        for p in procs:
+            p.start()
+        time.sleep(0.2)
+        t0 = time.perf_counter()
+        start.set()
+        latencies = sorted(l for _ in procs for l in out.get())
+        elapsed = time.perf_counter() - t0
+        for p in procs:
+            p.join()
+        return {
+            "requests_per_s": len(latencies) / elapsed,
+            "p50_ms": latencies[len(latencies) // 2] * 1000,
+            "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        }
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--shards", default="1,4,8", help="1 = single users.db")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per worker")
+    parser.add_argument("--users", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8}{'shards':>8}{'req/s':>10}{'rows/s':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for workers in map(int, args.workers.split(",")):
+        for shards in map(int, args.shards.split(",")):
+            r = run(workers, shards, args.requests, args.users)
+            print(f"{workers:>8}{shards:>8}{r['requests_per_s']:>10.0f}{r['requests_per_s'] * len(DISEASES):>10.0f}"
+                  f"{r['p50_ms']:>9.2f}{r['p99_ms']:>9.2f}")
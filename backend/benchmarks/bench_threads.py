@@ -0,0 +1,92 @@
+# backend/benchmarks/bench_threads.py
+"""
+Sweep worker-process x thread-per-process splits of the box (threading_config.py) on
+inline scoring throughput and tail latency.
+
+Each configuration "WxT" starts W model processes (like W gunicorn sync workers, one
+request at a time each) with MODEL_PROCESSES=W and THREADS_PER_WORKER=T, so TensorFlow
+and the BLAS pools get T threads apiece. "Wxauto" uses the split threading_config.py
+would pick for W workers; "Wxoff" sets THREAD_CONFIG=0, i.e. every library sizes its
+pools from the full core count in every process (the oversubscribed baseline).
+
+Usage (from backend/):
+    python benchmarks/bench_threads.py [--configs 1xauto,2xauto,4xauto,4xoff,2x2] \
+        [--requests 200] [--batch 1]
+"""
+import os
+import sys
+import time
+import argparse
+import multiprocessing as mp
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import threading_config  # noqa: E402  (no NumPy / TensorFlow; safe in the parent)
+from sample_payloads import synthetic_payloads  # noqa: E402
+
+def _env_for(workers: int, threads: str) -> dict:
+    env = {"MODEL_PROCESSES": str(workers), "THREAD_CONFIG": "1", "THREADS_PER_WORKER": ""}
+    if threads == "off":
+        env["THREAD_CONFIG"] = "0"
+    elif threads != "auto":
+        env["THREADS_PER_WORKER"] = threads
+    return env
+
+def _worker(env: dict, requests: int, batch: int, seed: int, ready, start, out):
+    # Runs in a fresh "spawn" interpreter, so the variables land before NumPy / TF load
+    for var in threading_config.BLAS_ENV_VARS + ("TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"):
+        os.environ.pop(var, None)
+    os.environ.update(env)
+    threading_config.ENABLED = env["THREAD_CONFIG"] == "1"  # module was imported before the update
+    import main
+    main.print = lambda *a, **k: None  # keep logging out of the measurement
+    payloads = synthetic_payloads(requests * batch, seed=seed)
+    main.predict_all_diseases_batch(payloads[:batch])  # warm-up / tracing
+    ready.put(threading_config.effective_settings().get("tensorflow"))
+    start.wait()
+    latencies = []
+    for i in range(requests):
+        t0 = time.perf_counter()
+        main.predict_all_diseases_batch(payloads[i * batch:(i + 1) * batch])
+        latencies.append(time.perf_counter() - t0)
+    out.put(latencies)
+
+def run(workers: int, threads: str, requests: int, batch: int) -> dict:
+    ctx = mp.get_context("spawn")
+    ready, start, out = ctx.Queue(), ctx.Event(), ctx.Queue()
+    env = _env_for(workers, threads)
+    procs = [ctx.Process(target=_worker, args=(env, requests, batch, i, ready, start, out))
+             for i in range(workers)]
+    for p in procs:
+        p.start()
+    tf_pools = [ready.get() for _ in procs][0]
+    t0 = time.perf_counter()
+    start.set()
+    latencies = sorted(l for _ in procs for l in out.get())
+    elapsed = time.perf_counter() - t0
+    for p in procs:
+        p.join()
+    return {
+        "tf": tf_pools,
+        "patients_per_s": len(latencies) * batch / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", default="1xauto,2xauto,4xauto,4xoff,2x2",
+                        help="comma-separated WxT; T is a number, 'auto' or 'off'")
+    parser.add_argument("--requests", type=int, default=200, help="requests per worker")
+    parser.add_argument("--batch", type=int, default=1, help="patients per request")
+    args = parser.parse_args()
+
+    cpus = threading_config.detect_cpus()
+    print(f"cores: {cpus['available']} available (affinity {cpus['affinity']}, cgroup quota {cpus['cgroup_quota']})")
+    print(f"{'config':>10}{'tf intra/inter':>16}{'patients/s':>12}{'p50 ms':>9}{'p99 ms':>9}")
+    for config in args.configs.split(","):
+        workers, threads = config.split("x")
+        r = run(int(workers), threads, args.requests, args.batch)
+        pools = f"{r['tf']['intra_op']}/{r['tf']['inter_op']}" if r["tf"] else "default"
+        print(f"{config:>10}{pools:>16}{r['patients_per_s']:>12.1f}{r['p50_ms']:>9.2f}{r['p99_ms']:>9.2f}")
@@ -0,0 +1,244 @@
+# backend/benchmarks/loadtest.py
+"""
+Load generator for the backend API (/predict_all, /login, /signup).
+
+Targets
+  --url http://127.0.0.1:8000   a running server (gunicorn, uvicorn, flask run)
+  --flask-client                app.test_client() in this process (no network)
+
+Modes
+  closed : N virtual users, each sends its next request as soon as the last one returns
+           (sweep N with --concurrency 1,2,4,8)
+  open   : requests arrive as a Poisson process at a fixed rate regardless of how fast the
+           server answers (sweep the rate with --rates 5,10,20); latency is measured from the
+           scheduled send time so queueing delay is not hidden
+
+Results (throughput and latency percentiles per level, per endpoint) are written as JSON;
+pass --baseline to compare against an earlier run.
+
+Usage (from backend/):
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000 --mode closed --concurrency 1,4,16 --duration 20
+    python benchmarks/loadtest.py --flask-client --mode open --rates 5,10,20 --payloads csv
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlparse
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from sample_payloads import load_csv_payloads, synthetic_payloads  # noqa: E402
+
+# ---------------------------------------------------------------------
+# Targets
+# ---------------------------------------------------------------------
+class HttpTarget:
+    """Keep-alive HTTP connection per thread."""
+    def __init__(self, base_url: str):
+        u = urlparse(base_url)
+        self.host, self.port = u.hostname, u.port or 80
+        self._local = threading.local()
+        self.name = base_url
+
+    def post(self, path: str, body: dict) -> int:
+        data = json.dumps(body).encode()
+        for attempt in range(2):
+            conn = getattr(self._local, "conn", None)
+            if conn is None:
+                conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                conn.request("POST", path, body=data, headers={"Content-Type": "application/json"})
+                resp = conn.getresponse()
+                resp.read()
+                return resp.status
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                self._local.conn = None
+                if attempt == 1:
+                    raise
+
+class FlaskClientTarget:
+    """In-process app.test_client(); exercises the full Flask stack without a socket."""
+    def __init__(self):
+        from app import app
+        self.app = app
+        self._local = threading.local()
+        self.name = "flask-test-client"
+
+    def post(self, path: str, body: dict) -> int:
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        return client.post(path, json=body).status_code
+
+# ---------------------------------------------------------------------
+# Request mix
+# ---------------------------------------------------------------------
+class Workload:
+    def __init__(self, payloads, mix, seed=0):
+        self.payloads = payloads
+        self.endpoints, weights = zip(*mix.items())
+        self.weights = weights
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.users = [{"email": f"loadtest-{i}@example.com", "password": "loadtest-pw"} for i in range(16)]
+
+    def setup(self, target):
+        # make sure the /login users exist; 409 (already there) is fine
+        for u in self.users:
+            target.post("/signup", {"username": "loadtest", **u})
+
+    def next_request(self):
+        with self.lock:
+            endpoint = self.rng.choices(self.endpoints, self.weights)[0]
+            if endpoint == "predict_all":
+                return "/predict_all", {"data": self.rng.choice(self.payloads)}
+            if endpoint == "login":
+                return "/login", dict(self.rng.choice(self.users))
+            return "/signup", {"username": "loadtest", "email": f"lt-{uuid.uuid4().hex}@example.com",
+                               "password": "loadtest-pw"}
+
+def _summarise(samples, wall: float):
+    """samples: list of (endpoint, latency_s, status)"""
+    def stats(rows):
+        lat = sorted(l for _, l, _ in rows)
+        pct = lambda q: round(lat[min(len(lat) - 1, int(q * len(lat)))] * 1000, 2) if lat else None
+        return {
+            "requests": len(rows),
+            "errors": sum(1 for _, _, s in rows if s is None or s >= 500),
+            "throughput_rps": round(len(rows) / wall, 2) if wall else 0.0,
+            "p50_ms": pct(0.50), "p90_ms": pct(0.90), "p95_ms": pct(0.95), "p99_ms": pct(0.99),
+            "max_ms": round(lat[-1] * 1000, 2) if lat else None,
+        }
+    out = stats(samples)
+    out["by_endpoint"] = {ep: stats([s for s in samples if s[0] == ep]) for ep in sorted({s[0] for s in samples})}
+    return out
+
+def _issue(target, workload, samples, scheduled=None):
+    path, body = workload.next_request()
+    t0 = scheduled if scheduled is not None else time.perf_counter()
+    try:
+        status = target.post(path, body)
+    except Exception:
+        status = None
+    samples.append((path, time.perf_counter() - t0, status))
+
+# ---------------------------------------------------------------------
+# Closed / open loop drivers
+# ---------------------------------------------------------------------
+def run_closed(target, workload, concurrency: int, duration: float):
+    samples, stop = [], threading.Event()
+
+    def user():
+        while not stop.is_set():
+            _issue(target, workload, samples)
+
+    threads = [threading.Thread(target=user, daemon=True) for _ in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    return dict(_summarise(samples, time.perf_counter() - t0), mode="closed", concurrency=concurrency)
+
+def run_open(target, workload, rate: float, duration: float, max_outstanding: int = 256, seed: int = 0):
+    samples, rng = [], random.Random(seed)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_outstanding) as pool:
+        next_at = t0
+        while next_at - t0 < duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(_issue, target, workload, samples, next_at)
+            next_at += rng.expovariate(rate)
+    wall = time.perf_counter() - t0
+    return dict(_summarise(samples, wall), mode="open", offered_rps=rate)
+
+# ---------------------------------------------------------------------
+# Regression comparison
+# ---------------------------------------------------------------------
+def compare(current: dict, baseline: dict):
+    key = lambda lvl: (lvl["mode"], lvl.get("concurrency"), lvl.get("offered_rps"))
+    base = {key(l): l for l in baseline["levels"]}
+    for lvl in current["levels"]:
+        old = base.get(key(lvl))
+        if not old:
+            continue
+        d = lambda f: (lvl[f] - old[f]) / old[f] * 100 if old.get(f) and lvl.get(f) is not None else float("nan")
+        print(f"{key(lvl)}: throughput {d('throughput_rps'):+.1f}%  p50 {d('p50_ms'):+.1f}%  p99 {d('p99_ms'):+.1f}%")
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target_group = parser.add_mutually_exclusive_group(required=True)
+    target_group.add_argument("--url")
+    target_group.add_argument("--flask-client", action="store_true")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="closed-loop levels")
+    parser.add_argument("--rates", default="2,5,10,20", help="open-loop arrival rates (req/s)")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per level")
+    parser.add_argument("--payloads", choices=["synthetic", "csv"], default="synthetic")
+    parser.add_argument("--mix", default="predict_all=8,login=1,signup=1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON results file (default: loadtest_results/<ts>.json)")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    payloads = load_csv_payloads(limit=5000, seed=args.seed) if args.payloads == "csv" else synthetic_payloads(5000, args.seed)
+    mix = {k: float(v) for k, v in (item.split("=") for item in args.mix.split(","))}
+    target = HttpTarget(args.url) if args.url else FlaskClientTarget()
+    workload = Workload(payloads, mix, args.seed)
+    if "login" in mix:
+        workload.setup(target)
+
+    levels = []
+    if args.mode == "closed":
+        for c in [int(x) for x in args.concurrency.split(",")]:
+            levels.append(run_closed(target, workload, c, args.duration))
+            print(json.dumps({k: v for k, v in levels[-1].items() if k != "by_endpoint"}))
+    else:
+        for r in [float(x) for x in args.rates.split(",")]:
+            levels.append(run_open(target, workload, r, args.duration, seed=args.seed))
+            print(json.dumps({k: v for k, v in levels[-1].items() if k != "by_endpoint"}))
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "target": target.name,
+            "mode": args.mode,
+            "mix": mix,
+            "payloads": args.payloads,
+            "duration_s": args.duration,
+        },
+        "levels": levels,
+    }
+    output = args.output or os.path.join(BACKEND_DIR, "loadtest_results",
+                                         datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
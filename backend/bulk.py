@@ -0,0 +1,213 @@
+# backend/bulk.py
+"""
+Bulk scoring over one streaming HTTP exchange (POST /predict_bulk).
+
+The request body is an NDJSON (one patient object per line, optionally wrapped as
+{"data": {...}} like /predict_all) or CSV (header line, then one patient per line;
+empty cells are left to the model defaults) upload of any length, typically sent with
+Transfer-Encoding: chunked. It is read BULK_READ_BYTES at a time, split into rows as
+they arrive and scored BULK_BATCH_ROWS at a time with predict_all_diseases_batch()
+(all five models, one call per model per batch). Every finished batch goes out
+immediately as NDJSON, one line per input row, in input order:
+
+    {"row": 1, "id": "p-001", "predictions": {...}}     # id echoed if the row has one
+    {"row": 2, "error": "line is not a JSON object"}
+    ...
+    {"summary": {"rows": 2, "scored": 1, "errors": 1, "batches": 1, "seconds": 0.12}}
+
+Backpressure: the response body is a generator, and the next piece of the upload is
+only read when the server asks that generator for more output, i.e. after the previous
+batch's results were written to the client socket. A slow reader therefore stalls the
+upload (TCP flow control pushes back on the sender) instead of results piling up in
+memory; at most one read buffer, one batch of rows and one batch of results are held
+per request, whatever the file size.
+
+A stream stops early with {"error": ..., "summary": {...}} as its last line on an
+over-long line (BULK_MAX_LINE_BYTES), after BULK_MAX_ROWS rows (0 = no limit), or if
+no admission slot frees up within BULK_ADMISSION_WAIT_S for a batch; rows up to
+summary.rows were answered, so a client can resume after them. Bulk results are not
+stored in the prediction history. CSV records must not contain line breaks.
+"""
+import io
+import os
+import csv
+import json
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+BATCH_ROWS = int(os.getenv("BULK_BATCH_ROWS", 64))
+READ_BYTES = int(os.getenv("BULK_READ_BYTES", 64 * 1024))
+MAX_LINE_BYTES = int(os.getenv("BULK_MAX_LINE_BYTES", 1024 * 1024))
+MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", 0))
+ADMISSION_WAIT_S = float(os.getenv("BULK_ADMISSION_WAIT_S", 10))
+ID_FIELD = os.getenv("BULK_ID_FIELD", "id")
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+_CONTENT_TYPES = {"application/x-ndjson": "ndjson", "application/jsonl": "ndjson", "application/json": "ndjson",
+                  "text/csv": "csv", "application/csv": "csv"}
+
+class BulkAborted(Exception):
+    """Stops the stream; the message becomes the final error line."""
+
+def parse_format(args, content_type: Optional[str]) -> str:
+    """?format= if given, else from the Content-Type (default ndjson); raises ValueError."""
+    fmt = args.get("format")
+    if fmt is None:
+        fmt = _CONTENT_TYPES.get((content_type or "").split(";")[0].strip().lower(), "ndjson")
+    fmt = fmt.lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format {fmt!r} (expected one of {tuple(FORMATS)})")
+    return fmt
+
+def _cell(value: str):
+    """CSV cell -> int / float / str; None for empty (the field is then left out)."""
+    value = value.strip()
+    if value == "":
+        return None
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+# ---------------------------------------------------------------------
+# Incremental parser + batch scorer
+# ---------------------------------------------------------------------
+class BulkScorer:
+    def __init__(self, fmt: str, predict_batch: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+                 batch_rows: int = BATCH_ROWS, max_rows: int = MAX_ROWS, max_line_bytes: int = MAX_LINE_BYTES,
+                 observe: Callable[[Dict[str, Any]], None] = None, clock: Callable[[], float] = time.monotonic):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown format {fmt!r}")
+        self.fmt = fmt
+        self.batch_rows = max(1, batch_rows)
+        self.max_rows = max_rows
+        self.max_line_bytes = max_line_bytes
+        self._predict_batch = predict_batch
+        self._observe = observe
+        self._clock = clock
+        self._started = clock()
+        self._buffer = b""
+        self._header: Optional[List[str]] = None
+        self._pending: List[Tuple[int, Any, Any]] = []   # (row, id, payload or error message)
+        self.rows = self.scored = self.errors = self.batches = 0
+
+    def feed(self, chunk: bytes) -> Iterator[bytes]:
+        """Consume the next piece of the upload; yields one NDJSON chunk per full batch."""
+        self._buffer += chunk
+        while True:
+            end = self._buffer.find(b"\n")
+            if end < 0:
+                if len(self._buffer) > self.max_line_bytes:
+                    yield from self._drain()
+                    raise BulkAborted(f"row {self.rows + 1} is longer than {self.max_line_bytes} bytes")
+                return
+            line, self._buffer = self._buffer[:end], self._buffer[end + 1:]
+            yield from self._line(line)
+
+    def finish(self) -> Iterator[bytes]:
+        """End of upload: the last partial line and batch, then the summary line."""
+        if self._buffer:
+            line, self._buffer = self._buffer, b""
+            yield from self._line(line)
+        yield from self._drain()
+        yield self._json({"summary": self.summary()})
+
+    def abort(self, message: str) -> bytes:
+        """Final line when the stream stops early; rows still pending are not answered."""
+        line = self._json({"error": message, "summary": self.summary()})
+        self._pending = []
+        return line
+
+    def summary(self) -> Dict[str, Any]:
+        return {"rows": self.rows - len(self._pending), "scored": self.scored, "errors": self.errors,
+                "batches": self.batches, "seconds": round(self._clock() - self._started, 3)}
+
+    # -----------------------------------------------------------------
+    def _line(self, line: bytes) -> Iterator[bytes]:
+        line = line.rstrip(b"\r")
+        if not line.strip():
+            return
+        if self.fmt == "csv" and self._header is None:
+            self._header = [h.strip() for h in next(csv.reader([line.decode("utf-8-sig")]))]
+            return
+        if self.max_rows and self.rows >= self.max_rows:
+            yield from self._drain()
+            raise BulkAborted(f"more than BULK_MAX_ROWS={self.max_rows} rows")
+        self.rows += 1
+        try:
+            self._pending.append((self.rows,) + self._parse(line))
+        except ValueError as e:
+            self._pending.append((self.rows, None, str(e)))
+        if len(self._pending) >= self.batch_rows:
+            yield self._flush()
+
+    def _parse(self, line: bytes) -> Tuple[Any, Dict[str, Any]]:
+        try:
+            text = line.decode("utf-8")
+        except UnicodeDecodeError:
+            raise ValueError("line is not valid UTF-8")
+        if self.fmt == "csv":
+            cells = next(csv.reader([text]))
+            if len(cells) != len(self._header):
+                raise ValueError(f"expected {len(self._header)} fields, got {len(cells)}")
+            payload = {k: v for k, v in ((k, _cell(c)) for k, c in zip(self._header, cells)) if v is not None}
+        else:
+            try:
+                payload = json.loads(text)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"invalid JSON: {e.msg}")
+            if not isinstance(payload, dict):
+                raise ValueError("line is not a JSON object")
+            if isinstance(payload.get("data"), dict):
+                payload = dict(payload["data"], **({ID_FIELD: payload[ID_FIELD]} if ID_FIELD in payload else {}))
+        return payload.pop(ID_FIELD, None), payload
+
+    def _drain(self) -> Iterator[bytes]:
+        if self._pending:
+            yield self._flush()
+
+    def _flush(self) -> bytes:
+        batch, self._pending = self._pending, []
+        payloads = [entry for _, _, entry in batch if isinstance(entry, dict)]
+        if payloads:
+            if self._observe is not None:
+                for payload in payloads:
+                    self._observe(payload)
+            try:
+                results = iter(self._predict_batch(payloads))
+            except BulkAborted:
+                self._pending = batch   # not answered; excluded from summary.rows
+                raise
+            except Exception as e:
+                results = iter([{"error": str(e)}] * len(payloads))
+        out = io.StringIO()
+        for row, row_id, entry in batch:
+            line = {"row": row}
+            if row_id is not None:
+                line["id"] = row_id
+            line.update(next(results) if isinstance(entry, dict) else {"error": entry})
+            if "error" in line:
+                self.errors += 1
+            else:
+                self.scored += 1
+            out.write(json.dumps(line) + "\n")
+        self.batches += 1
+        return out.getvalue().encode()
+
+    @staticmethod
+    def _json(obj) -> bytes:
+        return (json.dumps(obj) + "\n").encode()
+
+def stream(read: Callable[[int], bytes], scorer: BulkScorer, read_bytes: int = READ_BYTES) -> Iterator[bytes]:
+    """Response body for a blocking upload stream (`read(n)`, e.g. the WSGI input)."""
+    try:
+        while True:
+            chunk = read(read_bytes)
+            if not chunk:
+                break
+            yield from scorer.feed(chunk)
+        yield from scorer.finish()
+    except BulkAborted as e:
+        yield scorer.abort(str(e))
@@ -1,25 +1,65 @@
 # backend/database.py
+import os
+import zlib
 import sqlite3
 
+import rollups
+import outcomes
+
 DB_NAME = "users.db"
 
+# Optional sharding of the predictions table across PREDICTION_SHARDS SQLite files
+# (users.predictions-<i>.db next to users.db), chosen by a stable hash of the email, so
+# concurrent workers writing for different users do not queue on one write lock. With
+# the default of 1, predictions live in users.db as before. The users table always
+# stays in users.db. Changing the shard count needs the data moved; shard files are not
+# rebalanced automatically.
+PREDICTION_SHARDS = max(1, int(os.getenv("PREDICTION_SHARDS", 1)))
+
 def get_db_connection():
     conn = sqlite3.connect(DB_NAME)
     conn.row_factory = sqlite3.Row
     return conn
 
-def init_db():
-    conn = get_db_connection()
-    cursor = conn.cursor()
+async def get_async_db_connection():
+    """aiosqlite counterpart of get_db_connection() for the ASGI app (asgi_app.py)."""
+    import aiosqlite
+    conn = await aiosqlite.connect(DB_NAME)
+    conn.row_factory = aiosqlite.Row
+    return conn
 
-    # Create users table (if not exists)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            email TEXT PRIMARY KEY,
-            username TEXT NOT NULL,
-            password TEXT NOT NULL
-        )
-    ''')
+def shard_for(email: str) -> int:
+    return zlib.crc32(email.encode()) % PREDICTION_SHARDS
+
+def shard_path(shard: int) -> str:
+    if PREDICTION_SHARDS == 1:
+        return DB_NAME
+    base, ext = os.path.splitext(DB_NAME)
+    return f"{base}.predictions-{shard}{ext or '.db'}"
+
+def get_predictions_connection(email: str = None, shard: int = None):
+    """Connection to the file holding `email`'s predictions (or shard number `shard`)."""
+    conn = sqlite3.connect(shard_path(shard_for(email) if shard is None else shard))
+    conn.row_factory = sqlite3.Row
+    return conn
+
+async def get_async_predictions_connection(email: str):
+    import aiosqlite
+    conn = await aiosqlite.connect(shard_path(shard_for(email)))
+    conn.row_factory = aiosqlite.Row
+    return conn
+
+def prediction_shards():
+    """(shard, connection) for every predictions file, for fan-out reads and maintenance;
+    the caller closes the connections."""
+    return [(i, get_predictions_connection(shard=i)) for i in range(PREDICTION_SHARDS)]
+
+def _init_predictions(conn):
+    cursor = conn.cursor()
+    # WAL: readers (exports, dashboards, maintenance.py) do not block inserts.
+    # auto_vacuum only takes effect on a new file; see maintenance.py for existing ones.
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    cursor.execute("PRAGMA journal_mode = WAL")
 
     # Create predictions table
     cursor.execute('''
@@ -33,5 +73,40 @@ def init_db():
         )
     ''')
 
+    # One user's history in id order (export.py keyset paging)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_predictions_email_id ON predictions (email, id)")
+    # Day ranges for retention / downsampling (maintenance.py)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_predictions_timestamp ON predictions (timestamp)")
+
     conn.commit()
+
+    # Dashboard rollups (rollups.py): tables plus the insert trigger or compaction watermark
+    rollups.install(conn)
+    # Feature snapshots + outcome labels for retraining (outcomes.py)
+    outcomes.install(conn)
+
+def init_db():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    cursor.execute("PRAGMA journal_mode = WAL")
+
+    # Create users table (if not exists)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            email TEXT PRIMARY KEY,
+            username TEXT NOT NULL,
+            password TEXT NOT NULL
+        )
+    ''')
+    conn.commit()
+
+    if PREDICTION_SHARDS == 1:
+        _init_predictions(conn)
     conn.close()
+
+    if PREDICTION_SHARDS > 1:
+        for _, shard in prediction_shards():
+            _init_predictions(shard)
+            shard.close()
@@ -0,0 +1,303 @@
+# backend/drift.py
+"""
+Streaming input-drift monitor for /predict_all.
+
+For every frontend field that one of the training datasets provides, the monitor keeps
+in bounded memory:
+  - Welford running mean / variance, min / max   (numeric fields)
+  - a fixed-bin histogram on the reference quantile edges, which doubles as a quantile
+    sketch (p5 / p50 / p95 by interpolation) and feeds the PSI
+  - category counts, capped at MAX_CATEGORIES + "__other__"   (categorical fields)
+  - default-fill rate: how often the field was missing from the request, so the model
+    saw the master_input_template default instead (e.g. glucose_level = 90)
+
+observe() is O(1) per field. State is split into DRIFT_SHARDS shards, each thread being
+assigned one round-robin on its first call, each with its own lock, so concurrent requests do not serialise on one lock;
+report() merges the shards (Chan et al. parallel variance).
+
+Reference profiles are computed once from the model_training/models/*.csv datasets
+(via sample_payloads.py) and cached in drift_reference.json; rebuild with
+    python drift.py --build-reference
+
+Per disease, report() compares live histograms with that disease's own training
+dataset: PSI per field, mean shift in reference standard deviations, fill rate. The
+disease score is the largest PSI over its fields (< 0.1 stable, < 0.25 moderate,
+otherwise major); fields the template filled in at least DRIFT_FILL_ALERT (default 0.5)
+of requests are listed under default_filled.
+"""
+import os
+import json
+import math
+import bisect
+import itertools
+import threading
+from typing import Any, Dict, List, Optional
+
+from sample_payloads import DATASETS, iter_csv_payloads
+
+REFERENCE_PATH = os.getenv("DRIFT_REFERENCE_PATH",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), "drift_reference.json"))
+SHARDS = int(os.getenv("DRIFT_SHARDS", 8))
+MAX_CATEGORIES = 32
+QUANTILE_EDGES = [i / 20 for i in range(1, 20)]   # 5% steps -> up to 20 bins
+PSI_EPS = 1e-4
+PSI_MODERATE, PSI_MAJOR = 0.1, 0.25
+MIN_OBSERVATIONS = 50
+FILL_ALERT = float(os.getenv("DRIFT_FILL_ALERT", 0.5))
+
+def _as_number(value) -> Optional[float]:
+    if isinstance(value, bool):
+        return float(value)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+# ---------------------------------------------------------------------
+# Reference profiles (computed once from the training CSVs)
+# ---------------------------------------------------------------------
+def _quantile(sorted_values: List[float], q: float) -> float:
+    pos = q * (len(sorted_values) - 1)
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+def _histogram(values, edges) -> List[int]:
+    counts = [0] * (len(edges) + 1)
+    for v in values:
+        counts[bisect.bisect_right(edges, v)] += 1
+    return counts
+
+def build_reference() -> Dict[str, Any]:
+    """{"fields": {field: {"kind", "edges"}}, "diseases": {disease: {field: profile}}}."""
+    values: Dict[str, Dict[str, list]] = {}
+    for disease in DATASETS:
+        values[disease] = {}
+        for payload in iter_csv_payloads(disease):
+            for field, value in payload.items():
+                values[disease].setdefault(field, []).append(value)
+
+    pooled: Dict[str, list] = {}
+    for per_field in values.values():
+        for field, vals in per_field.items():
+            pooled.setdefault(field, []).extend(vals)
+
+    fields = {}
+    for field, vals in pooled.items():
+        numbers = [n for n in map(_as_number, vals) if n is not None]
+        if len(numbers) >= 0.95 * len(vals) and len(set(numbers)) > 2:
+            ordered = sorted(numbers)
+            edges = sorted({round(_quantile(ordered, q), 6) for q in QUANTILE_EDGES})
+            fields[field] = {"kind": "numeric", "edges": edges}
+        else:
+            fields[field] = {"kind": "categorical"}
+
+    diseases = {}
+    for disease, per_field in values.items():
+        diseases[disease] = {}
+        for field, vals in per_field.items():
+            spec = fields[field]
+            if spec["kind"] == "numeric":
+                numbers = [n for n in map(_as_number, vals) if n is not None]
+                mean = sum(numbers) / len(numbers)
+                var = sum((n - mean) ** 2 for n in numbers) / max(1, len(numbers) - 1)
+                diseases[disease][field] = {"n": len(numbers), "mean": mean, "std": math.sqrt(var),
+                                            "hist": _histogram(numbers, spec["edges"])}
+            else:
+                counts: Dict[str, int] = {}
+                for v in vals:
+                    counts[str(v)] = counts.get(str(v), 0) + 1
+                diseases[disease][field] = {"n": len(vals), "counts": counts}
+    return {"fields": fields, "diseases": diseases}
+
+def load_reference(path: str = REFERENCE_PATH) -> Dict[str, Any]:
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    reference = build_reference()
+    try:
+        with open(path, "w") as f:
+            json.dump(reference, f)
+    except OSError:
+        pass  # read-only deploy: keep the in-memory copy
+    return reference
+
+# ---------------------------------------------------------------------
+# Live statistics
+# ---------------------------------------------------------------------
+class _Shard:
+    __slots__ = ("lock", "requests", "stats")
+
+    def __init__(self, fields: Dict[str, Any]):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.stats = {}
+        for field, spec in fields.items():
+            if spec["kind"] == "numeric":
+                self.stats[field] = {"n": 0, "mean": 0.0, "m2": 0.0, "min": math.inf, "max": -math.inf,
+                                     "hist": [0] * (len(spec["edges"]) + 1), "filled": 0, "invalid": 0}
+            else:
+                self.stats[field] = {"n": 0, "counts": {}, "filled": 0}
+
+class DriftMonitor:
+    def __init__(self, reference: Dict[str, Any] = None, shards: int = SHARDS):
+        self.reference = reference if reference is not None else load_reference()
+        self.fields = self.reference["fields"]
+        self._n_shards = max(1, shards)
+        self._shards = [_Shard(self.fields) for _ in range(self._n_shards)]
+        # thread idents are aligned addresses (ident % n is always 0): deal shards out instead
+        self._next_shard = itertools.count()
+        self._local = threading.local()
+
+    def _shard_index(self) -> int:
+        index = getattr(self._local, "shard", None)
+        if index is None:
+            index = self._local.shard = next(self._next_shard) % self._n_shards
+        return index
+
+    def observe(self, payload: Dict[str, Any]):
+        """Record one raw request payload (before merging with the template)."""
+        if not isinstance(payload, dict):
+            return
+        shard = self._shards[self._shard_index()]
+        with shard.lock:
+            shard.requests += 1
+            for field, spec in self.fields.items():
+                st = shard.stats[field]
+                value = payload.get(field)
+                if value is None or value == "":
+                    st["filled"] += 1
+                    continue
+                if spec["kind"] == "categorical":
+                    key = str(value)
+                    counts = st["counts"]
+                    if key not in counts and len(counts) >= MAX_CATEGORIES:
+                        key = "__other__"
+                    counts[key] = counts.get(key, 0) + 1
+                    st["n"] += 1
+                    continue
+                x = _as_number(value)
+                if x is None:
+                    st["invalid"] += 1
+                    continue
+                st["n"] += 1
+                delta = x - st["mean"]
+                st["mean"] += delta / st["n"]
+                st["m2"] += delta * (x - st["mean"])
+                if x < st["min"]:
+                    st["min"] = x
+                if x > st["max"]:
+                    st["max"] = x
+                st["hist"][bisect.bisect_right(spec["edges"], x)] += 1
+
+    def reset(self):
+        self._shards = [_Shard(self.fields) for _ in range(self._n_shards)]
+
+    def _merged(self):
+        """Snapshot of all shards combined into one set of per-field statistics."""
+        requests, merged = 0, {}
+        for shard in self._shards:
+            with shard.lock:
+                requests += shard.requests
+                for field, st in shard.stats.items():
+                    m = merged.get(field)
+                    if m is None:
+                        merged[field] = json.loads(json.dumps(st)) if "counts" in st else dict(st, hist=list(st["hist"]))
+                        continue
+                    m["filled"] += st["filled"]
+                    if "counts" in st:
+                        m["n"] += st["n"]
+                        for k, c in st["counts"].items():
+                            m["counts"][k] = m["counts"].get(k, 0) + c
+                        continue
+                    m["invalid"] += st["invalid"]
+                    n = m["n"] + st["n"]
+                    if st["n"]:
+                        delta = st["mean"] - m["mean"]
+                        m["m2"] += st["m2"] + delta * delta * m["n"] * st["n"] / n
+                        m["mean"] += delta * st["n"] / n
+                        m["min"], m["max"] = min(m["min"], st["min"]), max(m["max"], st["max"])
+                        m["hist"] = [a + b for a, b in zip(m["hist"], st["hist"])]
+                    m["n"] = n
+        return requests, merged
+
+    # -----------------------------------------------------------------
+    # Report
+    # -----------------------------------------------------------------
+    @staticmethod
+    def _psi(expected: List[float], actual: List[float]) -> float:
+        e_total, a_total = sum(expected), sum(actual)
+        psi = 0.0
+        for e, a in zip(expected, actual):
+            p = max(e / e_total, PSI_EPS)
+            q = max(a / a_total, PSI_EPS)
+            psi += (q - p) * math.log(q / p)
+        return psi
+
+    def _quantiles(self, st, edges) -> Dict[str, float]:
+        """p5 / p50 / p95 from the histogram, interpolating inside bins; the open tail
+        bins are bounded by the observed min / max."""
+        bounds = [st["min"]] + list(edges) + [st["max"]]
+        out, seen = {}, 0
+        targets = {"p5": 0.05, "p50": 0.5, "p95": 0.95}
+        for i, count in enumerate(st["hist"]):
+            for name, q in targets.items():
+                if name not in out and count and seen + count >= q * st["n"]:
+                    lo, hi = bounds[i], max(bounds[i], bounds[i + 1])
+                    out[name] = round(lo + (hi - lo) * (q * st["n"] - seen) / count, 4)
+            seen += count
+        return out
+
+    def _field_report(self, field: str, live, ref) -> Dict[str, Any]:
+        requests = live["n"] + live["filled"] + live.get("invalid", 0)
+        row = {"n": live["n"], "fill_rate": round(live["filled"] / requests, 4) if requests else None}
+        if live["n"] < MIN_OBSERVATIONS:
+            row["psi"] = None
+            return row
+        if "counts" in live:
+            keys = sorted(set(ref["counts"]) | set(live["counts"]))
+            row["psi"] = round(self._psi([ref["counts"].get(k, 0) for k in keys],
+                                         [live["counts"].get(k, 0) for k in keys]), 4)
+            row["top"] = dict(sorted(live["counts"].items(), key=lambda kv: -kv[1])[:5])
+            return row
+        std = math.sqrt(live["m2"] / (live["n"] - 1)) if live["n"] > 1 else 0.0
+        row.update({
+            "psi": round(self._psi(ref["hist"], live["hist"]), 4),
+            "mean": round(live["mean"], 4), "std": round(std, 4),
+            "reference_mean": round(ref["mean"], 4),
+            "mean_shift_sd": round((live["mean"] - ref["mean"]) / ref["std"], 3) if ref["std"] else None,
+            "invalid": live["invalid"],
+            **self._quantiles(live, self.fields[field]["edges"]),
+        })
+        return row
+
+    def report(self) -> Dict[str, Any]:
+        requests, merged = self._merged()
+        diseases = {}
+        for disease, ref_fields in self.reference["diseases"].items():
+            features = {f: self._field_report(f, merged[f], ref) for f, ref in ref_fields.items()}
+            scored = [(row["psi"], f) for f, row in features.items() if row["psi"] is not None]
+            score, worst = max(scored) if scored else (None, None)
+            diseases[disease] = {
+                "score": score,
+                "level": None if score is None else
+                         ("major" if score >= PSI_MAJOR else "moderate" if score >= PSI_MODERATE else "stable"),
+                "worst_field": worst,
+                "default_filled": sorted(f for f, row in features.items()
+                                         if row["fill_rate"] is not None and row["fill_rate"] >= FILL_ALERT),
+                "features": dict(sorted(features.items(), key=lambda kv: -(kv[1]["psi"] or 0))),
+            }
+        return {"requests": requests, "shards": self._n_shards, "min_observations": MIN_OBSERVATIONS,
+                "diseases": diseases}
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Drift reference profiles.")
+    parser.add_argument("--build-reference", action="store_true", help=f"(re)write {REFERENCE_PATH}")
+    args = parser.parse_args()
+    if args.build_reference and os.path.exists(REFERENCE_PATH):
+        os.remove(REFERENCE_PATH)
+    ref = load_reference()
+    print(f"✅ Reference for {len(ref['diseases'])} datasets, {len(ref['fields'])} fields → {REFERENCE_PATH}")
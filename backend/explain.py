@@ -0,0 +1,151 @@
+# backend/explain.py
+"""
+"Why this risk?": per-field attributions for the five MLPs in one vectorised pass.
+
+Gradients of every model's output with respect to its preprocessed inputs are computed
+analytically on the fused weights (fused.py) -- one stacked forward and backward pass
+for all models and all rows, no TensorFlow calls. Two methods:
+
+  ig          integrated gradients from the baseline patient (master_input_template
+              defaults) along a straight path, midpoint rule with `steps` points;
+              attributions add up to score - baseline_score
+  grad_input  gradient x (input - baseline) at the patient itself (cheaper, first order)
+
+Attributions on preprocessed columns are summed back to the model's input columns (all
+one-hot outputs of a categorical field, the scaled output of a numeric one) and reported
+per master_input_template field (a column renamed by main.RENAME_MAP under the template
+key it comes from), in score points (percentage points of risk). Model columns with no
+template field (e.g. cigsPerDay) are reported under their own name, so the attributions
+of a disease always add up to its score difference.
+"""
+import os
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from fused import _ACTIVATIONS, FusedEnsemble
+
+METHODS = ("ig", "grad_input")
+DEFAULT_STEPS = int(os.getenv("EXPLAIN_IG_STEPS", 64))
+
+def parse_method(value) -> str:
+    """?explain= query value -> method name (None when not requested)."""
+    if value is None or str(value).lower() in ("", "0", "false", "no"):
+        return None
+    value = str(value).lower()
+    if value in ("1", "true", "yes"):
+        return "ig"
+    if value not in METHODS:
+        raise ValueError(f"unknown explain method {value!r} (expected one of {METHODS})")
+    return value
+
+def output_groups(preprocessor, columns: List[str]) -> Dict[str, np.ndarray]:
+    """Input column -> indices of the preprocessor output columns derived from it."""
+    if not hasattr(preprocessor, "transformers_"):
+        names = list(getattr(preprocessor, "feature_names_in_", columns))
+        return {col: np.array([i]) for i, col in enumerate(names)}
+
+    groups: Dict[str, List[int]] = {}
+    for name, trans, cols in preprocessor.transformers_:
+        sl = preprocessor.output_indices_.get(name, slice(0, 0))
+        if sl.stop <= sl.start or trans == "drop":
+            continue
+        cols = [columns[c] if isinstance(c, (int, np.integer)) else c for c in cols]
+        if sl.stop - sl.start == len(cols):
+            for i, col in enumerate(cols):
+                groups.setdefault(col, []).append(sl.start + i)
+            continue
+        # e.g. OneHotEncoder: "<col>_<category>" per output
+        out_names = list(trans.get_feature_names_out(cols))
+        by_length = sorted(cols, key=len, reverse=True)
+        for i, out in enumerate(out_names):
+            col = next(c for c in by_length if out == c or out.startswith(f"{c}_"))
+            groups.setdefault(col, []).append(sl.start + i)
+    return {col: np.array(idx) for col, idx in groups.items()}
+
+_DERIVATIVES = {
+    "relu": lambda Z, H: (Z > 0).astype(Z.dtype),
+    "sigmoid": lambda Z, H: H * (1.0 - H),
+    "linear": lambda Z, H: np.ones_like(Z),
+}
+
+class Explainer:
+    def __init__(self, models: Dict[str, Any], prepare: Callable, baseline_row: Dict[str, Any],
+                 fields: List[str], aliases: Dict[str, str] = None):
+        """models: main.MODELS; prepare: main._prepare_dataframe_for_model; baseline_row
+        and fields: master_input_template and its keys; aliases: main.RENAME_MAP."""
+        self.models = {n: a for n, a in models.items() if a.get("family", "mlp") == "mlp"}
+        self.skipped = [n for n in models if n not in self.models]
+        self.prepare = prepare
+        self.fused = FusedEnsemble.from_models({n: a["model"] for n, a in self.models.items()})
+        self.fields = set(fields)
+        # model column -> reported field
+        self.labels = {new: old for old, new in (aliases or {}).items() if old in self.fields and new not in self.fields}
+        self.groups = {n: output_groups(a["preprocessor"], list(a["columns"])) for n, a in self.models.items()}
+        self.baseline = self._transform([baseline_row])
+
+    def _transform(self, rows: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        return {n: np.asarray(a["preprocessor"].transform(self.prepare(rows, a, n)), dtype=np.float32)
+                for n, a in self.models.items()}
+
+    def gradients(self, Xs: Dict[str, np.ndarray]):
+        """(probabilities, d probability / d input) for every model, one stacked pass."""
+        layers = list(self.fused._stacked_weights())
+        H = self.fused._pad_inputs(Xs)
+        cache = []
+        for W, b, act in layers:
+            Z = np.matmul(H, W) + b
+            H = _ACTIVATIONS[act](Z)
+            cache.append((Z, H))
+        G = np.zeros_like(H)
+        G[:, :, 0] = 1.0
+        for (W, _, act), (Z, H_l) in zip(reversed(layers), reversed(cache)):
+            G = np.matmul(G * _DERIVATIVES[act](Z, H_l), W.transpose(0, 2, 1))
+        probs = {n: H[m, :, 0] for m, n in enumerate(self.fused.names)}
+        grads = {n: G[m, :, :self.fused.input_dims[m]] for m, n in enumerate(self.fused.names)}
+        return probs, grads
+
+    def attributions(self, Xs: Dict[str, np.ndarray], method: str = "ig", steps: int = DEFAULT_STEPS):
+        """disease -> (n, d) attributions in probability units, plus patient and baseline probabilities."""
+        if method not in METHODS:
+            raise ValueError(f"unknown attribution method {method!r} (expected one of {METHODS})")
+        n = next(iter(Xs.values())).shape[0]
+        delta = {k: X - self.baseline[k] for k, X in Xs.items()}
+        if method == "grad_input":
+            probs, grads = self.gradients(Xs)
+            attr = {k: delta[k] * grads[k] for k in Xs}
+        else:
+            alphas = ((np.arange(steps) + 0.5) / steps).astype(np.float32)
+            # (steps, n, d) path points flattened into one batch of steps * n rows
+            path = {k: (self.baseline[k][None] + alphas[:, None, None] * delta[k][None]).reshape(steps * n, -1)
+                    for k in Xs}
+            _, grads = self.gradients(path)
+            attr = {k: delta[k] * grads[k].reshape(steps, n, -1).mean(axis=0) for k in Xs}
+            probs, _ = self.gradients(Xs)
+        base_probs, _ = self.gradients(self.baseline)
+        return attr, probs, base_probs
+
+    def explain(self, rows: List[Dict[str, Any]], method: str = "ig", steps: int = DEFAULT_STEPS) -> List[Dict[str, Any]]:
+        """Per row: disease -> {score, baseline_score, attributions: [{field, points}, ...]},
+        largest contribution first; fields that did not move the score are left out."""
+        if not rows:
+            return []
+        attr, probs, base_probs = self.attributions(self._transform(rows), method, steps)
+        out = [{} for _ in rows]
+        for disease, A in attr.items():
+            per_col: Dict[str, np.ndarray] = {}
+            for col, idx in self.groups[disease].items():
+                field = self.labels.get(col, col)
+                per_col[field] = per_col.get(field, 0) + A[:, idx].sum(axis=1) * 100
+            for j in range(len(rows)):
+                fields = sorted(((col, float(v[j])) for col, v in per_col.items()), key=lambda kv: -abs(kv[1]))
+                out[j][disease] = {
+                    "method": method,
+                    "score": round(float(probs[disease][j]) * 100, 2),
+                    "baseline_score": round(float(base_probs[disease][0]) * 100, 2),
+                    "attributions": [{"field": col, "points": round(v, 3)} for col, v in fields if round(v, 3) != 0],
+                }
+        for j in range(len(rows)):
+            for disease in self.skipped:
+                out[j][disease] = {"error": "attributions are only available for MLP models"}
+        return out
@@ -0,0 +1,160 @@
+# backend/export.py
+"""
+Streaming export of prediction history (GET /export/predictions).
+
+Rows are read in keyset-paged chunks (`WHERE id > ? ORDER BY id LIMIT EXPORT_CHUNK_ROWS`,
+a fresh short query per chunk, so no read transaction stays open for the whole
+download) and encoded chunk by chunk as CSV or NDJSON, optionally gzip-compressed on
+the fly. Only one chunk is in memory at a time, whatever the size of the export.
+
+Query parameters:
+  format   csv | ndjson (default ndjson)
+  gzip     1 to compress (Content-Type application/gzip)
+  after    resume cursor: the last `id` already received (default 0)
+  until    highest id to include; defaults to the newest id when the export starts
+           and is returned in the X-Export-Until header, so a resumed export covers
+           exactly the same snapshot
+  from/to  optional YYYY-MM-DD bounds on the prediction day (inclusive)
+  email    admins only: one user's history (admins get every user by default)
+
+Access: admins (X-Admin-Token, see admin.py) or a user via HTTP Basic auth with the
+email and password used at /login, who only gets their own rows.
+
+With PREDICTION_SHARDS > 1 (database.py) ids are per shard: rows get a `shard` column,
+shards are exported one after another, the resume cursor is `after=<shard>:<id>` and
+`until` / X-Export-Until hold one id per shard, comma-separated. A user's own export
+reads only their shard.
+"""
+import io
+import os
+import csv
+import json
+import zlib
+from typing import Any, Dict, Iterator, List, Optional
+
+from werkzeug.security import check_password_hash
+
+from database import PREDICTION_SHARDS, get_db_connection, get_predictions_connection, shard_for
+
+CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", 2000))
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+COLUMNS = ("id", "email", "disease_name", "score", "risk", "timestamp")
+OUTPUT_COLUMNS = COLUMNS + (("shard",) if PREDICTION_SHARDS > 1 else ())
+
+def authorize(args, auth, is_admin: bool) -> Optional[str]:
+    """The email whose rows the caller may export; None for every user (admins).
+    args / auth: the request's query args and parsed Authorization header. Raises
+    PermissionError for missing / wrong credentials."""
+    if is_admin:
+        return args.get("email") or None
+    if auth is None or not auth.username or not auth.password:
+        raise PermissionError("Admin token or HTTP Basic credentials (email, password) required")
+    conn = get_db_connection()
+    try:
+        user = conn.execute("SELECT password FROM users WHERE email = ?", (auth.username,)).fetchone()
+    finally:
+        conn.close()
+    if not user or not check_password_hash(user["password"], auth.password):
+        raise PermissionError("Invalid credentials")
+    return auth.username
+
+def parse_options(args) -> Dict[str, Any]:
+    """Validated export options from the query string; raises ValueError."""
+    fmt = args.get("format", "ndjson").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format {fmt!r} (expected one of {tuple(FORMATS)})")
+    try:
+        shard, _, last_id = args.get("after", "0").rpartition(":")
+        after = (int(shard or 0), int(last_id))
+        until = [int(x) for x in args["until"].split(",")] if args.get("until") else None
+    except ValueError:
+        raise ValueError("after / until must be prediction ids (after=<shard>:<id> with PREDICTION_SHARDS)")
+    if until is not None and len(until) != PREDICTION_SHARDS:
+        raise ValueError(f"until needs one id per shard ({PREDICTION_SHARDS})")
+    return {"format": fmt, "gzip": args.get("gzip", "0").lower() in ("1", "true", "yes"),
+            "after": after, "until": until, "start": args.get("from"), "end": args.get("to")}
+
+def snapshot_ids() -> List[int]:
+    """Newest id in each shard when the export starts."""
+    ids = []
+    for shard in range(PREDICTION_SHARDS):
+        conn = get_predictions_connection(shard=shard)
+        try:
+            ids.append(conn.execute("SELECT COALESCE(MAX(id), 0) FROM predictions").fetchone()[0])
+        finally:
+            conn.close()
+    return ids
+
+def iter_chunks(shard: int, email: Optional[str], after: int, until: int, start: str = None, end: str = None,
+                chunk: int = CHUNK_ROWS) -> Iterator[list]:
+    """Lists of at most `chunk` rows of one shard with after < id <= until, in id order."""
+    clauses, params = ["id > ?", "id <= ?"], [until]
+    if email:
+        clauses.append("email = ?")
+        params.append(email)
+    if start:
+        clauses.append("timestamp >= ?")
+        params.append(start)
+    if end:
+        clauses.append("timestamp < date(?, '+1 day')")
+        params.append(end)
+    tag = ", ?" if PREDICTION_SHARDS > 1 else ""
+    sql = f"SELECT {', '.join(COLUMNS)}{tag} FROM predictions WHERE {' AND '.join(clauses)} ORDER BY id LIMIT ?"
+    conn = get_predictions_connection(shard=shard)
+    conn.row_factory = None   # plain tuples
+    try:
+        while True:
+            rows = conn.execute(sql, [shard] * bool(tag) + [after, *params, chunk]).fetchall()
+            if not rows:
+                return
+            yield rows
+            after = rows[-1][0]
+    finally:
+        conn.close()
+
+def _iter_shards(email: Optional[str], options: Dict[str, Any]) -> Iterator[list]:
+    after_shard, after_id = options["after"]
+    shards = [shard_for(email)] if email else range(PREDICTION_SHARDS)
+    for shard in shards:
+        if shard < after_shard:
+            continue
+        yield from iter_chunks(shard, email, after_id if shard == after_shard else 0, options["until"][shard],
+                               options["start"], options["end"])
+
+def _encode_csv(chunks: Iterator[list]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(OUTPUT_COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+def _encode_ndjson(chunks: Iterator[list]) -> Iterator[bytes]:
+    for rows in chunks:
+        yield "".join(json.dumps(dict(zip(OUTPUT_COLUMNS, row))) + "\n" for row in rows).encode()
+
+def _gzip(parts: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)   # wbits 31: gzip container
+    for part in parts:
+        out = compressor.compress(part)
+        if out:
+            yield out
+    yield compressor.flush()
+
+def stream(email: Optional[str], options: Dict[str, Any]) -> Iterator[bytes]:
+    """The response body: encoded (and optionally compressed) chunks."""
+    chunks = _iter_shards(email, options)
+    body = _encode_csv(chunks) if options["format"] == "csv" else _encode_ndjson(chunks)
+    return _gzip(body) if options["gzip"] else body
+
+def response_headers(options: Dict[str, Any]) -> Dict[str, str]:
+    filename = f"predictions.{options['format']}" + (".gz" if options["gzip"] else "")
+    return {
+        "Content-Type": "application/gzip" if options["gzip"] else FORMATS[options["format"]],
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-Export-Until": ",".join(map(str, options["until"])),
+    }
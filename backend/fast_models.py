@@ -0,0 +1,86 @@
+# backend/fast_models.py
+"""
+Cheap alternative model families that plug into the same assets["model"] slot as the
+Keras MLPs: each exposes predict(X, verbose=0) -> (n, 1) array of probabilities, so
+predict_disease() / predict_disease_batch() work unchanged.
+
+  logreg : logistic regression            -> sigmoid(X @ coef + intercept)
+  gbt    : shallow gradient-boosted trees compiled to flat arrays and evaluated for all
+           trees and rows at once (max_depth vectorised steps, no Python per-node loop)
+
+Artifacts are {disease}_{family}.npz files written by model_training/families.py.
+Only NumPy is needed to serve them.
+"""
+import numpy as np
+
+FAMILIES = ("mlp", "logreg", "gbt")
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+class LogisticModel:
+    family = "logreg"
+
+    def __init__(self, coef, intercept):
+        self.coef = np.asarray(coef, dtype=np.float64).reshape(-1)
+        self.intercept = float(np.asarray(intercept).reshape(-1)[0])
+
+    @property
+    def nbytes(self) -> int:
+        return self.coef.nbytes + 8
+
+    def count_params(self) -> int:
+        return self.coef.size + 1
+
+    def predict(self, X, verbose=0):
+        X = np.asarray(X, dtype=np.float64)
+        return _sigmoid(X @ self.coef + self.intercept).reshape(-1, 1)
+
+class FlatTreeEnsemble:
+    """Gradient-boosted trees as padded (n_trees, max_nodes) arrays.
+    Leaves point to themselves with threshold=+inf, so every row can take exactly
+    max_depth steps without branching on whether it already reached a leaf."""
+    family = "gbt"
+
+    def __init__(self, feature, threshold, left, right, value, init, learning_rate, max_depth):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.init = float(init)
+        self.learning_rate = float(learning_rate)
+        self.max_depth = int(max_depth)
+        self._tree_idx = np.arange(self.feature.shape[0])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right, self.value))
+
+    def count_params(self) -> int:
+        return int(self.value.size)
+
+    def decision_function(self, X) -> np.ndarray:
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        n = X.shape[0]
+        rows = np.arange(n)[:, None]
+        node = np.zeros((n, self.feature.shape[0]), dtype=np.int32)
+        t = self._tree_idx[None, :]
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[t, node]] <= self.threshold[t, node]
+            node = np.where(go_left, self.left[t, node], self.right[t, node])
+        return self.init + self.learning_rate * self.value[t, node].sum(axis=1)
+
+    def predict(self, X, verbose=0):
+        return _sigmoid(self.decision_function(X)).reshape(-1, 1)
+
+def load_fast_model(path: str):
+    data = np.load(path)
+    family = str(data["family"])
+    if family == "logreg":
+        return LogisticModel(data["coef"], data["intercept"])
+    if family == "gbt":
+        return FlatTreeEnsemble(data["feature"], data["threshold"], data["left"], data["right"], data["value"],
+                                data["init"], data["learning_rate"], data["max_depth"])
+    raise ValueError(f"Unknown model family in {path}: {family}")
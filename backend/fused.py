@@ -0,0 +1,147 @@
+# backend/fused.py
+"""
+Fused multi-model inference: evaluate all five MLPs in one batched pass.
+
+At load time each Keras Sequential model is reduced to a plain stack of
+(W, b, activation) layers (Dropout dropped, BatchNormalization folded into the
+preceding Dense). The stacks are then zero-padded to common widths and stacked, so
+layer l of every model is a single (n_models, in_l, out_l) tensor and one
+np.matmul per layer scores all diseases for one patient or a whole batch.
+
+Zero padding is exact: padded input columns meet zero weight rows, and padded hidden
+units stay at relu(0 + 0) = 0 and feed zero rows of the next layer.
+
+Enable with FUSED_INFERENCE=1; the fused weights are checked against the individual
+models (verify()) before they are used.
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+_ACTIVATIONS = {
+    "relu": lambda z: np.maximum(z, 0.0),
+    "sigmoid": lambda z: 1.0 / (1.0 + np.exp(-np.clip(z, -60.0, 60.0))),
+    "linear": lambda z: z,
+}
+
+class UnsupportedModel(ValueError):
+    pass
+
+# ---------------------------------------------------------------------
+# Keras -> (W, b, activation) stack
+# ---------------------------------------------------------------------
+def _activation_name(fn) -> str:
+    name = getattr(fn, "__name__", str(fn))
+    if name not in _ACTIVATIONS:
+        raise UnsupportedModel(f"unsupported activation: {name}")
+    return name
+
+def extract_dense_stack(model) -> List[Tuple[np.ndarray, np.ndarray, str]]:
+    """Inference-time equivalent of a Dense/BatchNorm/Activation/Dropout Sequential."""
+    stack: List[list] = []
+    for layer in model.layers:
+        kind = layer.__class__.__name__
+        if kind in ("InputLayer", "Dropout"):
+            continue
+        if kind == "Dense":
+            weights = layer.get_weights()
+            W = np.asarray(weights[0], dtype=np.float64)
+            b = np.asarray(weights[1], dtype=np.float64) if len(weights) > 1 else np.zeros(W.shape[1])
+            stack.append([W, b, _activation_name(layer.activation)])
+        elif kind == "BatchNormalization":
+            if not stack or stack[-1][2] != "linear":
+                raise UnsupportedModel("BatchNormalization must directly follow a linear Dense layer")
+            n = stack[-1][0].shape[1]
+            gamma = np.asarray(layer.gamma, dtype=np.float64) if layer.scale else np.ones(n)
+            beta = np.asarray(layer.beta, dtype=np.float64) if layer.center else np.zeros(n)
+            mean = np.asarray(layer.moving_mean, dtype=np.float64)
+            var = np.asarray(layer.moving_variance, dtype=np.float64)
+            scale = gamma / np.sqrt(var + layer.epsilon)
+            W, b, act = stack[-1]
+            stack[-1] = [W * scale, (b - mean) * scale + beta, act]
+        elif kind == "Activation":
+            if not stack or stack[-1][2] != "linear":
+                raise UnsupportedModel("Activation must follow a linear layer")
+            stack[-1][2] = _activation_name(layer.activation)
+        else:
+            raise UnsupportedModel(f"unsupported layer: {kind}")
+    return [tuple(layer) for layer in stack]
+
+def forward_stack(stack, X: np.ndarray, dtype=np.float32) -> np.ndarray:
+    """Reference NumPy forward pass for one extracted stack."""
+    H = np.asarray(X, dtype=dtype)
+    for W, b, act in stack:
+        H = _ACTIVATIONS[act](H @ W.astype(dtype) + b.astype(dtype))
+    return H
+
+# ---------------------------------------------------------------------
+# Stacked ensemble
+# ---------------------------------------------------------------------
+class FusedEnsemble:
+    def __init__(self, stacks: Dict[str, list], dtype=np.float32):
+        self.names = list(stacks)
+        if not self.names:
+            raise UnsupportedModel("nothing to fuse")
+        depths = {len(s) for s in stacks.values()}
+        if len(depths) != 1:
+            raise UnsupportedModel(f"models have different depths: {depths}")
+        self.dtype = dtype
+        self.input_dims = [stacks[n][0][0].shape[0] for n in self.names]
+        self.layers = []
+        for l in range(depths.pop()):
+            acts = {stacks[n][l][2] for n in self.names}
+            if len(acts) != 1:
+                raise UnsupportedModel(f"layer {l} activations differ across models: {acts}")
+            max_in = max(stacks[n][l][0].shape[0] for n in self.names)
+            max_out = max(stacks[n][l][0].shape[1] for n in self.names)
+            W = np.zeros((len(self.names), max_in, max_out), dtype=dtype)
+            b = np.zeros((len(self.names), 1, max_out), dtype=dtype)
+            for m, n in enumerate(self.names):
+                Wm, bm, _ = stacks[n][l]
+                W[m, :Wm.shape[0], :Wm.shape[1]] = Wm
+                b[m, 0, :bm.shape[0]] = bm
+            self.layers.append((W, b, acts.pop()))
+        self.output_dim = stacks[self.names[0]][-1][0].shape[1]
+
+    @classmethod
+    def from_models(cls, models: Dict[str, object], dtype=np.float32):
+        return cls({name: extract_dense_stack(m) for name, m in models.items()}, dtype)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(W.nbytes + b.nbytes for W, b, _ in self.layers)
+
+    def _stacked_weights(self):
+        """(W, b, activation) per layer, in the dtype used for the matmuls."""
+        return self.layers
+
+    def _pad_inputs(self, Xs: Dict[str, np.ndarray]) -> np.ndarray:
+        n = next(iter(Xs.values())).shape[0]
+        H = np.zeros((len(self.names), n, max(self.input_dims)), dtype=self.dtype)
+        for m, name in enumerate(self.names):
+            if name in Xs:
+                H[m, :, :self.input_dims[m]] = Xs[name]
+        return H
+
+    def predict(self, Xs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Xs: disease -> preprocessed (n, d_disease) matrix, same n for all (a subset of
+        the diseases is fine). Returns disease -> (n,) probabilities for the given ones."""
+        H = self._pad_inputs(Xs)
+        for W, b, act in self._stacked_weights():
+            H = _ACTIVATIONS[act](np.matmul(H, W) + b)
+        return {name: H[m, :, 0].astype(np.float64) for m, name in enumerate(self.names) if name in Xs}
+
+    def verify(self, models: Dict[str, object], n: int = 256, atol: float = 1e-4, seed: int = 0) -> Dict[str, float]:
+        """Compare fused outputs with each model's own predict() on random inputs in the
+        preprocessed space. Returns disease -> max abs difference; raises if above atol."""
+        rng = np.random.default_rng(seed)
+        Xs = {name: rng.normal(size=(n, d)).astype(np.float32) for name, d in zip(self.names, self.input_dims)}
+        fused = self.predict(Xs)
+        diffs = {}
+        for name in self.names:
+            ref = np.asarray(models[name].predict(Xs[name], verbose=0)).reshape(-1)
+            diffs[name] = float(np.max(np.abs(ref - fused[name])))
+        bad = {k: v for k, v in diffs.items() if v > atol}
+        if bad:
+            raise AssertionError(f"fused outputs diverge from individual models: {bad}")
+        return diffs
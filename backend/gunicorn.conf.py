@@ -0,0 +1,25 @@
+# backend/gunicorn.conf.py
+"""
+Picked up automatically by `gunicorn app:app` (Procfile) when run from backend/.
+
+The worker count is gunicorn's own (-w / WEB_CONCURRENCY, default 1): every worker
+imports TensorFlow and loads all five models, so more of them is an explicit choice.
+WORKERS_FROM_CORES=1 opts into one worker per THREADS_PER_WORKER available cores
+(threading_config.py) when WEB_CONCURRENCY is unset.
+
+Whatever count is configured is exported as MODEL_PROCESSES before the workers are
+forked, so each one sizes its TensorFlow / BLAS pools to its own share of the cores
+instead of all of them. With INFERENCE_POOL_ADDRESS the workers do not load models and
+the pool's INFERENCE_POOL_SIZE is what gets split (inference_pool.py).
+"""
+import os
+
+import threading_config
+
+if os.getenv("WORKERS_FROM_CORES") == "1" and not os.getenv("WEB_CONCURRENCY"):
+    workers = threading_config.default_workers(threading_config.detect_cpus()["available"])
+
+def on_starting(server):
+    # runs in the master once the command line is applied, before any worker is forked
+    if not os.getenv("INFERENCE_POOL_ADDRESS"):
+        os.environ.setdefault("MODEL_PROCESSES", str(server.cfg.workers))
@@ -0,0 +1,409 @@
+# backend/inference_pool.py
+"""
+Optional serving topology: a small, fixed pool of inference processes owns the models,
+and the HTTP workers (app.py) submit requests to it over a local Unix socket.
+
+    HTTP worker (no TensorFlow) --socket--> pool server --pipe--> N model processes
+
+The server hands each request to the ready model process with the fewest outstanding
+requests; each process drains its pipe in micro-batches, so predictions (plain and
+incremental) from different HTTP workers are scored together. The number of model
+copies (INFERENCE_POOL_SIZE) is independent of gunicorn concurrency. A model process
+that exits is replaced, and the requests it held are answered with an error.
+
+The socket is authenticated with INFERENCE_POOL_AUTHKEY; when it is unset the server
+generates a key per run and writes it to <address>.key (mode 0600) for the clients.
+
+Run the pool next to gunicorn:
+    python inference_pool.py                       # listens on INFERENCE_POOL_ADDRESS
+    INFERENCE_POOL_ADDRESS=/tmp/cardiopredict-inference.sock gunicorn app:app
+"""
+import os
+import time
+import secrets
+import argparse
+import threading
+import itertools
+import multiprocessing as mp
+from multiprocessing.connection import Listener, Client, wait
+from typing import Dict, Any, List, Optional
+
+DEFAULT_ADDRESS = "/tmp/cardiopredict-inference.sock"
+POOL_SIZE = int(os.getenv("INFERENCE_POOL_SIZE", 2))
+MAX_BATCH = int(os.getenv("INFERENCE_POOL_MAX_BATCH", 32))
+MAX_WAIT_MS = float(os.getenv("INFERENCE_POOL_MAX_WAIT_MS", 5))
+CLIENT_TIMEOUT_S = float(os.getenv("INFERENCE_POOL_TIMEOUT_S", 30))
+
+def _key_path(address: str) -> str:
+    return address + ".key"
+
+def server_authkey(address: str) -> bytes:
+    """INFERENCE_POOL_AUTHKEY, or a fresh random key written to <address>.key."""
+    key = os.getenv("INFERENCE_POOL_AUTHKEY")
+    if key:
+        return key.encode()
+    key = secrets.token_hex(32)
+    path = _key_path(address)
+    if os.path.exists(path):
+        os.unlink(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(key)
+    return key.encode()
+
+def client_authkey(address: str) -> bytes:
+    """INFERENCE_POOL_AUTHKEY, or the key the running pool wrote next to its socket."""
+    key = os.getenv("INFERENCE_POOL_AUTHKEY")
+    if key:
+        return key.encode()
+    try:
+        with open(_key_path(address)) as f:
+            return f.read().strip().encode()
+    except OSError:
+        raise ConnectionError(f"no INFERENCE_POOL_AUTHKEY and no key file at {_key_path(address)}")
+
+# ---------------------------------------------------------------------
+# Model process (one copy of every model per process)
+# ---------------------------------------------------------------------
+def _worker_loop(worker_id: int, conn, max_batch: int, max_wait_ms: float):
+    # Imported here so the HTTP side never pays for TensorFlow
+    from main import (load_all_models, predict_all_diseases_batch, predict_all_diseases_incremental_batch,
+                      what_if, warm_up_for_serving)
+    batch_calls = {"predict": lambda items, explain: predict_all_diseases_batch(items, explain=explain),
+                   "predict_incremental": predict_all_diseases_incremental_batch}
+    single_calls = {"what_if": lambda payload: what_if(*payload),
+                    "predict_batch": predict_all_diseases_batch}
+
+    loaded = load_all_models() is not None
+    warm_up_for_serving()
+    conn.send(("ready", worker_id, {"pid": os.getpid(), "models_loaded": loaded}))
+
+    stopping = False
+    while not stopping:
+        try:
+            item = conn.recv()
+        except EOFError:
+            break
+        if item is None:
+            break
+        batch = [item]
+        deadline = time.monotonic() + max_wait_ms / 1000.0
+        while len(batch) < max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not conn.poll(remaining):
+                break
+            nxt = conn.recv()
+            if nxt is None:
+                stopping = True  # exit after this batch
+                break
+            batch.append(nxt)
+
+        # predictions: one batched call per kind and attribution method (normally just
+        # None); anything else (what-if sweeps, bulk batches) is already a batch
+        groups: Dict[tuple, list] = {}
+        for req_id, kind, payload in batch:
+            if kind == "predict":
+                patient, explain = payload
+                groups.setdefault((kind, explain), []).append((req_id, patient))
+                continue
+            if kind == "predict_incremental":
+                patient, session_key, explain = payload
+                groups.setdefault((kind, explain), []).append((req_id, (patient, session_key)))
+                continue
+            try:
+                result = single_calls[kind](payload)
+            except Exception as e:
+                result = {"error": str(e)}
+            conn.send(("result", req_id, result))
+        for (kind, explain), items in groups.items():
+            try:
+                results = batch_calls[kind]([payload for _, payload in items], explain)
+            except Exception as e:
+                results = [{"error": str(e)} for _ in items]
+            for (req_id, _), result in zip(items, results):
+                conn.send(("result", req_id, result))
+
+# ---------------------------------------------------------------------
+# Pool server (socket front-end + result dispatcher)
+# ---------------------------------------------------------------------
+class InferencePoolServer:
+    def __init__(self, address: str = DEFAULT_ADDRESS, pool_size: int = POOL_SIZE,
+                 max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        self.address = address
+        self.pool_size = pool_size
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.workers: List[mp.Process] = [None] * pool_size
+        self.worker_info: Dict[int, Dict[str, Any]] = {}
+        self._conns: List[Any] = [None] * pool_size
+        self._send_locks = [threading.Lock() for _ in range(pool_size)]
+        self._ready = [False] * pool_size
+        self._outstanding = [0] * pool_size
+        self._restarts = [0] * pool_size
+        self._ids = itertools.count()
+        self._pending: Dict[int, Any] = {}
+        self._pending_lock = threading.Lock()
+        self._listener: Optional[Listener] = None
+        self._stopped = threading.Event()
+
+    def _spawn(self, worker_id: int):
+        # "spawn" so each model process initialises TensorFlow from scratch
+        ctx = mp.get_context("spawn")
+        ours, theirs = ctx.Pipe()
+        p = ctx.Process(target=_worker_loop, name=f"inference-{worker_id}", daemon=True,
+                        args=(worker_id, theirs, self.max_batch, self.max_wait_ms))
+        p.start()
+        theirs.close()
+        self.workers[worker_id] = p
+        self._conns[worker_id] = ours
+
+    def start(self, ready_timeout: float = 300.0):
+        # threading_config.py in each model process splits the cores between the pool
+        os.environ.setdefault("MODEL_PROCESSES", str(self.pool_size))
+        for i in range(self.pool_size):
+            self._spawn(i)
+
+        deadline = time.monotonic() + ready_timeout
+        while not all(self._ready):
+            waiting = [c for i, c in enumerate(self._conns) if not self._ready[i]]
+            for conn in wait(waiting, timeout=max(0.1, deadline - time.monotonic())):
+                self._handle(self._conns.index(conn))
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"inference workers not ready within {ready_timeout}s")
+
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=server_authkey(self.address))
+        threading.Thread(target=self._dispatch_results, daemon=True).start()
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        print(f"🚀 Inference pool listening on {self.address} ({self.pool_size} workers)")
+        return self
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                conn = self._listener.accept()
+            except Exception:
+                if self._stopped.is_set():
+                    break
+                continue
+            threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+    def _serve_connection(self, conn):
+        send_lock = threading.Lock()
+        try:
+            while True:
+                kind, client_req_id, payload = conn.recv()
+                if kind in ("predict", "predict_explain", "predict_incremental", "predict_batch", "what_if"):
+                    if kind == "predict":
+                        payload = (payload, None)
+                    elif kind == "predict_explain":
+                        kind = "predict"
+                    self._submit(conn, send_lock, client_req_id, kind, payload)
+                elif kind == "ping":
+                    with send_lock:
+                        conn.send((client_req_id, self.stats()))
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def _submit(self, conn, send_lock, client_req_id, kind: str, payload):
+        req_id = next(self._ids)
+        with self._pending_lock:
+            ready = [i for i in range(self.pool_size) if self._ready[i]]
+            if not ready:
+                worker_id = None
+            else:
+                worker_id = min(ready, key=lambda i: self._outstanding[i])
+                self._pending[req_id] = (conn, send_lock, client_req_id, worker_id)
+                self._outstanding[worker_id] += 1
+        if worker_id is None:
+            self._reply((conn, send_lock, client_req_id, None), {"error": "no inference worker available"})
+            return
+        try:
+            with self._send_locks[worker_id]:
+                self._conns[worker_id].send((req_id, kind, payload))
+        except (EOFError, OSError):
+            pass  # the dispatcher notices the exit and answers the pending entry
+
+    def _reply(self, target, result):
+        conn, send_lock, client_req_id, _ = target
+        try:
+            with send_lock:
+                conn.send((client_req_id, result))
+        except (EOFError, OSError):
+            pass  # caller went away; nothing to deliver
+
+    def _handle(self, worker_id: int):
+        """Read one message from a model process; replace it if it has exited."""
+        try:
+            kind, req_id, result = self._conns[worker_id].recv()
+        except (EOFError, OSError):
+            self._replace(worker_id)
+            return
+        if kind == "ready":
+            self.worker_info[worker_id] = result
+            self._ready[worker_id] = True
+            print(f"✅ Inference worker {worker_id} ready (pid {result['pid']})")
+            return
+        with self._pending_lock:
+            target = self._pending.pop(req_id, None)
+            if target is not None:
+                self._outstanding[worker_id] -= 1
+        if target is not None:
+            self._reply(target, result)
+
+    def _replace(self, worker_id: int):
+        """Fail the requests a dead model process held and start a new one in its slot."""
+        process = self.workers[worker_id]
+        process.join(timeout=5)
+        with self._pending_lock:
+            self._ready[worker_id] = False
+            lost = [self._pending.pop(r) for r, t in list(self._pending.items()) if t[3] == worker_id]
+            self._outstanding[worker_id] = 0
+        self._conns[worker_id].close()
+        if self._stopped.is_set():
+            return
+        print(f"❌ Inference worker {worker_id} (pid {process.pid}) exited with code {process.exitcode}; "
+              f"failing {len(lost)} request(s) and restarting it")
+        for target in lost:
+            self._reply(target, {"error": f"inference worker {worker_id} exited while scoring"})
+        self._restarts[worker_id] += 1
+        with self._send_locks[worker_id]:
+            self._spawn(worker_id)
+
+    def _dispatch_results(self):
+        while not self._stopped.is_set():
+            conns = list(self._conns)
+            for conn in wait(conns, timeout=0.5):
+                self._handle(conns.index(conn))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pool_size": self.pool_size,
+            "workers": [dict(self.worker_info.get(i, {}), alive=p.is_alive(), ready=self._ready[i],
+                             outstanding=self._outstanding[i], restarts=self._restarts[i])
+                        for i, p in enumerate(self.workers)],
+            "models_loaded": bool(self.worker_info) and all(info["models_loaded"] for info in self.worker_info.values()),
+            "pending": len(self._pending),
+        }
+
+    def stop(self):
+        self._stopped.set()
+        for i, conn in enumerate(self._conns):
+            try:
+                with self._send_locks[i]:
+                    conn.send(None)
+            except (EOFError, OSError):
+                pass
+        for p in self.workers:
+            p.join(timeout=10)
+        if self._listener is not None:
+            self._listener.close()
+        for path in (self.address, _key_path(self.address)):
+            if os.path.exists(path):
+                os.unlink(path)
+
+# ---------------------------------------------------------------------
+# Client used by the HTTP workers (one connection per thread)
+# ---------------------------------------------------------------------
+class InferencePoolClient:
+    def __init__(self, address: str = DEFAULT_ADDRESS, timeout: float = CLIENT_TIMEOUT_S):
+        self.address = address
+        self.timeout = timeout
+        self._local = threading.local()
+        self._ids = itertools.count()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.address, family="AF_UNIX", authkey=client_authkey(self.address))
+            self._local.conn = conn
+        return conn
+
+    def _call(self, kind: str, payload=None):
+        for attempt in range(2):
+            try:
+                conn = self._conn()
+                req_id = next(self._ids)
+                conn.send((kind, req_id, payload))
+                if not conn.poll(self.timeout):
+                    raise TimeoutError(f"inference pool did not answer within {self.timeout}s")
+                _, result = conn.recv()
+                return result
+            except (EOFError, OSError, ConnectionError):
+                # stale connection (pool restarted): reconnect once
+                self._local.conn = None
+                if attempt == 1:
+                    raise
+            except TimeoutError:
+                # the late answer would desynchronise this connection, so drop it
+                self._local.conn = None
+                raise
+
+    def predict_all_diseases(self, patient_data: Dict[str, Any], explain: str = None) -> Dict[str, Any]:
+        if explain:
+            return self._call("predict_explain", (patient_data, explain))
+        return self._call("predict", patient_data)
+
+    def predict_all_diseases_incremental(self, patient_data: Dict[str, Any], session_key: str,
+                                         explain: str = None) -> Dict[str, Any]:
+        return self._call("predict_incremental", (patient_data, session_key, explain))
+
+    def predict_all_diseases_batch(self, patients: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._call("predict_batch", patients)
+
+    def what_if(self, base_patient: Dict[str, Any], grid: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return self._call("what_if", (base_patient, grid))
+
+    def ping(self) -> Dict[str, Any]:
+        return self._call("ping")
+
+# ---------------------------------------------------------------------
+# Topology selection for app.py
+# ---------------------------------------------------------------------
+def resolve_predictor():
+    """Return (predict_all_diseases, models_loaded) for the configured topology.
+    With INFERENCE_POOL_ADDRESS set, predictions go to the pool and this process never
+    imports TensorFlow; otherwise models are loaded in-process as before."""
+    address = os.getenv("INFERENCE_POOL_ADDRESS")
+    if address:
+        client = InferencePoolClient(address)
+        try:
+            models_loaded = bool(client.ping().get("models_loaded"))
+            print(f"✅ Using inference pool at {address}")
+        except Exception as e:
+            models_loaded = False
+            print(f"❌ Warning: inference pool at {address} not reachable: {e}")
+        return client.predict_all_diseases, models_loaded
+
+    from main import predict_all_diseases, load_all_models, warm_up_for_serving
+    loaded = load_all_models() is not None
+    warm_up_for_serving()
+    return predict_all_diseases, loaded
+
+def resolve_function(name: str):
+    """A main.py entry point (e.g. "what_if") for the configured topology: the pool
+    client's method of the same name, or the in-process function (see resolve_predictor)."""
+    address = os.getenv("INFERENCE_POOL_ADDRESS")
+    if address:
+        return getattr(InferencePoolClient(address), name)
+    import main
+    return getattr(main, name)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the shared inference process pool.")
+    parser.add_argument("--address", default=os.getenv("INFERENCE_POOL_ADDRESS", DEFAULT_ADDRESS))
+    parser.add_argument("--workers", type=int, default=POOL_SIZE)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    server = InferencePoolServer(args.address, args.workers, args.max_batch, args.max_wait_ms).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping inference pool")
+        server.stop()
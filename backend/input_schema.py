@@ -0,0 +1,329 @@
+# backend/input_schema.py
+"""
+Typed decoding of /predict_all payloads against a schema compiled from the models.
+
+The schema is built once per load_all_models() from master_input_template and each
+model's {disease}_columns.json + preprocessor: every template field and every model
+column is a field with a kind and a default,
+
+  number    numeric model input; JSON numbers or numeric strings ("63", " 1e3 ")
+  binary    passthrough 0/1 column (or one main.py maps with _map_yes_no); 0/1, true/false,
+            and y/yes/n/no/male/female as encoded in model_training/train.py
+  sex       "Sex", which _prepare_dataframe_for_model maps to 1/0; decoded to "Male"/"Female"
+  category  one-hot encoded column; one of the encoder's categories (case-insensitive)
+  unused    template field no model takes (kept, reported as ignored)
+
+and decode() turns a payload into a complete typed row in one pass over its keys: the
+precoerced defaults are copied, then each supplied value is converted by its field's
+coercer. The row is a Decoded dict that scores exactly like the merged input it
+replaces wherever it goes (old code paths coerce it to the same values), and
+frame() builds a model's aligned DataFrame from such rows without the per-column
+pandas coercion of _ensure_expected_columns().
+
+Unlike the merge + pd.to_numeric(errors="coerce").fillna(0) path, nothing is dropped
+or zeroed silently; the report lists
+
+  errors     field -> why the value was rejected (the field's default is used instead)
+  warnings   field -> value outside the plausible range for its unit, with the
+             converted value when it looks like a common other unit (kept as given)
+  defaulted  model fields the payload did not supply (or sent as null)
+  ignored    key -> "unknown field" / "not used by any model" / "duplicate of ..."
+  aliased    key -> field, for renamed or differently-cased keys ("CK_MB" -> "CK-MB")
+"""
+import math
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+# Token spellings accepted by binary / sex fields
+_TRUE = {"1", "y", "yes", "true", "m", "male"}
+_FALSE = {"0", "n", "no", "false", "f", "female", "fmale"}
+
+# Plausible range per numeric field: (low, high, unit, ((other unit, factor to unit), ...))
+RANGES = {
+    "Age": (0, 120, "years", ()),
+    "BMI": (10, 80, "kg/m²", ()),
+    "systolic_bp": (60, 260, "mmHg", (("kPa", 7.5006),)),
+    "diastolic_bp": (30, 160, "mmHg", (("kPa", 7.5006),)),
+    "resting_bp": (60, 260, "mmHg", (("kPa", 7.5006),)),
+    "cholesterol": (50, 700, "mg/dL", (("mmol/L", 38.67),)),
+    "LDL": (10, 400, "mg/dL", (("mmol/L", 38.67),)),
+    "HDL": (5, 200, "mg/dL", (("mmol/L", 38.67),)),
+    "triglycerides": (10, 2000, "mg/dL", (("mmol/L", 88.57),)),
+    "glucose_level": (30, 700, "mg/dL", (("mmol/L", 18.016),)),
+    "blood_sugar": (30, 700, "mg/dL", (("mmol/L", 18.016),)),
+    "FBS": (30, 700, "mg/dL", (("mmol/L", 18.016),)),
+    "heart_rate": (25, 250, "bpm", ()),
+    "max_hr": (50, 230, "bpm", ()),
+    "oldpeak": (-5, 10, "mm", ()),
+    "cigsPerDay": (0, 100, "per day", ()),
+    "CR": (0.1, 15, "mg/dL", (("µmol/L", 1 / 88.4),)),
+    "BUN": (1, 200, "mg/dL", (("mmol/L urea", 2.8),)),
+    "ESR": (0, 150, "mm/h", ()),
+    "HB": (3, 25, "g/dL", (("g/L", 0.1),)),
+    "K": (1.5, 10, "mEq/L", ()),
+    "Na": (100, 180, "mEq/L", ()),
+    "WBC": (500, 100000, "cells/µL", (("10³/µL", 1000),)),
+    "PLT": (10000, 1500000, "cells/µL", (("10³/µL", 1000),)),
+    "Lymph": (0, 100, "%", ()),
+    "Neut": (0, 100, "%", ()),
+    "EF-TTE": (5, 90, "%", (("fraction", 100),)),
+    "CK-MB": (0, 500, "ng/mL", ()),
+    "Troponin": (0, 100, "ng/mL", (("ng/L", 0.001),)),
+    "ldl_hdl_ratio": (0, 30, "", ()),
+    "Function Class": (0, 4, "", ()),
+    "Region RWMA": (0, 4, "", ()),
+}
+
+class Decoded(dict):
+    """A complete, typed input row produced by InputSchema.decode()."""
+
+# ---------------------------------------------------------------------
+# Coercers: value -> (typed value, None) or (None, error message)
+# ---------------------------------------------------------------------
+def _number(value) -> Tuple[Optional[float], Optional[str]]:
+    if isinstance(value, bool):
+        return None, f"expected a number, got {str(value).lower()}"
+    if isinstance(value, (int, float)):
+        number = float(value)
+    elif isinstance(value, str):
+        text = value.strip()
+        if not text.isascii() or "_" in text:
+            return None, f"expected a number, got {value!r}"
+        try:
+            number = float(text)
+        except ValueError:
+            return None, f"expected a number, got {value!r}"
+    else:
+        return None, f"expected a number, got {type(value).__name__}"
+    if not math.isfinite(number):
+        return None, f"expected a finite number, got {value!r}"
+    return number, None
+
+def _flag(value) -> Tuple[Optional[int], Optional[str]]:
+    if isinstance(value, bool):
+        return int(value), None
+    if isinstance(value, str):
+        token = value.strip().lower()
+        if token in _TRUE:
+            return 1, None
+        if token in _FALSE:
+            return 0, None
+    number, _ = _number(value)
+    if number in (0.0, 1.0):
+        return int(number), None
+    return None, f"expected 0/1 or yes/no, got {value!r}"
+
+def _sex(value) -> Tuple[Optional[str], Optional[str]]:
+    flag, error = _flag(value)
+    if error:
+        return None, f"expected Male/Female, got {value!r}"
+    return ("Male" if flag else "Female"), None
+
+def _unchanged(value):
+    return value, None
+
+_COERCERS = {"number": _number, "binary": _flag, "sex": _sex}
+
+def _range_warning(value: float, spec) -> Optional[str]:
+    low, high, unit, others = spec
+    if low <= value <= high:
+        return None
+    unit = f" {unit}" if unit else ""
+    message = f"{value:g} is outside {low:g}-{high:g}{unit}"
+    for other, factor in others:
+        if low <= value * factor <= high:
+            message += f"; if in {other}, that is {value * factor:.4g}{unit}"
+    return message
+
+# ---------------------------------------------------------------------
+# Schema
+# ---------------------------------------------------------------------
+class _Field:
+    __slots__ = ("name", "kind", "default", "diseases", "categories", "range", "coerce")
+
+    def __init__(self, name: str, kind: str, diseases: List[str]):
+        self.name, self.kind, self.diseases = name, kind, diseases
+        self.default = None
+        self.categories: Dict[str, str] = {}
+        self.range = RANGES.get(name) if kind == "number" else None
+        self.coerce = _COERCERS.get(kind, _unchanged)
+
+    def compile_categories(self, categories: Iterable[Any]):
+        for category in categories:
+            self.categories.setdefault(str(category).lower(), str(category))
+        known, choices = self.categories, sorted(set(self.categories.values()))
+        if not known:   # encoder without categories_: accept any value, as astype(str) did
+            self.coerce = lambda value: (str(value), None)
+            return
+
+        def coerce(value):
+            canonical = known.get(str(value).strip().lower())
+            if canonical is None:
+                return None, f"expected one of {choices}, got {value!r}"
+            return canonical, None
+        self.coerce = coerce
+
+class InputSchema:
+    def __init__(self, template: Dict[str, Any], models: Dict[str, Any], feature_groups: Callable,
+                 sex_fields: Iterable[str] = (), flag_fields: Iterable[str] = (),
+                 aliases: Dict[str, str] = None):
+        """template: master_input_template; models: main.MODELS; feature_groups:
+        main._extract_feature_groups; sex_fields / flag_fields: fields main.py maps with
+        _map_sex / _map_yes_no; aliases: main.RENAME_MAP."""
+        self._models = models
+        groups = {name: feature_groups(assets["preprocessor"]) for name, assets in models.items()}
+        diseases: Dict[str, List[str]] = {field: [] for field in template}
+        for name, assets in models.items():
+            for col in assets["columns"]:
+                diseases.setdefault(col, []).append(name)
+
+        self.fields: Dict[str, _Field] = {}
+        for field, used_by in diseases.items():
+            if not used_by:
+                kind = "unused"
+            elif field in sex_fields:
+                kind = "sex"
+            elif any(field in groups[d][1] for d in used_by):
+                kind = "category"
+            elif field in flag_fields or any(field in groups[d][2] for d in used_by):
+                kind = "binary"
+            else:
+                kind = "number"
+            spec = self.fields[field] = _Field(field, kind, used_by)
+            if kind == "category":
+                spec.compile_categories(c for d in used_by for c in _categories(models[d]["preprocessor"], field))
+            spec.default = self._default(spec, template)
+
+        # Payload key -> field: the fields, then aliases, then unambiguous case-folded names
+        self._lookup: Dict[str, _Field] = dict(self.fields)
+        self._aliases: Dict[str, str] = {}
+        folded: Dict[str, List[str]] = {}
+        for field in self.fields:
+            folded.setdefault(field.lower(), []).append(field)
+        for key, fields in folded.items():
+            if len(fields) == 1:
+                self._aliases[key] = fields[0]
+        for key, field in (aliases or {}).items():
+            if field in self.fields and key not in self.fields:
+                self._aliases[key] = field
+                self._aliases.setdefault(key.lower(), field)
+        self._defaults = {name: spec.default for name, spec in self.fields.items()}
+        self._model_fields = [name for name, spec in self.fields.items() if spec.kind != "unused"]
+
+        # Per model: (column, converter or None) in column order
+        self._frames: Dict[str, List[Tuple[str, Optional[Callable]]]] = {}
+        for name, assets in models.items():
+            cat_set = groups[name][1]
+            self._frames[name] = [(col, _converter(self.fields[col].kind, col in cat_set))
+                                  for col in assets["columns"]]
+
+    @staticmethod
+    def _default(spec: _Field, template: Dict[str, Any]):
+        """The template value in decoded form; for model-only columns, what
+        _ensure_expected_columns() fills in (0, or "Unknown" for categoricals)."""
+        if spec.name not in template:
+            return "Unknown" if spec.kind == "category" else 0
+        value, error = spec.coerce(template[spec.name])
+        if error:
+            fallback = {"category": str(template[spec.name]), "sex": "Female"}.get(spec.kind, 0)
+            print(f"⚠️ [SCHEMA] default of {spec.name} does not decode ({error}); using {fallback!r}")
+            return fallback
+        return value
+
+    # -----------------------------------------------------------------
+    def decode(self, payload: Dict[str, Any], defaulted: bool = True) -> Tuple[Decoded, Dict[str, Any]]:
+        """(typed row, report); defaulted=False leaves the "defaulted" list out."""
+        row = Decoded(self._defaults)
+        errors, warnings, ignored, aliased = {}, {}, {}, {}
+        supplied = set()
+        for key, value in payload.items():
+            spec = self._lookup.get(key)
+            if spec is None:
+                field = self._aliases.get(key) or self._aliases.get(key.lower())
+                if field is None:
+                    ignored[key] = "unknown field"
+                    continue
+                if field in payload or field in supplied:
+                    ignored[key] = f"duplicate of {field!r}"
+                    continue
+                aliased[key] = field
+                spec = self.fields[field]
+            if value is None:
+                continue
+            supplied.add(spec.name)
+            if spec.kind == "unused":
+                row[spec.name] = value
+                ignored[key] = "not used by any model"
+                continue
+            typed, error = spec.coerce(value)
+            if error:
+                errors[spec.name] = f"{error}; used the default {self._defaults[spec.name]!r}"
+                continue
+            row[spec.name] = typed
+            if spec.range is not None:
+                warning = _range_warning(typed, spec.range)
+                if warning:
+                    warnings[spec.name] = warning
+        report = {"errors": errors, "warnings": warnings}
+        if defaulted:
+            report["defaulted"] = [f for f in self._model_fields if f not in supplied]
+        report["ignored"] = ignored
+        report["aliased"] = aliased
+        return row, report
+
+    def coerce(self, field: str, value) -> Tuple[Any, Optional[str]]:
+        """One value of a field in decoded form: (typed value, None) or (None, error)."""
+        return self.fields[field].coerce(value)
+
+    def covers(self, patient, assets: Dict[str, Any], disease_name: str) -> bool:
+        """True when frame() can build this model's input: decoded rows, same model assets."""
+        if self._models.get(disease_name) is not assets:
+            return False
+        if isinstance(patient, Decoded):
+            return True
+        return isinstance(patient, list) and bool(patient) and all(isinstance(r, Decoded) for r in patient)
+
+    def frame(self, rows, disease_name: str) -> pd.DataFrame:
+        """Model input aligned with {disease}_columns.json, from Decoded row(s)."""
+        rows = [rows] if isinstance(rows, dict) else rows
+        data = {}
+        for col, convert in self._frames[disease_name]:
+            values = [row[col] for row in rows]
+            data[col] = [convert(v) for v in values] if convert is not None else values
+        return pd.DataFrame(data)
+
+    def describe(self) -> Dict[str, Any]:
+        """field -> kind, default, models, categories / plausible range."""
+        out = {}
+        for name, spec in self.fields.items():
+            entry = {"kind": spec.kind, "default": spec.default, "models": spec.diseases}
+            if spec.categories:
+                entry["categories"] = sorted(set(spec.categories.values()))
+            if spec.range is not None:
+                entry["range"] = {"low": spec.range[0], "high": spec.range[1], "unit": spec.range[2]}
+            out[name] = entry
+        return {"fields": out, "aliases": dict(self._aliases)}
+
+def _categories(preprocessor, column: str) -> List[Any]:
+    """Categories the one-hot encoder learned for `column` (empty when not found)."""
+    try:
+        for name, trans, cols in preprocessor.transformers_:
+            if column in list(cols):
+                encoder = trans.steps[-1][1] if hasattr(trans, "steps") else trans
+                return list(encoder.categories_[list(cols).index(column)])
+    except Exception:
+        pass
+    return []
+
+_SEX_CODES = {"Male": 1, "Female": 0}
+
+def _converter(kind: str, categorical: bool) -> Optional[Callable]:
+    """Decoded value -> the value _ensure_expected_columns() would hand the preprocessor."""
+    if kind == "sex":
+        return (lambda v: str(_SEX_CODES[v])) if categorical else _SEX_CODES.__getitem__
+    if categorical:
+        return None if kind == "category" else str
+    if kind in ("number", "binary"):
+        return None
+    return lambda v: _number(v)[0] or 0
@@ -1,12 +1,32 @@
 # backend/main.py
+# Thread limits for TensorFlow / BLAS go into the environment before NumPy loads
+import threading_config
+threading_config.apply()
 import os
+import gc
+import ctypes
 import json
 import joblib
 import warnings
 import numpy as np
+import pickle
+import threading
 import pandas as pd
+from typing import Dict, Any, List, Tuple
+from memory_debug import current_rss_bytes, peak_allocation_bytes
+from fast_models import FAMILIES, load_fast_model
+from fused import FusedEnsemble, UnsupportedModel
+from quantized import QuantizationRejected, load_quantized
+from explain import Explainer
+from sessions import SessionStore
+from input_schema import Decoded, InputSchema
+import resilience
+
+# RSS attributable to importing TensorFlow itself (reported on /debug/memory)
+_rss_before_tf = current_rss_bytes()
 import tensorflow as tf
-from typing import Dict, Any
+threading_config.configure_tensorflow(tf)
+TF_IMPORT_RSS_BYTES = current_rss_bytes() - _rss_before_tf
 
 # Cleaner logs
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"
@@ -125,11 +145,72 @@ def _map_sex(v):
         return 0
     return 0
 
+# Boolean-like fields mapped with _map_yes_no
+YES_NO_FIELDS = ["Hypertension", "diabetes", "heart_disease"]
+# 0/1 inputs of models without a passthrough group (StandardScaler only)
+FLAG_COLUMNS = ["BP_Medications"]
+
+# Some pipelines expect lowercased column names or slightly different names.
+# Implement per-disease renames if you used them during training (examples below).
+# Add renames used in your training pipelines if needed:
+RENAME_MAP = {
+    # heart_attack used "CK-MB" sometimes
+    "CK_MB": "CK-MB",
+    "Troponin_level": "Troponin",
+    "Heart rate": "heart_rate",
+    "Systolic blood pressure": "systolic_bp",
+    "Diastolic blood pressure": "diastolic_bp",
+    "ChestPainType": "chest_pain_type",
+    "RestingBP": "resting_bp",
+    "FastingBS": "fasting_bs",
+    "RestingECG": "resting_ecg",
+    "MaxHR": "max_hr",
+    "ExerciseAngina": "exercise_angina",
+    "Oldpeak": "oldpeak",
+    "ST_Slope": "st_slope",
+    "Heart_disease": "heart_disease",
+    "Glucose_level": "glucose_level",
+    "Smoking_status": "smoking_status"
+}
+
 # ---------------------------------------------------------------------
 # Model loading & caching (loads once)
 # Directory expected: backend/models/{disease}/{disease}_model.keras, etc.
 # ---------------------------------------------------------------------
 MODELS = None
+# name -> memory figures measured while loading (see _measure_assets)
+MODEL_MEMORY: Dict[str, Dict[str, int]] = {}
+
+def _measure_assets(model, preprocessor, rss_before: int) -> Dict[str, int]:
+    weights_bytes = 0
+    try:
+        if hasattr(model, "nbytes"):
+            weights_bytes = int(model.nbytes)
+        else:
+            weights_bytes = int(sum(np.asarray(w.numpy()).nbytes for w in model.weights))
+    except Exception:
+        pass
+    try:
+        preprocessor_bytes = len(pickle.dumps(preprocessor))
+    except Exception:
+        preprocessor_bytes = 0
+    return {
+        "rss_delta_bytes": current_rss_bytes() - rss_before,
+        "weights_bytes": weights_bytes,
+        "preprocessor_bytes": preprocessor_bytes,
+    }
+
+def _model_families() -> Dict[str, str]:
+    """MODEL_FAMILIES="cad=logreg,heart_failure=gbt" -> {"cad": "logreg", ...}; default "mlp"."""
+    families = {}
+    for item in os.getenv("MODEL_FAMILIES", "").split(","):
+        if "=" in item:
+            name, family = (x.strip() for x in item.split("=", 1))
+            if family not in FAMILIES:
+                print(f"❌ Unknown model family '{family}' for {name}; using mlp")
+                continue
+            families[name] = family
+    return families
 
 def load_all_models(base_path: str = None):
     global MODELS
@@ -141,13 +222,16 @@ def load_all_models(base_path: str = None):
         base_path = os.path.join(os.path.dirname(__file__), "models")
 
     model_names = ["stroke", "heart_failure", "hypertension", "heart_attack", "cad"]
+    families = _model_families()
     models = {}
 
     print("🚀 Loading models from:", base_path)
     for name in model_names:
         try:
             model_dir = os.path.join(base_path, name)
-            model_path = os.path.join(model_dir, f"{name}_model.keras")
+            family = families.get(name, "mlp")
+            model_file = f"{name}_model.keras" if family == "mlp" else f"{name}_{family}.npz"
+            model_path = os.path.join(model_dir, model_file)
             preproc_path = os.path.join(model_dir, f"{name}_preprocessor.joblib")
             cols_path = os.path.join(model_dir, f"{name}_columns.json")
 
@@ -162,32 +246,214 @@ def load_all_models(base_path: str = None):
                 raise FileNotFoundError(f"Columns file not found: {cols_path}")
 
             # Load
-            model = tf.keras.models.load_model(model_path)
+            rss_before = current_rss_bytes()
+            if family == "mlp":
+                model = tf.keras.models.load_model(model_path)
+            else:
+                model = load_fast_model(model_path)
             preprocessor = joblib.load(preproc_path)
             with open(cols_path, "r") as f:
                 columns = json.load(f)
 
-            models[name] = {"model": model, "preprocessor": preprocessor, "columns": columns}
-            print(f"✅ Loaded {name} (features: {len(columns)})")
+            models[name] = {"model": model, "preprocessor": preprocessor, "columns": columns, "family": family,
+                            "path": model_path}
+            MODEL_MEMORY[name] = _measure_assets(model, preprocessor, rss_before)
+            print(f"✅ Loaded {name} [{family}] (features: {len(columns)})")
         except Exception as e:
             print(f"❌ Error loading {name}: {e}")
             # Fail fast: set MODELS to None and return None
             MODELS = None
             return None
 
+    del model, preprocessor  # only models[] refers to them (see _release_keras)
     MODELS = models
+    _build_schema(models)
+    _build_fused(models)
+    _build_guards(models)
+    _reset_explainer()
+    FIELD_DEPENDENCIES.clear()
+    FIELD_DEPENDENCIES.update(field_dependencies(models))
     print("-" * 40)
     return MODELS
 
+# ---------------------------------------------------------------------
+# Which template fields feed which model (from {disease}_columns.json)
+# ---------------------------------------------------------------------
+FIELD_DEPENDENCIES: Dict[str, List[str]] = {}
+
+def field_dependencies(models: Dict[str, Any]) -> Dict[str, List[str]]:
+    """master_input_template field (or model column) -> diseases whose model takes it as an input column."""
+    deps = {field: [] for field in master_input_template}
+    for name, assets in models.items():
+        for col in assets["columns"]:
+            deps.setdefault(col, []).append(name)
+    return deps
+
+# ---------------------------------------------------------------------
+# Typed input decoding (input_schema.py): one pass per payload instead of the template
+# merge + per-model pandas coercion, with a field-level report. Opt-in with
+# INPUT_SCHEMA=1: it scores Y/N flags and invalid values differently from the plain
+# merge (the default), see the README migration note.
+# ---------------------------------------------------------------------
+SCHEMA = None
+
+def _build_schema(models: Dict[str, Any]):
+    global SCHEMA
+    SCHEMA = None
+    if os.getenv("INPUT_SCHEMA", "0") != "1":
+        return
+    SCHEMA = InputSchema(master_input_template, models, _extract_feature_groups,
+                         sex_fields=["Sex"], flag_fields=YES_NO_FIELDS + FLAG_COLUMNS, aliases=RENAME_MAP)
+    print(f"✅ Input schema compiled ({len(SCHEMA.fields)} fields)")
+
+def decode_input(patient_data: Dict[str, Any], defaulted: bool = True):
+    """(model input row, validation report); the report is None without a schema."""
+    if SCHEMA is None:
+        return _merge_with_template(patient_data), None
+    return SCHEMA.decode(patient_data, defaulted)
+
+# ---------------------------------------------------------------------
+# Fused inference (FUSED_INFERENCE=1): all MLPs in one batched pass, see fused.py.
+# QUANTIZED_MODE=float16|int8 serves a validated reduced-precision copy instead, see quantized.py.
+# ---------------------------------------------------------------------
+FUSED = None
+# RSS around dropping the Keras models once a quantized copy serves them (/debug/memory)
+KERAS_RELEASE: Dict[str, int] = {}
+# FUSED weight bytes (resident vs float32) and what one predict() allocates (/debug/memory)
+FUSED_MEMORY: Dict[str, Any] = {}
+
+def _measure_fused(fused):
+    quantized = getattr(fused, "quantized", None)
+    float32 = (sum(q.size * 4 + b.nbytes for q, _, b, _ in quantized) if quantized else fused.nbytes)
+    predict_peak = {}
+    for rows in (1, 256):
+        Xs = {n: np.zeros((rows, d), dtype=np.float32) for n, d in zip(fused.names, fused.input_dims)}
+        fused.predict(Xs)
+        predict_peak[f"rows_{rows}"] = peak_allocation_bytes(lambda: fused.predict(Xs))
+    FUSED_MEMORY.clear()
+    FUSED_MEMORY.update(kind=getattr(fused, "mode", "float32"), weight_bytes=fused.nbytes,
+                        float32_weight_bytes=float32, predict_peak_bytes=predict_peak)
+
+class _LazyKerasModel:
+    """Stands in for a Keras model the quantized ensemble replaced: loaded again from its
+    .keras file the first time anything (per-model fallback, attributions) touches it."""
+    def __init__(self, path: str):
+        self.path = path
+        self.loaded = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        with self._lock:
+            if self.loaded is None:
+                print(f"📦 Reloading {os.path.basename(self.path)} for the float32 path")
+                self.loaded = tf.keras.models.load_model(self.path)
+        return getattr(self.loaded, attr)
+
+def _trim_heap():
+    """Hand freed heap pages back to the OS (glibc only), so the drop shows in RSS."""
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+def _release_keras(models: Dict[str, Any], names: List[str]):
+    """Swap the named Keras models for lazy handles so only the quantized arrays stay resident."""
+    rss_before = current_rss_bytes()
+    for name in names:
+        models[name]["model"] = _LazyKerasModel(models[name]["path"])
+    tf.keras.backend.clear_session()
+    gc.collect()
+    _trim_heap()
+    KERAS_RELEASE.update(rss_before_bytes=rss_before, rss_after_bytes=current_rss_bytes())
+    print(f"✅ Dropped Keras copies of {names}: RSS {rss_before / 2**20:.1f} -> "
+          f"{KERAS_RELEASE['rss_after_bytes'] / 2**20:.1f} MiB")
+
+def _build_fused(models: Dict[str, Any]):
+    global FUSED
+    FUSED = None
+    FUSED_MEMORY.clear()
+    mlps = {name: a["model"] for name, a in models.items() if a.get("family", "mlp") == "mlp"}
+    quantized_mode = os.getenv("QUANTIZED_MODE")
+    if quantized_mode:
+        try:
+            FUSED = load_quantized(quantized_mode, mlps)
+            print(f"✅ Quantized ({quantized_mode}) inference enabled for {FUSED.names} ({FUSED.nbytes / 1024:.1f} KiB)")
+            del mlps
+            _release_keras(models, FUSED.names)
+            _measure_fused(FUSED)
+            return
+        except (UnsupportedModel, QuantizationRejected) as e:
+            print(f"❌ Quantized inference refused, keeping float32: {e}")
+    if os.getenv("FUSED_INFERENCE", "0") != "1":
+        return
+    try:
+        fused = FusedEnsemble.from_models(mlps)
+        diffs = fused.verify(mlps, atol=float(os.getenv("FUSED_TOLERANCE", 1e-5)))
+        FUSED = fused
+        _measure_fused(FUSED)
+        print(f"✅ Fused inference enabled for {fused.names} (max diff vs Keras: {max(diffs.values()):.2e})")
+    except (UnsupportedModel, AssertionError) as e:
+        print(f"❌ Fused inference disabled: {e}")
+
+# ---------------------------------------------------------------------
+# Per-model time budgets, bulkheads and circuit breakers (resilience.py);
+# MODEL_TIMEOUT_MS=0 scores the models sequentially without limits, as before.
+# ---------------------------------------------------------------------
+GUARDS = None
+
+def _build_guards(models: Dict[str, Any]):
+    global GUARDS
+    GUARDS = resilience.from_env(models)
+
+def _warm_up(models: Dict[str, Any]):
+    """The first predict() of each Keras model traces its graph; run it once before
+    serving so that it does not count against a request's time budget."""
+    for name, assets in models.items():
+        if isinstance(assets["model"], _LazyKerasModel) and assets["model"].loaded is None:
+            continue  # served by the quantized ensemble; traced if it is ever reloaded
+        try:
+            predict_disease(dict(master_input_template), assets, name)
+        except Exception as e:
+            print(f"❌ Warm-up of {name} failed: {e}")
+
+def model_guard_stats() -> Dict[str, Any]:
+    return GUARDS.stats() if GUARDS is not None else {}
+
+# ---------------------------------------------------------------------
+# Attributions ("why this risk?"), see explain.py; built on first use
+# ---------------------------------------------------------------------
+EXPLAINER = None
+
+def _reset_explainer():
+    global EXPLAINER, SWEEP_FUSED
+    EXPLAINER = None
+    SWEEP_FUSED = None
+
+def _get_explainer(models: Dict[str, Any]) -> Explainer:
+    global EXPLAINER
+    if EXPLAINER is None:
+        EXPLAINER = Explainer(models, _prepare_dataframe_for_model, master_input_template,
+                              list(master_input_template), aliases=RENAME_MAP)
+    return EXPLAINER
+
 # Attempt to load at import time (so Flask startup is immediate)
 load_all_models()
 
 # ---------------------------------------------------------------------
 # Generic prediction helper (applies necessary renames and mappings)
 # ---------------------------------------------------------------------
-def _prepare_dataframe_for_model(patient: Dict[str, Any], assets: Dict[str, Any], disease_name: str) -> pd.DataFrame:
-    """Return a dataframe aligned with model columns, after light normalization."""
-    df = pd.DataFrame([patient]).copy()
+def _prepare_dataframe_for_model(patient, assets: Dict[str, Any], disease_name: str) -> pd.DataFrame:
+    """Return a dataframe aligned with model columns, after light normalization.
+    `patient` may be a single dict, a list of dicts (one row per patient) or a DataFrame
+    of such rows (shared across models by the batch paths; it is not modified).
+    Rows from decode_input() are already typed and go straight to the schema's frame()."""
+    if SCHEMA is not None and SCHEMA.covers(patient, assets, disease_name):
+        return SCHEMA.frame(patient, disease_name)
+    if isinstance(patient, pd.DataFrame):
+        df = patient.copy()
+    else:
+        rows = patient if isinstance(patient, list) else [patient]
+        df = pd.DataFrame(rows).copy()
 
     # Common normalizations
     # Map Sex / Gender -> numeric 'sex' or 'Sex' depending on what models expect
@@ -203,33 +469,11 @@ def _prepare_dataframe_for_model(patient: Dict[str, Any], assets: Dict[str, Any]
             pass
 
     # Map common boolean-like fields
-    for col in ["Hypertension", "diabetes", "heart_disease"]:
+    for col in YES_NO_FIELDS:
         if col in df:
             df[col] = df[col].apply(_map_yes_no)
 
-    # Some pipelines expect lowercased column names or slightly different names.
-    # Implement per-disease renames if you used them during training (examples below).
-    # Add renames used in your training pipelines if needed:
-    rename_map = {
-        # heart_attack used "CK-MB" sometimes
-        "CK_MB": "CK-MB",
-        "Troponin_level": "Troponin",
-        "Heart rate": "heart_rate",
-        "Systolic blood pressure": "systolic_bp",
-        "Diastolic blood pressure": "diastolic_bp",
-        "ChestPainType": "chest_pain_type",
-        "RestingBP": "resting_bp",
-        "FastingBS": "fasting_bs",
-        "RestingECG": "resting_ecg",
-        "MaxHR": "max_hr",
-        "ExerciseAngina": "exercise_angina",
-        "Oldpeak": "oldpeak",
-        "ST_Slope": "st_slope",
-        "Heart_disease": "heart_disease",
-        "Glucose_level": "glucose_level",
-        "Smoking_status": "smoking_status"
-    }
-    for a, b in rename_map.items():
+    for a, b in RENAME_MAP.items():
         if a in df.columns and b not in df.columns:
             df.rename(columns={a: b}, inplace=True)
 
@@ -254,29 +498,92 @@ def predict_disease(patient: Dict[str, Any], assets: Dict[str, Any], disease_nam
     print(f"🔢 [{disease_name.upper()}] Model raw output: {pred}")
     return pred
 
+def predict_disease_batch(patients: List[Dict[str, Any]], assets: Dict[str, Any], disease_name: str) -> np.ndarray:
+    """Batched variant of predict_disease(): one preprocessor + model call for all rows.
+    Returns a 1-D array of probabilities in [0,1], in the order of `patients`."""
+    if len(patients) == 0:
+        return np.zeros(0, dtype=float)
+    if not isinstance(patients, pd.DataFrame):
+        patients = list(patients)
+    df_pre = _prepare_dataframe_for_model(patients, assets, disease_name)
+    X = assets["preprocessor"].transform(df_pre)
+    preds = np.asarray(assets["model"].predict(X, verbose=0), dtype=float).reshape(-1)
+    print(f"🔢 [{disease_name.upper()}] Batch of {len(patients)} scored")
+    return preds
+
+def _risk_level(pct: float) -> str:
+    return "High" if pct > 70 else ("Moderate" if pct > 50 else "Low")
+
+def _prediction_entry(prob: float) -> Dict[str, Any]:
+    pct = round(float(prob) * 100, 2)
+    return {"score": float(pct), "risk": _risk_level(pct)}
+
+def _score_models(rows: List[Dict[str, Any]], models: Dict[str, Any], fused=None) -> Dict[str, Any]:
+    """disease -> (len(rows),) probabilities, or the Exception raised for that disease.
+    Uses the fused ensemble (`fused`, else FUSED when enabled) for the MLPs, per-model
+    calls otherwise; with GUARDS the per-model calls run concurrently under their time
+    budgets and breakers."""
+    fused = fused if fused is not None else FUSED
+    scores = {}
+    pending = dict(models)
+    if GUARDS is not None:
+        for name in list(pending):
+            if not GUARDS.available(name):
+                scores[name] = resilience.CircuitOpen()
+                pending.pop(name)
+    # built once, shared by every model (decoded rows are framed per model directly)
+    source = pd.DataFrame(rows) if len(rows) > 1 and not isinstance(rows[0], Decoded) else rows
+    if fused is not None:
+        try:
+            Xs = {name: models[name]["preprocessor"].transform(_prepare_dataframe_for_model(source, models[name], name))
+                  for name in fused.names if name in pending}
+            if Xs:
+                scores.update(fused.predict(Xs))
+            for name in Xs:
+                pending.pop(name)
+                if GUARDS is not None:
+                    GUARDS[name].breaker.record_success()
+        except Exception as e:
+            print(f"❌ Fused inference failed, falling back to per-model: {e}")
+
+    def call(name, assets):
+        if len(rows) == 1:
+            return lambda: np.array([predict_disease(rows[0], assets, name)])
+        return lambda: predict_disease_batch(source, assets, name)
+
+    if GUARDS is not None:
+        scores.update(GUARDS.run({name: call(name, assets) for name, assets in pending.items()}, len(rows)))
+    else:
+        for name, assets in pending.items():
+            try:
+                scores[name] = call(name, assets)()
+            except Exception as e:
+                scores[name] = e
+    return {name: scores[name] for name in models}
+
+def _merge_with_template(patient_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Overlay known keys of patient_data on a copy of master_input_template."""
+    final_input = dict(master_input_template)
+    for key, value in patient_data.items():
+        if key in final_input:
+            final_input[key] = value
+    return final_input
+
 # ---------------------------------------------------------------------
 # Public API: predict_all_diseases()
 # ---------------------------------------------------------------------
-def predict_all_diseases(patient_data: Dict[str, Any]) -> Dict[str, Any]:
+def predict_all_diseases(patient_data: Dict[str, Any], explain: str = None) -> Dict[str, Any]:
     """Main entrypoint for Flask app. 
-    Merges frontend data with master_input_template (defaults)."""
+    Merges frontend data with master_input_template (defaults).
+    explain="ig" / "grad_input" also returns per-field attributions (explain.py)."""
     models = MODELS if MODELS is not None else load_all_models()
     if models is None:
         return {"error": "Models not loaded. Ensure backend/models/* exists and is correct."}
 
-    # ✅ Deep copy of master template
-    final_input = dict(master_input_template)
-
     # ✅ Override defaults with frontend values (only if key exists in master_input_template)
-    if isinstance(patient_data, dict):
-        for key, value in patient_data.items():
-            if key in final_input:
-                final_input[key] = value
-            else:
-                # Ignore unknown keys safely
-                pass
-    else:
+    if not isinstance(patient_data, dict):
         return {"error": "Invalid input format (expected JSON object)"}
+    final_input, report = decode_input(patient_data)
 
     print("\n🧾 [MERGED FINAL INPUT] Sent to models:")
     for k, v in list(final_input.items())[:15]:
@@ -286,14 +593,297 @@ def predict_all_diseases(patient_data: Dict[str, Any]) -> Dict[str, Any]:
 
     # ✅ Predict with each model
     predictions = {}
-    for disease_name, assets in models.items():
+    for disease_name, probs in _score_models([final_input], models).items():
+        if isinstance(probs, Exception):
+            print(f"❌ Error predicting {disease_name}: {probs}")
+            predictions[disease_name] = {"error": str(probs)}
+        else:
+            predictions[disease_name] = _prediction_entry(probs[0])
+
+    result = {"predictions": predictions}
+    if report is not None:
+        result["validation"] = report
+    if explain:
+        result["explanations"] = _explain_rows([final_input], models, explain)[0]
+    return result
+
+def predict_all_diseases_batch(patients: List[Dict[str, Any]], explain: str = None) -> List[Dict[str, Any]]:
+    """Score many patients at once: one preprocessor + model call per disease for the
+    whole batch. Returns one result dict per patient, shaped like predict_all_diseases()
+    ("validation" without the defaulted list, and only when it has something to report)."""
+    models = MODELS if MODELS is not None else load_all_models()
+    if models is None:
+        return [{"error": "Models not loaded. Ensure backend/models/* exists and is correct."} for _ in patients]
+
+    results: List[Dict[str, Any]] = [None] * len(patients)
+    valid_idx, merged, reports = [], [], []
+    for i, patient_data in enumerate(patients):
+        if isinstance(patient_data, dict):
+            valid_idx.append(i)
+            row, report = decode_input(patient_data, defaulted=False)
+            merged.append(row)
+            reports.append(report)
+        else:
+            results[i] = {"error": "Invalid input format (expected JSON object)"}
+
+    per_patient = [{} for _ in merged]
+    if merged:
+        for disease_name, probs in _score_models(merged, models).items():
+            if isinstance(probs, Exception):
+                print(f"❌ Error predicting {disease_name} (batch): {probs}")
+                for j in range(len(merged)):
+                    per_patient[j][disease_name] = {"error": str(probs)}
+            else:
+                for j, prob in enumerate(probs):
+                    per_patient[j][disease_name] = _prediction_entry(prob)
+
+    explanations = _explain_rows(merged, models, explain) if explain and merged else None
+    for j, (i, preds) in enumerate(zip(valid_idx, per_patient)):
+        results[i] = {"predictions": preds}
+        if reports[j] is not None and any(reports[j].values()):
+            results[i]["validation"] = reports[j]
+        if explanations is not None:
+            results[i]["explanations"] = explanations[j]
+    return results
+
+def _explain_rows(rows: List[Dict[str, Any]], models: Dict[str, Any], method: str) -> List[Dict[str, Any]]:
+    try:
+        return _get_explainer(models).explain(rows, method)
+    except Exception as e:
+        print(f"❌ Error computing attributions: {e}")
+        return [{"error": str(e)} for _ in rows]
+
+# ---------------------------------------------------------------------
+# Incremental re-scoring: rerun only models whose inputs changed (sessions.py)
+# ---------------------------------------------------------------------
+SESSIONS = SessionStore()
+
+def predict_all_diseases_incremental(patient_data: Dict[str, Any], session_key: str,
+                                     explain: str = None) -> Dict[str, Any]:
+    """predict_all_diseases() for a user refining one submission: diffs the merged input
+    against the user's last one and reuses stored predictions for every model that takes
+    none of the changed fields. The response is the same as predict_all_diseases(): the
+    key is an unauthenticated email, so nothing about the stored profile (changed
+    fields, which models were reused) is returned; that goes to the log only."""
+    return predict_all_diseases_incremental_batch([(patient_data, session_key)], explain)[0]
+
+def predict_all_diseases_incremental_batch(requests: List[Tuple[Dict[str, Any], str]],
+                                           explain: str = None) -> List[Dict[str, Any]]:
+    """predict_all_diseases_incremental() for many (patient_data, session_key) pairs, e.g.
+    from different callers of the inference pool: each model runs once over all the rows
+    that need it. A key repeated in the batch is diffed against its earlier submission."""
+    models = MODELS if MODELS is not None else load_all_models()
+    if models is None:
+        return [{"error": "Models not loaded. Ensure backend/models/* exists and is correct."} for _ in requests]
+    results: List[Dict[str, Any]] = [None] * len(requests)
+    todo = list(range(len(requests)))
+    while todo:
+        seen, now, later = set(), [], []
+        for i in todo:
+            (later if requests[i][1] in seen else now).append(i)
+            seen.add(requests[i][1])
+        _incremental_round(requests, now, models, explain, results)
+        todo = later
+    return results
+
+def _incremental_round(requests, indices: List[int], models: Dict[str, Any], explain: str,
+                       results: List[Dict[str, Any]]):
+    """Score requests[i] for i in indices (distinct session keys) into results[i]."""
+    plans = {}
+    for i in indices:
+        patient_data, session_key = requests[i]
+        if not isinstance(patient_data, dict):
+            results[i] = {"error": "Invalid input format (expected JSON object)"}
+            continue
+        final_input, report = decode_input(patient_data)
+        previous = SESSIONS.get(session_key, id(models))
+        if previous is None:
+            changed, recompute = None, list(models)
+        else:
+            changed = [k for k, v in final_input.items() if previous["input"].get(k) != v]
+            touched = {d for field in changed for d in FIELD_DEPENDENCIES.get(field, [])}
+            recompute = [d for d in models if d in touched or "score" not in previous["predictions"].get(d, {})]
+        plans[i] = (final_input, report, previous, changed, recompute)
+
+    # models needed by the same rows are scored in one call (all of them for new sessions)
+    groups: Dict[Tuple[int, ...], List[str]] = {}
+    for disease_name in models:
+        rows = tuple(i for i, plan in plans.items() if disease_name in plan[4])
+        if rows:
+            groups.setdefault(rows, []).append(disease_name)
+    scores = {i: {} for i in plans}
+    for rows, diseases in groups.items():
+        scored = _score_models([plans[i][0] for i in rows], {d: models[d] for d in diseases})
+        for disease_name, probs in scored.items():
+            for j, i in enumerate(rows):
+                scores[i][disease_name] = probs if isinstance(probs, Exception) else probs[j]
+
+    explanations = (_explain_rows([plan[0] for plan in plans.values()], models, explain)
+                    if explain and plans else None)
+    for j, (i, (final_input, report, previous, changed, recompute)) in enumerate(plans.items()):
+        predictions = {}
+        for disease_name in models:
+            if disease_name not in scores[i]:
+                predictions[disease_name] = previous["predictions"][disease_name]
+            elif isinstance(scores[i][disease_name], Exception):
+                print(f"❌ Error predicting {disease_name}: {scores[i][disease_name]}")
+                predictions[disease_name] = {"error": str(scores[i][disease_name])}
+            else:
+                predictions[disease_name] = _prediction_entry(scores[i][disease_name])
+
+        SESSIONS.put(requests[i][1], final_input, predictions, id(models))
+        SESSIONS.record(len(recompute), len(models) - len(recompute))
+        print(f"♻️  [SESSION] recomputed {recompute or 'nothing'}; changed fields: "
+              f"{changed if changed is not None else 'new session'}")
+
+        results[i] = {"predictions": predictions}
+        if report is not None:
+            results[i]["validation"] = report
+        if explanations is not None:
+            results[i]["explanations"] = explanations[j]
+
+# ---------------------------------------------------------------------
+# What-if sweeps: risk curves over one or two field grids
+# ---------------------------------------------------------------------
+WHAT_IF_MAX_POINTS = int(os.getenv("WHAT_IF_MAX_POINTS", 10000))
+# what_if's own fused ensemble of the MLPs, built on first use whatever FUSED_INFERENCE says
+SWEEP_FUSED = None
+
+def _get_sweep_fused(models: Dict[str, Any]):
+    """FUSED when serving already uses it, else a FusedEnsemble of the MLPs (None if they
+    cannot be fused; what_if then scores them per model)."""
+    global SWEEP_FUSED
+    if FUSED is not None:
+        return FUSED
+    if SWEEP_FUSED is None:
+        mlps = {n: a["model"] for n, a in models.items() if a.get("family", "mlp") == "mlp"}
         try:
-            prob = predict_disease(final_input, assets, disease_name)
-            pct = round(float(prob) * 100, 2)
-            level = "High" if pct > 70 else ("Moderate" if pct > 50 else "Low")
-            predictions[disease_name] = {"score": float(pct), "risk": level}
-        except Exception as e:
-            print(f"❌ Error predicting {disease_name}: {e}")
-            predictions[disease_name] = {"error": str(e)}
+            SWEEP_FUSED = FusedEnsemble.from_models(mlps)
+        except UnsupportedModel as e:
+            print(f"❌ What-if sweeps stay on per-model calls: {e}")
+            SWEEP_FUSED = False
+    return SWEEP_FUSED or None
+_RISK_CODES = {"Low": 0, "Moderate": 1, "High": 2}
+
+def _grid_size(axis: Dict[str, Any]) -> int:
+    """Number of points an axis asks for, without building it."""
+    if "values" in axis:
+        if not isinstance(axis["values"], list):
+            raise ValueError("values must be a list")
+        return len(axis["values"])
+    return int(axis.get("steps", 50))
+
+def _grid_values(axis: Dict[str, Any]) -> List[Any]:
+    if "values" in axis:
+        values = list(axis["values"])
+    else:
+        lo, hi, steps = float(axis["min"]), float(axis["max"]), int(axis.get("steps", 50))
+        values = [round(float(v), 6) for v in np.linspace(lo, hi, steps)]
+    if not values:
+        raise ValueError(f"empty grid for {axis.get('field')}")
+    return values
+
+def _label_flips(labels: np.ndarray, axes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Neighbouring grid points (along each axis) whose risk label differs."""
+    codes = np.vectorize(_RISK_CODES.get)(labels)
+    names = ["Low", "Moderate", "High"]
+    flips = []
+    for a, axis in enumerate(axes):
+        lo = [slice(None)] * codes.ndim
+        hi = [slice(None)] * codes.ndim
+        lo[a], hi[a] = slice(None, -1), slice(1, None)
+        for idx in zip(*np.nonzero(codes[tuple(lo)] != codes[tuple(hi)])):
+            at = {ax["field"]: ax["values"][i] for ax, i in zip(axes, idx)}
+            nxt = list(idx)
+            nxt[a] += 1
+            flips.append({"axis": axis["field"], "from_value": axis["values"][idx[a]],
+                          "to_value": axis["values"][nxt[a]], "at": at,
+                          "from": names[codes[tuple(idx)]], "to": names[codes[tuple(nxt)]]})
+    return flips
+
+def what_if(base_patient: Dict[str, Any], grid: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Score base_patient with one or two fields swept over a grid, e.g.
+    grid=[{"field": "systolic_bp", "min": 100, "max": 200, "steps": 50}, {"field": "BMI", "values": [...]}].
+    All grid points go through each affected model as one batch, the MLPs through a fused
+    ensemble whether or not FUSED_INFERENCE is set (the default 50x50 grid takes about
+    0.1 s on one core); models that take none of the swept fields are listed as
+    unaffected instead of being rescored."""
+    models = MODELS if MODELS is not None else load_all_models()
+    if models is None:
+        return {"error": "Models not loaded. Ensure backend/models/* exists and is correct."}
+    if not isinstance(base_patient, dict):
+        return {"error": "Invalid input format (expected JSON object)"}
+    if not isinstance(grid, list) or not 1 <= len(grid) <= 2:
+        return {"error": "grid must list one or two axes"}
+
+    # sizes first: a huge "steps" must be refused before anything is allocated
+    shape = []
+    for axis in grid:
+        field = axis.get("field") if isinstance(axis, dict) else None
+        if field not in master_input_template and (SCHEMA is None or field not in SCHEMA.fields):
+            return {"error": f"unknown field: {field}"}
+        try:
+            size = _grid_size(axis)
+        except (TypeError, ValueError) as e:
+            return {"error": f"invalid grid for {field}: {e}"}
+        if size < 1:
+            return {"error": f"empty grid for {field}"}
+        shape.append(size)
+    if len({axis["field"] for axis in grid}) != len(grid):
+        return {"error": "grid axes must use different fields"}
+    points = 1
+    for size in shape:
+        points *= size
+    if points > WHAT_IF_MAX_POINTS:
+        return {"error": f"grid has {points} points (max {WHAT_IF_MAX_POINTS})"}
+
+    axes = []
+    for axis in grid:
+        field = axis["field"]
+        try:
+            axes.append({"field": field, "values": _grid_values(axis)})
+        except (KeyError, TypeError, ValueError) as e:
+            return {"error": f"invalid grid for {field}: {e}"}
+        if SCHEMA is not None:
+            # grid points are scored like submitted values, see decode_input()
+            typed = [SCHEMA.coerce(field, v) for v in axes[-1]["values"]]
+            errors = [error for _, error in typed if error]
+            if errors:
+                return {"error": f"invalid grid for {field}: {errors[0]}"}
+            axes[-1]["typed"] = [v for v, _ in typed]
+    shape = tuple(len(a["values"]) for a in axes)
+
+    affected = sorted({d for a in axes for d in FIELD_DEPENDENCIES.get(a["field"], [])},
+                      key=list(models).index)
+    base, _ = decode_input(base_patient, defaulted=False)
+    rows = []
+    for point in np.ndindex(*shape):
+        row = type(base)(base)
+        for axis, i in zip(axes, point):
+            row[axis["field"]] = axis.get("typed", axis["values"])[i]
+        rows.append(row)
+
+    diseases = {}
+    for name, probs in _score_models(rows, {d: models[d] for d in affected}, _get_sweep_fused(models)).items():
+        if isinstance(probs, Exception):
+            diseases[name] = {"error": str(probs)}
+            continue
+        scores = np.round(np.asarray(probs, dtype=float) * 100, 2).reshape(shape)
+        labels = np.vectorize(_risk_level, otypes=[object])(scores)
+        diseases[name] = {"scores": scores.tolist(), "risk": labels.tolist(), "flips": _label_flips(labels, axes)}
+
+    for axis in axes:
+        axis.pop("typed", None)
+    return {
+        "axes": axes,
+        "base": {k: base[k] for k in base_patient if k in base},
+        "diseases": diseases,
+        "unaffected": [d for d in models if d not in affected],
+    }
 
-    return {"predictions": predictions}
+def warm_up_for_serving():
+    """Trace every model before the first guarded request. Called by the serving entry
+    points (app.py / asgi_app.py via inference_pool.resolve_predictor, pool workers),
+    not at import, so parity.py, retrain.py and the other CLIs skip it."""
+    if MODELS is not None and GUARDS is not None and os.getenv("MODEL_WARMUP", "1") == "1":
+        _warm_up(MODELS)
@@ -0,0 +1,284 @@
+# backend/maintenance.py
+"""
+Retention, downsampling and compaction for the predictions table.
+
+Each /predict_all by a signed-in user adds five rows. A maintenance pass:
+
+  1. deletes rows older than RETENTION_MAX_DAYS altogether (0 = keep downsampled rows
+     forever)
+  2. downsamples days older than RETENTION_RAW_DAYS to the latest row per
+     (email, disease, day), i.e. the score the user ended the day with; rows with an
+     outcome label (outcomes.py) are kept as training data
+  3. prunes rollup_user_day (rollups.py) for days that are no longer written to
+  4. returns freed pages to the filesystem with PRAGMA incremental_vacuum, a few
+     pages at a time
+  5. runs a PASSIVE WAL checkpoint (never waits for readers or writers)
+
+Deletes run in transactions of at most MAINTENANCE_BATCH_ROWS rows with a
+MAINTENANCE_PAUSE_MS pause in between, so /predict_all inserts only ever wait for one
+short batch; the longest write transaction of each pass is reported as
+max_write_ms. The dashboard rollups are maintained on insert and are not touched by
+deletes, so day-level counts survive downsampling.
+
+RETENTION_RAW_DAYS=0 (the default) keeps every raw row; the pass then only vacuums and
+checkpoints. With PREDICTION_SHARDS (database.py) every shard file gets the same
+pass, one after another. In the Flask app the pass runs every MAINTENANCE_INTERVAL_S seconds on a
+background thread (0 = off); a lease row in maintenance_state makes sure only one
+worker process runs it at a time. From cron / by hand:
+    python maintenance.py [--enable-incremental-vacuum]
+"""
+import os
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from database import get_db_connection, prediction_shards
+
+STATE_TABLE = "CREATE TABLE IF NOT EXISTS maintenance_state (key TEXT PRIMARY KEY, value TEXT)"
+
+def _day(days_ago: int, now: datetime) -> str:
+    return (now - timedelta(days=days_ago)).strftime("%Y-%m-%d")
+
+def _next_day(day: str) -> str:
+    return (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+
+class MaintenanceJob:
+    def __init__(self, raw_days: int = 0, max_days: int = 0, batch_rows: int = 5000, pause_s: float = 0.05,
+                 vacuum_pages: int = 256, interval_s: float = 0, connect: Callable = get_db_connection,
+                 shards: Callable = prediction_shards,
+                 now: Callable[[], datetime] = lambda: datetime.now(timezone.utc), sleep: Callable = time.sleep):
+        if max_days and raw_days and max_days < raw_days:
+            raise ValueError("RETENTION_MAX_DAYS must be >= RETENTION_RAW_DAYS")
+        self.raw_days = raw_days
+        self.max_days = max_days
+        self.batch_rows = batch_rows
+        self.pause_s = pause_s
+        self.vacuum_pages = vacuum_pages
+        self.interval_s = interval_s
+        self._connect = connect
+        self._shards = shards
+        self._now = now
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._runs = 0
+        self._last: Optional[Dict[str, Any]] = None
+
+    # -----------------------------------------------------------------
+    # Small write transactions
+    # -----------------------------------------------------------------
+    def _timed_write(self, conn, report: Dict[str, Any], fn) -> int:
+        t0 = time.perf_counter()
+        n = fn()
+        conn.commit()
+        report["max_write_ms"] = max(report["max_write_ms"], (time.perf_counter() - t0) * 1000)
+        report["write_batches"] += 1
+        self._sleep(self.pause_s)
+        return n
+
+    def _delete_ids(self, conn, ids: List[int], report: Dict[str, Any]) -> int:
+        for i in range(0, len(ids), self.batch_rows):
+            batch = [(x,) for x in ids[i:i + self.batch_rows]]
+            self._timed_write(conn, report, lambda: conn.executemany("DELETE FROM predictions WHERE id = ?", batch))
+        return len(ids)
+
+    def _delete_where(self, conn, sql: str, params: tuple, report: Dict[str, Any]) -> int:
+        """Repeat a `DELETE ... LIMIT batch_rows` style statement until it deletes nothing."""
+        total = 0
+        while True:
+            n = self._timed_write(conn, report, lambda: conn.execute(sql, params + (self.batch_rows,)).rowcount)
+            total += n
+            if n == 0:
+                return total
+
+    def _state(self, conn, key: str) -> Optional[str]:
+        row = conn.execute("SELECT value FROM maintenance_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, conn, key: str, value):
+        conn.execute("INSERT INTO maintenance_state (key, value) VALUES (?, ?) "
+                     "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (key, str(value)))
+        conn.commit()
+
+    def _acquire_lease(self, conn, ttl_s: float) -> bool:
+        now = time.time()
+        conn.execute("INSERT INTO maintenance_state (key, value) VALUES ('lease_until', '0') ON CONFLICT (key) DO NOTHING")
+        cur = conn.execute("UPDATE maintenance_state SET value = ? WHERE key = 'lease_until' AND CAST(value AS REAL) < ?",
+                           (str(now + ttl_s), now))
+        conn.commit()
+        return cur.rowcount == 1
+
+    # -----------------------------------------------------------------
+    # Steps
+    # -----------------------------------------------------------------
+    def downsample(self, conn, report: Dict[str, Any]):
+        """Keep only the latest row per (email, disease) for each day before the raw cutoff.
+        Days are processed oldest first; a watermark skips days already done."""
+        if not self.raw_days:
+            return
+        cutoff = _day(self.raw_days, self._now())
+        done = self._state(conn, "downsampled_through") or ""
+        days = [r[0] for r in conn.execute(
+            "SELECT DISTINCT substr(timestamp, 1, 10) FROM predictions WHERE timestamp >= ? AND timestamp < ? ORDER BY 1",
+            (_next_day(done) if done else "", cutoff))]
+        for day in days:
+            bounds = (day, _next_day(day))
+            ids = [r[0] for r in conn.execute('''
+                SELECT id FROM predictions WHERE timestamp >= ? AND timestamp < ?
+                AND id NOT IN (SELECT MAX(id) FROM predictions WHERE timestamp >= ? AND timestamp < ?
+                               GROUP BY email, disease_name)
+                AND id NOT IN (SELECT prediction_id FROM outcomes)
+            ''', bounds + bounds)]
+            report["downsampled_rows"] += self._delete_ids(conn, ids, report)
+            self._set_state(conn, "downsampled_through", day)
+            report["downsampled_days"] += 1
+
+    def expire(self, conn, report: Dict[str, Any]):
+        now = self._now()
+        if self.max_days:
+            report["expired_rows"] += self._delete_where(conn, """
+                DELETE FROM predictions WHERE id IN (SELECT id FROM predictions WHERE timestamp < ? LIMIT ?)
+            """, (_day(self.max_days, now),), report)
+            # labels of expired rows go with them
+            report["expired_outcomes"] += self._delete_where(conn, """
+                DELETE FROM outcomes WHERE id IN (SELECT id FROM outcomes o
+                    WHERE NOT EXISTS (SELECT 1 FROM predictions p WHERE p.id = o.prediction_id) LIMIT ?)
+            """, (), report)
+        # feature snapshots (outcomes.py) whose rows were all downsampled or expired
+        if self.raw_days or self.max_days:
+            report["expired_snapshots"] += self._delete_where(conn, """
+                DELETE FROM prediction_requests WHERE id IN (SELECT id FROM prediction_requests r
+                    WHERE NOT EXISTS (SELECT 1 FROM predictions p WHERE p.request_id = r.id) LIMIT ?)
+            """, (), report)
+        # per-user-day rollup bookkeeping is only needed while a day can still get inserts
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'rollup_user_day'").fetchone():
+            report["pruned_rollup_rows"] += self._delete_where(conn, """
+                DELETE FROM rollup_user_day WHERE (day, disease_name, email) IN
+                    (SELECT day, disease_name, email FROM rollup_user_day WHERE day < ? LIMIT ?)
+            """, (_day(max(self.raw_days, 2), now),), report)
+
+    def vacuum(self, conn, report: Dict[str, Any]):
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            report["vacuum"] = "auto_vacuum is not INCREMENTAL; run `python maintenance.py --enable-incremental-vacuum` once"
+            return
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        while free > 0:
+            self._timed_write(conn, report, lambda: conn.execute(f"PRAGMA incremental_vacuum({self.vacuum_pages})").fetchall())
+            left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            report["vacuumed_pages"] += free - left
+            if left >= free:
+                break
+            free = left
+
+    def checkpoint(self, conn, report: Dict[str, Any]):
+        busy, log, checkpointed = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        report["checkpoint"].append({"busy": busy, "wal_pages": log, "checkpointed": checkpointed})
+
+    # -----------------------------------------------------------------
+    # Running
+    # -----------------------------------------------------------------
+    def run_once(self, lease: bool = True) -> Dict[str, Any]:
+        """One full pass over every predictions file (database.PREDICTION_SHARDS);
+        {"skipped": ...} if another process holds the lease."""
+        with self._lock:
+            conn = self._connect()
+            conn.row_factory = None
+            try:
+                conn.execute(STATE_TABLE)
+                if lease and not self._acquire_lease(conn, ttl_s=max(self.interval_s, 600)):
+                    return {"skipped": "another process is running maintenance"}
+                t0 = time.perf_counter()
+                report = {"downsampled_days": 0, "downsampled_rows": 0, "expired_rows": 0, "expired_outcomes": 0,
+                          "expired_snapshots": 0, "pruned_rollup_rows": 0, "vacuumed_pages": 0, "write_batches": 0,
+                          "max_write_ms": 0.0, "checkpoint": []}
+                try:
+                    for _, shard in self._shards():
+                        shard.row_factory = None
+                        try:
+                            shard.execute(STATE_TABLE)
+                            self.expire(shard, report)
+                            self.downsample(shard, report)
+                            self.vacuum(shard, report)
+                            self.checkpoint(shard, report)
+                        finally:
+                            shard.close()
+                finally:
+                    if lease:
+                        self._set_state(conn, "lease_until", 0)
+                report["max_write_ms"] = round(report["max_write_ms"], 2)
+                report["seconds"] = round(time.perf_counter() - t0, 3)
+                report["finished_at"] = self._now().isoformat(timespec="seconds")
+                self._runs += 1
+                self._last = report
+                return report
+            finally:
+                conn.close()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                report = self.run_once()
+                if "skipped" not in report:
+                    print(f"🧹 Maintenance: {report['downsampled_rows']} downsampled, {report['expired_rows']} expired, "
+                          f"{report['vacuumed_pages']} pages vacuumed (max write {report['max_write_ms']} ms)")
+            except Exception as e:
+                print("❌ Maintenance pass failed:", e)
+
+    def start(self):
+        if self.interval_s > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="db-maintenance", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"raw_days": self.raw_days, "max_days": self.max_days, "interval_s": self.interval_s,
+                "runs": self._runs, "last": self._last}
+
+def enable_incremental_vacuum():
+    """One-off: switch existing database files to auto_vacuum=INCREMENTAL. Needs a full
+    VACUUM, which rewrites each file and holds its write lock throughout -- run it during
+    a quiet period."""
+    conns = [get_db_connection()] + [conn for shard, conn in prediction_shards()]
+    seen = set()
+    for conn in conns:
+        try:
+            path = conn.execute("PRAGMA database_list").fetchone()[2]
+            if path not in seen:
+                seen.add(path)
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+        finally:
+            conn.close()
+
+def from_env() -> MaintenanceJob:
+    """  RETENTION_RAW_DAYS        days of raw rows to keep (0 = keep all, no downsampling)
+      RETENTION_MAX_DAYS        delete everything older (0 = never)
+      MAINTENANCE_INTERVAL_S    background pass interval in the app (0 = off)
+      MAINTENANCE_BATCH_ROWS    rows per delete transaction
+      MAINTENANCE_PAUSE_MS      pause between write transactions
+      MAINTENANCE_VACUUM_PAGES  pages per incremental_vacuum step"""
+    return MaintenanceJob(
+        raw_days=int(os.getenv("RETENTION_RAW_DAYS", 0)),
+        max_days=int(os.getenv("RETENTION_MAX_DAYS", 0)),
+        batch_rows=int(os.getenv("MAINTENANCE_BATCH_ROWS", 5000)),
+        pause_s=float(os.getenv("MAINTENANCE_PAUSE_MS", 50)) / 1000.0,
+        vacuum_pages=int(os.getenv("MAINTENANCE_VACUUM_PAGES", 256)),
+        interval_s=float(os.getenv("MAINTENANCE_INTERVAL_S", 3600)),
+    )
+
+if __name__ == "__main__":
+    import json
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Retention / downsampling / vacuum pass over users.db.")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="one-off full VACUUM that switches the file to auto_vacuum=INCREMENTAL")
+    args = parser.parse_args()
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum()
+        print("✅ auto_vacuum = INCREMENTAL")
+    print(json.dumps(from_env().run_once(), indent=2))
@@ -0,0 +1,119 @@
+# backend/memory_debug.py
+"""
+Memory accounting helpers for the admin debug endpoints (app.py /debug/...).
+
+- current_rss_bytes(): live resident set size of this process
+- SnapshotStore: on-demand tracemalloc snapshots, top allocation sites, and diffs between
+  two snapshots (to spot growth across many requests, e.g. DataFrame churn in
+  _prepare_dataframe_for_model)
+
+Standard library only; main.py uses current_rss_bytes() to account for each model at
+load_all_models() time.
+"""
+import os
+import sys
+import time
+import itertools
+import threading
+import tracemalloc
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        # non-Linux fallback: peak RSS (kilobytes on Linux, bytes on macOS)
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+def _site(stat) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    return {"site": f"{frame.filename}:{frame.lineno}", "size_bytes": stat.size, "count": stat.count}
+
+class SnapshotStore:
+    """Keeps the last `max_snapshots` tracemalloc snapshots, addressable by id."""
+    def __init__(self, max_snapshots: int = 5):
+        self.max_snapshots = max_snapshots
+        self._snapshots: "OrderedDict[int, tuple]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self, frames: int = 10) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        with self._lock:
+            ids = list(self._snapshots)
+        return {"tracing": tracing, "traced_bytes": current, "traced_peak_bytes": peak, "snapshots": ids}
+
+    def take(self, limit: int = 20, group_by: str = "lineno") -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running; start it first")
+        snap = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+        with self._lock:
+            snap_id = next(self._ids)
+            self._snapshots[snap_id] = (time.time(), snap)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        stats = snap.statistics(group_by)
+        return {
+            "id": snap_id,
+            "total_bytes": sum(s.size for s in stats),
+            "top": [_site(s) for s in stats[:limit]],
+        }
+
+    def diff(self, from_id: int, to_id: int, limit: int = 20, group_by: str = "lineno") -> Dict[str, Any]:
+        with self._lock:
+            old, new = self._snapshots.get(from_id), self._snapshots.get(to_id)
+        if old is None or new is None:
+            raise KeyError(f"unknown snapshot id(s): {from_id}, {to_id}")
+        stats = new[1].compare_to(old[1], group_by)
+        return {
+            "from": from_id,
+            "to": to_id,
+            "elapsed_s": round(new[0] - old[0], 3),
+            "size_diff_bytes": sum(s.size_diff for s in stats),
+            "top": [dict(_site(s), size_diff_bytes=s.size_diff, count_diff=s.count_diff) for s in stats[:limit]],
+        }
+
+def peak_allocation_bytes(fn) -> Optional[int]:
+    """Peak bytes traced while fn() runs; None if tracemalloc is already in use."""
+    if tracemalloc.is_tracing():
+        return None
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def model_memory_report() -> Optional[Dict[str, Any]]:
+    """Per-model figures recorded by main.load_all_models(), if models live in this process."""
+    main = sys.modules.get("main")
+    if main is None:
+        return None
+    return {"tensorflow_import_bytes": main.TF_IMPORT_RSS_BYTES, "models": main.MODEL_MEMORY,
+            "keras_release": main.KERAS_RELEASE or None, "fused": main.FUSED_MEMORY or None}
@@ -0,0 +1,153 @@
+# backend/outcomes.py
+"""
+Follow-up outcomes for stored predictions, and the feature snapshots that make them
+usable as training rows.
+
+  prediction_requests   the submitted patient fields (JSON of the scalar values), saved
+                        once per /predict_all request and referenced by each of its
+                        rows through predictions.request_id, so model_training/retrain.py
+                        can rebuild exactly what the model scored through
+                        main.decode_input() / _prepare_dataframe_for_model()
+  outcomes              one label per prediction row (0 = the disease did not occur,
+                        1 = it did), linked by prediction_id and stored in the same
+                        file as the row (the same shard, with PREDICTION_SHARDS)
+
+Labels come in through POST /outcomes (admin only):
+    {"outcomes": [{"prediction_id": 123, "shard": 0, "label": 1, "observed_at": "2026-03-01"}]}
+Relabelling a prediction replaces its label and gives it a new outcome id, so the
+next retrain picks it up again; retrain.py reads outcomes with id above the
+watermark stored in the serving model's {disease}_training.json.
+
+FEATURE_SNAPSHOTS=0 stops saving snapshots (predictions without one cannot be used
+for retraining). Rows written before prediction_requests existed keep their copy in
+predictions.features, which is still read.
+"""
+import os
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+SNAPSHOTS = os.getenv("FEATURE_SNAPSHOTS", "1") == "1"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prediction_requests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    features TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outcomes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    prediction_id INTEGER NOT NULL UNIQUE,
+    label INTEGER NOT NULL CHECK (label IN (0, 1)),
+    observed_at TEXT,
+    recorded_by TEXT,
+    recorded_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+def install(conn):
+    """Add the snapshot columns to predictions (older files), the snapshot table and
+    the outcomes table."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(predictions)")}
+    if "features" not in columns:
+        conn.execute("ALTER TABLE predictions ADD COLUMN features TEXT")
+    if "request_id" not in columns:
+        conn.execute("ALTER TABLE predictions ADD COLUMN request_id INTEGER")
+    # orphaned snapshot lookups (maintenance.py)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_request ON predictions (request_id)")
+    conn.executescript(SCHEMA)
+    conn.commit()
+
+# ---------------------------------------------------------------------
+# Snapshots
+# ---------------------------------------------------------------------
+def snapshot(payload: Dict[str, Any]) -> Optional[str]:
+    """JSON of the scalar fields of a /predict_all payload, or None with
+    FEATURE_SNAPSHOTS=0. Fields the models do not take are dropped again on replay."""
+    if not SNAPSHOTS or not isinstance(payload, dict):
+        return None
+    row = {k: v for k, v in payload.items() if v is None or isinstance(v, (str, int, float, bool))}
+    return json.dumps(row, sort_keys=True, separators=(",", ":"))
+
+# ---------------------------------------------------------------------
+# Labels
+# ---------------------------------------------------------------------
+def parse_labels(body: Any) -> List[Tuple[int, int, int, Optional[str]]]:
+    """[(shard, prediction_id, label, observed_at)] from a POST /outcomes body: one
+    object, or {"outcomes": [...]}. Raises ValueError on a malformed entry."""
+    if isinstance(body, dict) and "outcomes" in body:
+        body = body["outcomes"]
+    items = body if isinstance(body, list) else [body]
+    if not items:
+        raise ValueError("no outcomes given")
+    parsed = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f"outcome {i}: expected an object")
+        try:
+            prediction_id = int(item["prediction_id"])
+            shard = int(item.get("shard", 0))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"outcome {i}: prediction_id (and shard) must be integers")
+        label = item.get("label")
+        if label in (True, False):
+            label = int(label)
+        if label not in (0, 1):
+            raise ValueError(f"outcome {i}: label must be 0 or 1")
+        observed_at = item.get("observed_at")
+        parsed.append((shard, prediction_id, label, None if observed_at is None else str(observed_at)))
+    return parsed
+
+def record(labels: List[Tuple[int, int, int, Optional[str]]], shards: int, connect,
+           recorded_by: str = None) -> Dict[str, Any]:
+    """Store labels; `connect(shard)` opens a shard's connection. Predictions that do
+    not exist (or were removed by maintenance.py) are returned under "unknown"."""
+    by_shard: Dict[int, list] = {}
+    unknown = []
+    for shard, prediction_id, label, observed_at in labels:
+        if not 0 <= shard < shards:
+            unknown.append({"shard": shard, "prediction_id": prediction_id})
+            continue
+        by_shard.setdefault(shard, []).append((prediction_id, label, observed_at))
+    recorded = 0
+    for shard, rows in by_shard.items():
+        conn = connect(shard)
+        try:
+            for prediction_id, label, observed_at in rows:
+                if conn.execute("SELECT 1 FROM predictions WHERE id = ?", (prediction_id,)).fetchone() is None:
+                    unknown.append({"shard": shard, "prediction_id": prediction_id})
+                    continue
+                conn.execute('''
+                    INSERT OR REPLACE INTO outcomes (prediction_id, label, observed_at, recorded_by)
+                    VALUES (?, ?, ?, ?)
+                ''', (prediction_id, label, observed_at, recorded_by))
+                recorded += 1
+            conn.commit()
+        finally:
+            conn.close()
+    return {"recorded": recorded, "unknown": unknown}
+
+def labelled_rows(conn, disease: str, after_id: int = 0) -> List[Tuple[int, Dict[str, Any], int]]:
+    """(outcome id, features, label) for `disease` with outcome id > after_id, in id order;
+    predictions saved without a snapshot are skipped."""
+    rows = conn.execute('''
+        SELECT o.id, COALESCE(r.features, p.features), o.label
+        FROM outcomes o JOIN predictions p ON p.id = o.prediction_id
+        LEFT JOIN prediction_requests r ON r.id = p.request_id
+        WHERE p.disease_name = ? AND o.id > ? AND COALESCE(r.features, p.features) IS NOT NULL
+        ORDER BY o.id
+    ''', (disease, after_id)).fetchall()
+    return [(row[0], json.loads(row[1]), int(row[2])) for row in rows]
+
+def stats(conns) -> Dict[str, Any]:
+    """Per disease: labelled predictions, positives, and how many have a snapshot."""
+    out: Dict[str, Dict[str, int]] = {}
+    for conn in conns:
+        for disease, labelled, positive, usable in conn.execute('''
+            SELECT p.disease_name, COUNT(*), SUM(o.label), SUM(COALESCE(r.features, p.features) IS NOT NULL)
+            FROM outcomes o JOIN predictions p ON p.id = o.prediction_id
+            LEFT JOIN prediction_requests r ON r.id = p.request_id GROUP BY p.disease_name
+        '''):
+            entry = out.setdefault(disease, {"labelled": 0, "positive": 0, "with_snapshot": 0})
+            entry["labelled"] += labelled
+            entry["positive"] += positive or 0
+            entry["with_snapshot"] += usable or 0
+    return out
@@ -0,0 +1,274 @@
+# backend/parity.py
+"""
+Golden-output parity harness for the prediction paths.
+
+A fixed sample of patients (rows of the training CSVs in model_training/models/ mapped
+onto the frontend fields, plus synthetic patients; see sample_payloads.py) is scored
+once with the reference path -- per-model Keras predict + sklearn preprocessors -- and
+the probabilities are stored in golden/predictions.npz together with digests of the
+sample and of the model files, and the input decoding they were scored with
+("merge": the plain template merge, the default; "schema": main.decode_input /
+input_schema.py with INPUT_SCHEMA=1). The two score some inputs
+differently (Y/N and Male/Female strings on flag columns, invalid values, aliased
+keys), so a golden file only checks engines running the same decoding.
+
+Every registered engine (batching modes, fused / quantized ensembles, the inference
+pool, ...) is then run over the same sample and compared with the golden scores in
+the units the API returns: per-disease score differences (percentage points) against
+a per-disease tolerance, and the number of patients whose High/Moderate/Low label
+changed.
+
+Usage (from backend/):
+    python parity.py                       # check all available engines (exit 1 on failure)
+    python parity.py --engines batch,fused
+    python parity.py --update-golden       # after an intentional model change
+
+New paths register themselves with @register_engine in this file.
+"""
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from contextlib import contextmanager, redirect_stdout
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from sample_payloads import load_csv_payloads, synthetic_payloads
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_PATH = os.path.join(BACKEND_DIR, "golden", "predictions.npz")
+MODELS_DIR = os.path.join(BACKEND_DIR, "models")
+
+DISEASES = ["stroke", "heart_failure", "hypertension", "heart_attack", "cad"]
+SAMPLE_SIZE = 2000          # 3/4 CSV rows, 1/4 synthetic
+SAMPLE_SEED = 1234
+# Scores are returned rounded to 0.01 percentage points, so one rounding step of
+# slack absorbs float noise between batch sizes / BLAS kernels.
+DEFAULT_TOLERANCE = 0.01
+
+def golden_sample(n: int = SAMPLE_SIZE, seed: int = SAMPLE_SEED) -> List[Dict[str, Any]]:
+    n_csv = (3 * n) // 4
+    return load_csv_payloads(limit=n_csv, seed=seed) + synthetic_payloads(n - n_csv, seed)
+
+def _digest_payloads(payloads) -> str:
+    return hashlib.sha256(json.dumps(payloads, sort_keys=True, default=str).encode()).hexdigest()
+
+def _digest_models(models_dir: str = MODELS_DIR) -> str:
+    h = hashlib.sha256()
+    for name in DISEASES:
+        model_dir = os.path.join(models_dir, name)
+        for fname in sorted(os.listdir(model_dir)):
+            if fname.endswith((".keras", ".joblib", "_columns.json")):
+                h.update(fname.encode())
+                with open(os.path.join(model_dir, fname), "rb") as f:
+                    h.update(f.read())
+    return h.hexdigest()
+
+def _risk_codes(pct: np.ndarray) -> np.ndarray:
+    return np.where(pct > 70, 2, np.where(pct > 50, 1, 0))
+
+# ---------------------------------------------------------------------
+# Engines: payloads -> list of {"predictions": {disease: {"score", "risk"}}}
+# ---------------------------------------------------------------------
+ENGINES: Dict[str, Dict[str, Any]] = {}
+
+def register_engine(name: str, tolerance: Optional[Dict[str, float]] = None, max_flip_rate: float = 0.0,
+                    sample: Optional[int] = None, available: Callable[[], bool] = lambda: True):
+    """tolerance: disease -> allowed score difference in percentage points (default
+    DEFAULT_TOLERANCE); sample: only score the first N patients (slow engines)."""
+    def wrap(fn):
+        ENGINES[name] = {"fn": fn, "tolerance": tolerance or {}, "max_flip_rate": max_flip_rate,
+                         "sample": sample, "available": available}
+        return fn
+    return wrap
+
+def _main():
+    import main
+    if main.MODELS is None:
+        raise RuntimeError("models failed to load")
+    return main
+
+@contextmanager
+def _fused_engine(ensemble):
+    main = _main()
+    previous, main.FUSED = main.FUSED, ensemble
+    try:
+        yield main
+    finally:
+        main.FUSED = previous
+
+def _reference(payloads):
+    main = _main()
+    with _fused_engine(None):
+        return main.predict_all_diseases_batch(payloads)
+
+@register_engine("batch")
+def _engine_batch(payloads):
+    return _reference(payloads)
+
+@register_engine("batch_chunks_7", sample=280)
+def _engine_chunks(payloads):
+    return [r for i in range(0, len(payloads), 7) for r in _reference(payloads[i:i + 7])]
+
+@register_engine("single_row", sample=20)
+def _engine_single_row(payloads):
+    main = _main()
+    with _fused_engine(None):
+        return [main.predict_all_diseases(p) for p in payloads]
+
+@register_engine("fused")
+def _engine_fused(payloads):
+    from fused import FusedEnsemble
+    main = _main()
+    mlps = {n: a["model"] for n, a in main.MODELS.items() if a["family"] == "mlp"}
+    with _fused_engine(FusedEnsemble.from_models(mlps)):
+        return main.predict_all_diseases_batch(payloads)
+
+@register_engine("incremental_sessions", sample=150)
+def _engine_incremental(payloads):
+    # consecutive patients share one session, so unchanged models reuse stored scores;
+    # on the fused engine to keep single-row scoring fast
+    from fused import FusedEnsemble
+    from sessions import SessionStore
+    main = _main()
+    mlps = {n: a["model"] for n, a in main.MODELS.items() if a["family"] == "mlp"}
+    previous, main.SESSIONS = main.SESSIONS, SessionStore()
+    try:
+        with _fused_engine(FusedEnsemble.from_models(mlps)):
+            return [main.predict_all_diseases_incremental(p, "parity") for p in payloads]
+    finally:
+        main.SESSIONS = previous
+
+def _quantized_engine(mode: str):
+    from quantized import MAX_SCORE_DIFF, MAX_LABEL_FLIP_RATE, QuantizedEnsemble, artifact_paths
+    path = artifact_paths(mode)[0]
+
+    @register_engine(f"quantized_{mode}", tolerance={d: MAX_SCORE_DIFF for d in DISEASES},
+                     max_flip_rate=MAX_LABEL_FLIP_RATE, available=lambda: os.path.exists(path))
+    def engine(payloads):
+        with _fused_engine(QuantizedEnsemble.load(path)) as main:
+            return main.predict_all_diseases_batch(payloads)
+
+for _mode in ("float16", "int8"):
+    _quantized_engine(_mode)
+
+@register_engine("inference_pool", sample=200, available=lambda: bool(os.getenv("INFERENCE_POOL_ADDRESS")))
+def _engine_pool(payloads):
+    from inference_pool import InferencePoolClient
+    client = InferencePoolClient(os.environ["INFERENCE_POOL_ADDRESS"])
+    return [client.predict_all_diseases(p) for p in payloads]
+
+# ---------------------------------------------------------------------
+# Golden file
+# ---------------------------------------------------------------------
+def write_golden(path: str = GOLDEN_PATH, n: int = SAMPLE_SIZE, seed: int = SAMPLE_SEED) -> dict:
+    main = _main()
+    payloads = golden_sample(n, seed)
+    rows = [main.decode_input(p, defaulted=False)[0] for p in payloads]
+    with _fused_engine(None):
+        scores = np.stack([main.predict_disease_batch(rows, main.MODELS[d], d) for d in DISEASES], axis=1)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez_compressed(path, scores=scores, diseases=np.array(DISEASES), n=n, seed=seed,
+                        payload_digest=_digest_payloads(payloads), model_digest=_digest_models(),
+                        input_decoding=_input_decoding(main))
+    return load_golden(path)
+
+def _input_decoding(main) -> str:
+    return "merge" if main.SCHEMA is None else "schema"
+
+def load_golden(path: str = GOLDEN_PATH) -> dict:
+    data = np.load(path)
+    golden = {k: data[k] for k in data.files}
+    golden["n"], golden["seed"] = int(golden["n"]), int(golden["seed"])
+    golden["payloads"] = golden_sample(golden["n"], golden["seed"])
+    if _digest_payloads(golden["payloads"]) != str(golden["payload_digest"]):
+        raise RuntimeError("golden sample no longer reproduces (datasets or sample_payloads.py changed); "
+                           "rerun with --update-golden")
+    if _digest_models() != str(golden["model_digest"]):
+        raise RuntimeError("model files changed since the golden scores were written; "
+                           "rerun with --update-golden if the change is intentional")
+    written = str(golden.get("input_decoding", "merge"))   # files from before typed decoding
+    if written != _input_decoding(_main()):
+        raise RuntimeError(f"golden scores use {written!r} input decoding, the server {_input_decoding(_main())!r} "
+                           f"(INPUT_SCHEMA); rerun with --update-golden for the new decoding")
+    return golden
+
+# ---------------------------------------------------------------------
+# Comparison
+# ---------------------------------------------------------------------
+def compare(golden: dict, results: List[Dict[str, Any]], tolerance: Dict[str, float]) -> Dict[str, dict]:
+    """Per-disease parity of API-shaped results against the first len(results) golden rows."""
+    n = len(results)
+    report = {}
+    for j, disease in enumerate(str(d) for d in golden["diseases"]):
+        ref = np.round(golden["scores"][:n, j] * 100, 2)
+        got = np.array([r.get("predictions", {}).get(disease, {}).get("score", np.nan) for r in results],
+                       dtype=np.float64)
+        errors = int(np.isnan(got).sum())
+        diff = np.abs(np.where(np.isnan(got), np.inf, got - ref))
+        tol = tolerance.get(disease, DEFAULT_TOLERANCE)
+        report[disease] = {
+            "n": n,
+            "tolerance": tol,
+            "max_abs_diff": round(float(diff[np.isfinite(diff)].max()), 4) if np.isfinite(diff).any() else None,
+            "over_tolerance": int(np.sum(diff > tol + 1e-9)),
+            "label_flips": int(np.sum(_risk_codes(ref) != _risk_codes(np.nan_to_num(got, nan=-1.0)))),
+            "errors": errors,
+        }
+    return report
+
+def run_engine(name: str, golden: dict, verbose: bool = False) -> dict:
+    spec = ENGINES[name]
+    payloads = golden["payloads"][: spec["sample"]] if spec["sample"] else golden["payloads"]
+    t0 = time.perf_counter()
+    with redirect_stdout(sys.stdout if verbose else io.StringIO()):  # per-call logging in main.py
+        results = spec["fn"](payloads)
+    seconds = time.perf_counter() - t0
+    diseases = compare(golden, results, spec["tolerance"])
+    max_flips = int(spec["max_flip_rate"] * len(payloads))
+    passed = all(r["errors"] == 0 and r["over_tolerance"] == 0 and r["label_flips"] <= max_flips
+                 for r in diseases.values())
+    return {"engine": name, "passed": passed, "seconds": round(seconds, 3), "diseases": diseases}
+
+def _print_report(res: dict):
+    mark = "✅" if res["passed"] else "❌"
+    print(f"{mark} {res['engine']} ({res['seconds']}s)")
+    for disease, r in res["diseases"].items():
+        print(f"   {disease:<14} n={r['n']:<5} max diff={r['max_abs_diff']} (tol {r['tolerance']})  "
+              f"over tol={r['over_tolerance']}  label flips={r['label_flips']}  errors={r['errors']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", help="comma-separated subset (default: all available)")
+    parser.add_argument("--update-golden", action="store_true")
+    parser.add_argument("--n", type=int, default=SAMPLE_SIZE, help="sample size when writing the golden file")
+    parser.add_argument("--output", help="optional JSON report")
+    parser.add_argument("--verbose", action="store_true", help="keep main.py's per-call logging")
+    args = parser.parse_args()
+
+    if args.update_golden or not os.path.exists(GOLDEN_PATH):
+        with redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+            write_golden(n=args.n)
+        print(f"📝 Golden scores written → {GOLDEN_PATH}")
+    golden = load_golden()
+
+    names = [e.strip() for e in args.engines.split(",")] if args.engines else list(ENGINES)
+    results = []
+    for name in names:
+        if name not in ENGINES:
+            sys.exit(f"unknown engine {name!r}; known: {', '.join(ENGINES)}")
+        if not ENGINES[name]["available"]():
+            print(f"⏭️  {name} not available, skipped")
+            continue
+        res = run_engine(name, golden, args.verbose)
+        results.append(res)
+        _print_report(res)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if all(r["passed"] for r in results) else 1)
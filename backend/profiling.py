@@ -0,0 +1,151 @@
+# backend/profiling.py
+"""
+On-demand request profiling.
+
+A request is profiled when an admin sends `X-Profile: 1` (with a valid X-Admin-Token) or
+when it is picked by PROFILE_SAMPLE_RATE. The whole view is captured, i.e. for
+/predict_all: _prepare_dataframe_for_model, _ensure_expected_columns,
+preprocessor.transform, model.predict and the DB writes. Each profile is written as
+    <dir>/<timestamp>-<endpoint>-<id>.pstats     deterministic cProfile dump
+    <dir>/<timestamp>-<endpoint>-<id>.collapsed  sampled stacks ("a;b;c count"),
+                                                 ready for flamegraph.pl / speedscope
+and only the newest PROFILE_MAX_FILES profiles are kept.
+
+With PROFILING_ENABLED unset and PROFILE_SAMPLE_RATE=0, install() leaves the views
+untouched, so the disabled hook costs nothing. A profiled request scores its models on
+the request thread (resilience.run_inline), without the per-model time budgets, so both
+profilers see them.
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import cProfile
+import threading
+from collections import Counter
+from functools import wraps
+from typing import Iterable
+
+from flask import request
+from admin import is_admin
+import resilience
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 50))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 1.0))
+
+# ---------------------------------------------------------------------
+# Stack sampler (for the collapsed-stack / flamegraph output)
+# ---------------------------------------------------------------------
+class _StackSampler(threading.Thread):
+    def __init__(self, target_ident: int, interval_s: float):
+        super().__init__(daemon=True)
+        self.target_ident = target_ident
+        self.interval_s = interval_s
+        self.stacks = Counter()
+        self._stop_evt = threading.Event()
+
+    def run(self):
+        while not self._stop_evt.wait(self.interval_s):
+            frame = sys._current_frames().get(self.target_ident)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_evt.set()
+        self.join()
+
+# ---------------------------------------------------------------------
+# Profiler
+# ---------------------------------------------------------------------
+class RequestProfiler:
+    def __init__(self, out_dir: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES,
+                 sample_rate: float = PROFILE_SAMPLE_RATE, interval_ms: float = PROFILE_INTERVAL_MS,
+                 header_trigger: bool = PROFILING_ENABLED):
+        self.out_dir = out_dir
+        self.max_files = max_files
+        self.sample_rate = sample_rate
+        self.interval_s = interval_ms / 1000.0
+        self.header_trigger = header_trigger
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.header_trigger or self.sample_rate > 0
+
+    def should_profile(self) -> bool:
+        if self.header_trigger and request.headers.get("X-Profile") == "1" and is_admin():
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def run(self, name: str, fn, *args, **kwargs):
+        """Run fn under cProfile + stack sampling; returns (result, profile_id)."""
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{uuid.uuid4().hex[:8]}"
+        sampler = _StackSampler(threading.get_ident(), self.interval_s)
+        prof = cProfile.Profile()
+        sampler.start()
+        prof.enable()
+        try:
+            with resilience.run_inline():
+                result = fn(*args, **kwargs)
+        finally:
+            prof.disable()
+            sampler.stop()
+            self._write(profile_id, prof, sampler.stacks)
+        return result, profile_id
+
+    def _write(self, profile_id: str, prof: cProfile.Profile, stacks: Counter):
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            base = os.path.join(self.out_dir, profile_id)
+            prof.dump_stats(base + ".pstats")
+            with open(base + ".collapsed", "w") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            self._rotate()
+            print(f"🔬 Profile written: {base}.pstats / .collapsed")
+        except Exception as e:
+            print(f"❌ Could not write profile {profile_id}: {e}")
+
+    def _rotate(self):
+        with self._lock:
+            stems = sorted({os.path.splitext(f)[0] for f in os.listdir(self.out_dir)
+                            if f.endswith((".pstats", ".collapsed"))})
+            for stem in stems[:-self.max_files] if len(stems) > self.max_files else []:
+                for ext in (".pstats", ".collapsed"):
+                    path = os.path.join(self.out_dir, stem + ext)
+                    if os.path.exists(path):
+                        os.remove(path)
+
+# ---------------------------------------------------------------------
+# Flask integration
+# ---------------------------------------------------------------------
+def install(app, endpoints: Iterable[str] = ("predict_all",), profiler: RequestProfiler = None):
+    """Wrap the given view functions with the profiling hook. No-op when disabled."""
+    profiler = profiler or RequestProfiler()
+    if not profiler.enabled:
+        return None
+
+    for endpoint in endpoints:
+        view = app.view_functions[endpoint]
+
+        @wraps(view)
+        def profiled(*args, _view=view, _name=endpoint, **kwargs):
+            if not profiler.should_profile():
+                return _view(*args, **kwargs)
+            rv, profile_id = profiler.run(_name, _view, *args, **kwargs)
+            resp = app.make_response(rv)
+            resp.headers["X-Profile-Id"] = profile_id
+            return resp
+
+        app.view_functions[endpoint] = profiled
+    print(f"🔬 Request profiling enabled for {list(endpoints)} → {profiler.out_dir}")
+    return profiler
@@ -0,0 +1,282 @@
+# backend/quantized.py
+"""
+Reduced-precision variant of the fused ensemble (fused.py).
+
+The stacked Dense weights are stored as float16, or as int8 with one symmetric scale
+per output unit, and widened to float32 layer by layer at predict time. Biases stay
+float32. For int8 a calibration pass over the training CSVs corrects each layer's bias
+for the mean error the rounding introduces (bias correction).
+
+Build + validate offline (from backend/):
+    python quantized.py --mode int8 [--limit 2000]
+
+This writes models/quantized_{mode}.npz and a report (models/quantized_{mode}.json)
+comparing risk scores and High/Moderate/Low labels with the float32 Keras models.
+Serve with QUANTIZED_MODE=int8 (or float16). main.py refuses to activate it, and keeps
+the float32 path, when the artifact is missing, was built from different .keras
+weights, or its report exceeds QUANTIZED_MAX_SCORE_DIFF (percentage points) or
+QUANTIZED_MAX_LABEL_FLIP_RATE.
+"""
+import os
+import json
+import hashlib
+from typing import Dict
+
+import numpy as np
+
+from fused import _ACTIVATIONS, FusedEnsemble, extract_dense_stack
+
+QUANT_MODES = ("float16", "int8")
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+
+MAX_SCORE_DIFF = float(os.getenv("QUANTIZED_MAX_SCORE_DIFF", 1.0))
+MAX_LABEL_FLIP_RATE = float(os.getenv("QUANTIZED_MAX_LABEL_FLIP_RATE", 0.001))
+
+class QuantizationRejected(RuntimeError):
+    pass
+
+def artifact_paths(mode: str, models_dir: str = MODELS_DIR):
+    base = os.path.join(models_dir, f"quantized_{mode}")
+    return base + ".npz", base + ".json"
+
+def stack_fingerprint(stacks: Dict[str, list]) -> str:
+    """Hash of the float weights, so an artifact can't outlive the .keras files it came from."""
+    h = hashlib.sha256()
+    for name in sorted(stacks):
+        h.update(name.encode())
+        for W, b, act in stacks[name]:
+            h.update(np.ascontiguousarray(W, dtype=np.float32).tobytes())
+            h.update(np.ascontiguousarray(b, dtype=np.float32).tobytes())
+            h.update(act.encode())
+    return h.hexdigest()
+
+def quantize_weights(W: np.ndarray, mode: str):
+    """(n_models, in, out) float weights -> (stored weights, per-output scale or None)."""
+    if mode == "float16":
+        return W.astype(np.float16), None
+    if mode == "int8":
+        scale = np.abs(W).max(axis=1, keepdims=True) / 127.0
+        scale[scale == 0] = 1.0
+        q = np.clip(np.rint(W / scale), -127, 127).astype(np.int8)
+        return q, scale.astype(np.float32)
+    raise ValueError(f"unknown quantization mode: {mode}")
+
+class QuantizedEnsemble(FusedEnsemble):
+    def __init__(self, stacks: Dict[str, list], mode: str):
+        super().__init__(stacks, dtype=np.float32)
+        self.mode = mode
+        self.fingerprint = stack_fingerprint(stacks)
+        self.quantized = []
+        for W, b, act in self.layers:
+            q, scale = quantize_weights(W, mode)
+            self.quantized.append([q, scale, b.copy(), act])
+        self.layers = None  # keep only the reduced-precision copy
+
+    @classmethod
+    def from_models(cls, models: Dict[str, object], mode: str):
+        return cls({name: extract_dense_stack(m) for name, m in models.items()}, mode)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(q.nbytes + b.nbytes + (scale.nbytes if scale is not None else 0)
+                   for q, scale, b, _ in self.quantized)
+
+    def _stacked_weights(self):
+        """Dequantized float32 weights, one layer at a time (calibration only)."""
+        for q, scale, b, act in self.quantized:
+            W = q.astype(np.float32)
+            yield (W * scale if scale is not None else W), b, act
+
+    def predict(self, Xs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """FusedEnsemble.predict() on the stored weights: the matmul takes q as is and
+        the int8 scale is applied per output column afterwards, so no dequantized copy
+        of the stack is built. NumPy widens q for the matmul; going model by model
+        keeps that temporary to one model's layer."""
+        H = self._pad_inputs(Xs)
+        for q, scale, b, act in self.quantized:
+            Z = np.empty(H.shape[:2] + q.shape[2:], dtype=np.float32)
+            for m in range(len(q)):
+                np.matmul(H[m], q[m], out=Z[m])
+            if scale is not None:
+                Z *= scale
+            Z += b
+            H = _ACTIVATIONS[act](Z)
+        return {name: H[m, :, 0].astype(np.float64) for m, name in enumerate(self.names) if name in Xs}
+
+    def calibrate(self, reference: FusedEnsemble, Xs: Dict[str, np.ndarray]) -> Dict[str, bool]:
+        """Bias correction: shift each layer's bias by the mean pre-activation error vs.
+        the float32 ensemble on calibration inputs, propagating the corrected outputs.
+        Kept only for models whose output error on the calibration set goes down;
+        returns disease -> whether the correction was kept."""
+        target = reference.predict(Xs)
+        before = self.predict(Xs)
+        original = [layer[2].copy() for layer in self.quantized]
+
+        H_ref = reference._pad_inputs(Xs)
+        H_q = H_ref.copy()
+        dequantized = list(self._stacked_weights())
+        for (W_ref, b_ref, act), layer, (W_q, _, _) in zip(reference.layers, self.quantized, dequantized):
+            Z_ref = np.matmul(H_ref, W_ref) + b_ref
+            Z_q = np.matmul(H_q, W_q) + layer[2]
+            correction = (Z_ref - Z_q).mean(axis=1, keepdims=True).astype(np.float32)
+            layer[2] = layer[2] + correction
+            H_ref = _ACTIVATIONS[act](Z_ref)
+            H_q = _ACTIVATIONS[act](Z_q + correction)
+
+        after = self.predict(Xs)
+        kept = {}
+        for m, name in enumerate(self.names):
+            err = lambda p: float(np.mean(np.abs(p[name] - target[name])))
+            kept[name] = err(after) < err(before)
+            if not kept[name]:
+                for layer, b in zip(self.quantized, original):
+                    layer[2][m] = b[m]
+        return kept
+
+    # -----------------------------------------------------------------
+    # Artifact
+    # -----------------------------------------------------------------
+    def save(self, path: str):
+        arrays = {"mode": self.mode, "fingerprint": self.fingerprint, "names": np.array(self.names),
+                  "input_dims": np.array(self.input_dims), "output_dim": self.output_dim,
+                  "activations": np.array([act for *_, act in self.quantized])}
+        for l, (q, scale, b, _) in enumerate(self.quantized):
+            arrays[f"q{l}"] = q
+            arrays[f"b{l}"] = b
+            if scale is not None:
+                arrays[f"scale{l}"] = scale
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "QuantizedEnsemble":
+        data = np.load(path)
+        self = cls.__new__(cls)
+        self.mode = str(data["mode"])
+        self.fingerprint = str(data["fingerprint"])
+        self.names = [str(n) for n in data["names"]]
+        self.input_dims = [int(d) for d in data["input_dims"]]
+        self.output_dim = int(data["output_dim"])
+        self.dtype = np.float32
+        self.layers = None
+        self.quantized = [[data[f"q{l}"], data[f"scale{l}"] if f"scale{l}" in data else None, data[f"b{l}"], str(act)]
+                          for l, act in enumerate(data["activations"])]
+        return self
+
+# ---------------------------------------------------------------------
+# Validation against the float32 models
+# ---------------------------------------------------------------------
+def _labels(pct: np.ndarray) -> np.ndarray:
+    # same cut-offs as main._risk_level: >70 High, >50 Moderate
+    return np.where(pct > 70, 2, np.where(pct > 50, 1, 0))
+
+def compare_scores(reference: Dict[str, np.ndarray], candidate: Dict[str, np.ndarray]) -> dict:
+    """Per-disease divergence of candidate probabilities from the reference, in the units
+    the API returns (rounded percentage scores and risk labels)."""
+    report = {}
+    for name, ref in reference.items():
+        ref_pct = np.round(np.asarray(ref, dtype=np.float64) * 100, 2)
+        cand_pct = np.round(np.asarray(candidate[name], dtype=np.float64) * 100, 2)
+        diff = np.abs(ref_pct - cand_pct)
+        flips = int(np.sum(_labels(ref_pct) != _labels(cand_pct)))
+        report[name] = {
+            "n": int(ref_pct.size),
+            "max_abs_diff_pct": round(float(diff.max()), 4) if diff.size else 0.0,
+            "mean_abs_diff_pct": round(float(diff.mean()), 6) if diff.size else 0.0,
+            "label_flips": flips,
+            "label_flip_rate": round(flips / max(1, ref_pct.size), 6),
+        }
+    return report
+
+def check_report(report: dict, max_score_diff: float = None, max_flip_rate: float = None):
+    """Raise QuantizationRejected if any disease exceeds the configured thresholds."""
+    max_score_diff = MAX_SCORE_DIFF if max_score_diff is None else max_score_diff
+    max_flip_rate = MAX_LABEL_FLIP_RATE if max_flip_rate is None else max_flip_rate
+    bad = {name: r for name, r in report["diseases"].items()
+           if r["max_abs_diff_pct"] > max_score_diff or r["label_flip_rate"] > max_flip_rate}
+    if bad:
+        raise QuantizationRejected(
+            f"{report['mode']} exceeds thresholds (score diff > {max_score_diff} pts or "
+            f"flip rate > {max_flip_rate}): " + ", ".join(
+                f"{n} diff={r['max_abs_diff_pct']} flips={r['label_flips']}/{r['n']}" for n, r in bad.items()))
+
+def load_quantized(mode: str, models: Dict[str, object], models_dir: str = MODELS_DIR) -> QuantizedEnsemble:
+    """Load the artifact for QUANTIZED_MODE, or raise QuantizationRejected explaining why not."""
+    if mode not in QUANT_MODES:
+        raise QuantizationRejected(f"unknown QUANTIZED_MODE={mode!r} (expected one of {QUANT_MODES})")
+    npz_path, report_path = artifact_paths(mode, models_dir)
+    if not (os.path.exists(npz_path) and os.path.exists(report_path)):
+        raise QuantizationRejected(f"no validated artifact at {npz_path}; run `python quantized.py --mode {mode}`")
+    ensemble = QuantizedEnsemble.load(npz_path)
+    current = stack_fingerprint({name: extract_dense_stack(m) for name, m in models.items()})
+    if ensemble.fingerprint != current or sorted(ensemble.names) != sorted(models):
+        raise QuantizationRejected(f"{npz_path} was built from different model weights; rebuild it")
+    with open(report_path) as f:
+        report = json.load(f)
+    if report.get("fingerprint") != ensemble.fingerprint:
+        raise QuantizationRejected(f"{report_path} does not belong to {npz_path}")
+    check_report(report)
+    return ensemble
+
+# ---------------------------------------------------------------------
+# CLI: build, calibrate, validate
+# ---------------------------------------------------------------------
+def _calibration_inputs(limit: int, seed: int):
+    """Rows from the training CSVs, decoded as the server decodes them (main.decode_input)
+    and preprocessed per disease."""
+    import main
+    from sample_payloads import load_csv_payloads
+
+    mlps = {n: a for n, a in main.MODELS.items() if a["family"] == "mlp"}
+    rows = [main.decode_input(p, defaulted=False)[0] for p in load_csv_payloads(limit=limit, seed=seed)]
+    Xs = {n: np.asarray(a["preprocessor"].transform(main._prepare_dataframe_for_model(rows, a, n)), dtype=np.float32)
+          for n, a in mlps.items()}
+    return {n: a["model"] for n, a in mlps.items()}, Xs
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build, calibrate and validate a quantized ensemble.")
+    parser.add_argument("--mode", choices=QUANT_MODES, default="int8")
+    parser.add_argument("--limit", type=int, default=2000, help="CSV rows per split (calibration / validation)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-bias-correction", action="store_true")
+    args = parser.parse_args()
+
+    models, Xs = _calibration_inputs(2 * args.limit, args.seed)
+    n = next(iter(Xs.values())).shape[0]
+    split = np.random.default_rng(args.seed).permutation(n)
+    calib, valid = split[: n // 2], split[n // 2:]
+    Xs_calib = {k: X[calib] for k, X in Xs.items()}
+    Xs_valid = {k: X[valid] for k, X in Xs.items()}
+
+    reference = FusedEnsemble.from_models(models)
+    ensemble = QuantizedEnsemble.from_models(models, args.mode)
+    bias_corrected = {}
+    if args.mode == "int8" and not args.no_bias_correction:
+        bias_corrected = ensemble.calibrate(reference, Xs_calib)
+
+    keras_scores = {k: models[k].predict(X, verbose=0).reshape(-1) for k, X in Xs_valid.items()}
+    report = {
+        "mode": args.mode,
+        "fingerprint": ensemble.fingerprint,
+        "calibration_rows": int(len(calib)),
+        "validation_rows": int(len(valid)),
+        "bias_corrected": bias_corrected,
+        "float32_bytes": reference.nbytes,
+        "quantized_bytes": ensemble.nbytes,
+        "diseases": compare_scores(keras_scores, ensemble.predict(Xs_valid)),
+    }
+    npz_path, report_path = artifact_paths(args.mode)
+    ensemble.save(npz_path)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'disease':<14}{'max diff':>10}{'mean diff':>11}{'flips':>8}")
+    for name, r in report["diseases"].items():
+        print(f"{name:<14}{r['max_abs_diff_pct']:>10}{r['mean_abs_diff_pct']:>11}{r['label_flips']:>8}")
+    print(f"weights: {report['float32_bytes'] / 1024:.1f} KiB float32 → {report['quantized_bytes'] / 1024:.1f} KiB {args.mode}")
+    try:
+        check_report(report)
+        print(f"✅ {args.mode} within thresholds → {npz_path}")
+    except QuantizationRejected as e:
+        print(f"❌ {e}")
@@ -0,0 +1,272 @@
+# backend/resilience.py
+"""
+Per-model isolation for predict_all_diseases(), opt-in with MODEL_TIMEOUT_MS > 0
+(default 0: models are scored one after the other in the calling thread, as before):
+
+- time budget: each model gets MODEL_TIMEOUT_MS (per-model overrides in
+  MODEL_TIMEOUTS_MS="cad=300,stroke=150") plus MODEL_TIMEOUT_PER_ROW_MS for every row
+  after the first of a batched call (inference pool batches, what-if grids); a model
+  that overruns is reported as {"error": "timeout"} while the others return normally
+- bulkhead: each model runs on its own small thread pool (MODEL_BULKHEAD_SIZE calls at
+  once); when all of a model's slots are taken, a call waits for one until its deadline
+  and only then gets {"error": "busy"}. Being busy is concurrency, not a model fault:
+  it does not count against the breaker
+- circuit breaker: MODEL_BREAKER_FAILURES consecutive failures (errors or timeouts) open
+  the breaker; the model is skipped with {"error": "circuit_open"} for
+  MODEL_BREAKER_COOLDOWN_S, then one trial call decides between closing it again and
+  another cool-down. Calls started before the breaker last opened that finish later
+  neither close nor reopen it
+
+All five models are submitted at once and awaited against their own deadlines, so a
+request takes as long as its slowest healthy model, not the sum. A Python thread
+cannot be cancelled: a timed-out call keeps its bulkhead slot until it returns.
+
+Inside run_inline() (used by profiling.py) the calling thread runs the models itself,
+one after the other and without budgets, so profilers watching it see the model code.
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Iterable, Optional
+
+Clock = Callable[[], float]
+
+_local = threading.local()
+
+@contextmanager
+def run_inline():
+    """ModelGuards.run() calls made by this thread inside the block run on it, unguarded."""
+    previous = getattr(_local, "inline", False)
+    _local.inline = True
+    try:
+        yield
+    finally:
+        _local.inline = previous
+
+class ModelTimeout(Exception):
+    def __str__(self):
+        return "timeout"
+
+class CircuitOpen(Exception):
+    def __str__(self):
+        return "circuit_open"
+
+class BulkheadFull(Exception):
+    def __str__(self):
+        return "busy"
+
+# ---------------------------------------------------------------------
+# Circuit breaker (closed -> open -> half-open -> closed / open)
+# ---------------------------------------------------------------------
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, cooldown_s: float = 30.0, clock: Clock = time.monotonic):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be >= 1")
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._opened = 0
+        self._generation = 0   # +1 each time the breaker opens
+
+    def allow(self) -> bool:
+        """True if a call may go ahead; in half-open state only one trial at a time."""
+        with self._lock:
+            if self._state == "open":
+                if self._clock() - self._opened_at < self.cooldown_s:
+                    return False
+                self._state = "half_open"
+            if self._state == "half_open":
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    @property
+    def generation(self) -> int:
+        """Pass to record_success / record_failure for a call started now."""
+        with self._lock:
+            return self._generation
+
+    def cancel_trial(self):
+        """The half-open trial call never started (e.g. no bulkhead slot)."""
+        with self._lock:
+            if self._state == "half_open":
+                self._trial_in_flight = False
+
+    def record_success(self, generation: int = None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return   # started before the breaker last opened
+            self._state = "closed"
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self, generation: int = None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                if self._state != "open":
+                    self._opened += 1
+                    self._generation += 1
+                self._state = "open"
+                self._opened_at = self._clock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and self._clock() - self._opened_at >= self.cooldown_s:
+                return "half_open"
+            return self._state
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return {"state": state, "consecutive_failures": self._failures, "times_opened": self._opened}
+
+# ---------------------------------------------------------------------
+# One model: bulkhead + budget + breaker
+# ---------------------------------------------------------------------
+class ModelGuard:
+    def __init__(self, name: str, timeout_s: float, bulkhead_size: int = 2, breaker: CircuitBreaker = None,
+                 clock: Clock = time.monotonic):
+        self.name = name
+        self.timeout_s = timeout_s
+        self.breaker = breaker or CircuitBreaker(clock=clock)
+        self._clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=bulkhead_size, thread_name_prefix=f"model-{name}")
+        self._slots = threading.BoundedSemaphore(bulkhead_size)
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._timeouts = 0
+        self._errors = 0
+        self._rejected = 0
+        self._short_circuited = 0
+
+    def _count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def submit(self, fn: Callable[[], Any], deadline: float):
+        """Start fn on this model's bulkhead, waiting for a free slot until `deadline`;
+        returns (future, breaker generation), or the exception to report if the breaker
+        is open or no slot freed up in time."""
+        if not self.breaker.allow():
+            self._count("_short_circuited")
+            return CircuitOpen()
+        generation = self.breaker.generation
+        if not self._slots.acquire(timeout=max(0.0, deadline - self._clock())):
+            self._count("_rejected")
+            self.breaker.cancel_trial()
+            return BulkheadFull()
+        self._count("_calls")
+        future = self._executor.submit(fn)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future, generation
+
+    def result(self, started, deadline: float):
+        """fn's return value, or the exception to report; feeds the breaker."""
+        future, generation = started
+        try:
+            value = future.result(timeout=max(0.0, deadline - self._clock()))
+        except FutureTimeout:
+            self._count("_timeouts")
+            self.breaker.record_failure(generation)
+            return ModelTimeout()
+        except Exception as e:
+            self._count("_errors")
+            self.breaker.record_failure(generation)
+            return e
+        self.breaker.record_success(generation)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {"calls": self._calls, "timeouts": self._timeouts, "errors": self._errors,
+                      "rejected_busy": self._rejected, "short_circuited": self._short_circuited}
+        return {"timeout_ms": round(self.timeout_s * 1000), **counts, **self.breaker.stats()}
+
+class ModelGuards:
+    def __init__(self, names: Iterable[str], timeout_s: float, overrides: Dict[str, float] = None,
+                 bulkhead_size: int = 2, failure_threshold: int = 5, cooldown_s: float = 30.0,
+                 per_row_s: float = 0.0, clock: Clock = time.monotonic):
+        overrides = overrides or {}
+        self.per_row_s = per_row_s
+        self._clock = clock
+        self.guards = {
+            name: ModelGuard(name, overrides.get(name, timeout_s), bulkhead_size,
+                             CircuitBreaker(failure_threshold, cooldown_s, clock), clock)
+            for name in names
+        }
+
+    def __getitem__(self, name: str) -> ModelGuard:
+        return self.guards[name]
+
+    def available(self, name: str) -> bool:
+        """Breaker check for paths that do not go through run() (e.g. the fused ensemble)."""
+        guard = self.guards.get(name)
+        if guard is None or guard.breaker.state != "open":
+            return True
+        guard._count("_short_circuited")
+        return False
+
+    def run(self, calls: Dict[str, Callable[[], Any]], rows: int = 1) -> Dict[str, Any]:
+        """Run every call concurrently, each on its own bulkhead and against its own
+        budget (scaled for `rows` patients); name -> return value or exception."""
+        if getattr(_local, "inline", False):
+            out = {}
+            for name, fn in calls.items():
+                try:
+                    out[name] = fn()
+                except Exception as e:
+                    out[name] = e
+            return out
+        base = self._clock() + self.per_row_s * max(0, rows - 1)
+        deadlines = {name: base + self.guards[name].timeout_s for name in calls}
+        started = {name: self.guards[name].submit(fn, deadlines[name]) for name, fn in calls.items()}
+        out = {}
+        for name, entry in started.items():
+            out[name] = entry if isinstance(entry, Exception) else self.guards[name].result(entry, deadlines[name])
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: guard.stats() for name, guard in self.guards.items()}
+
+def _parse_overrides(value: str) -> Dict[str, float]:
+    """MODEL_TIMEOUTS_MS="cad=300,stroke=150" -> {"cad": 0.3, "stroke": 0.15}."""
+    out = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, ms = (x.strip() for x in item.split("=", 1))
+            out[name] = float(ms) / 1000.0
+    return out
+
+def from_env(names: Iterable[str]) -> Optional[ModelGuards]:
+    """ModelGuards for `names`, or None with MODEL_TIMEOUT_MS=0 (sequential, unguarded).
+      MODEL_TIMEOUT_MS          per-model budget (default 0: no guards; e.g. 2000)
+      MODEL_TIMEOUTS_MS         per-model overrides, "cad=300,stroke=150"
+      MODEL_TIMEOUT_PER_ROW_MS  extra budget per additional row of a batch (default 5)
+      MODEL_BULKHEAD_SIZE       concurrent calls per model (default 2)
+      MODEL_BREAKER_FAILURES    consecutive failures that open the breaker (default 5)
+      MODEL_BREAKER_COOLDOWN_S  how long an open breaker skips the model (default 30)"""
+    timeout_ms = float(os.getenv("MODEL_TIMEOUT_MS", 0))
+    if timeout_ms <= 0:
+        return None
+    return ModelGuards(
+        names,
+        timeout_s=timeout_ms / 1000.0,
+        overrides=_parse_overrides(os.getenv("MODEL_TIMEOUTS_MS", "")),
+        bulkhead_size=int(os.getenv("MODEL_BULKHEAD_SIZE", 2)),
+        failure_threshold=int(os.getenv("MODEL_BREAKER_FAILURES", 5)),
+        cooldown_s=float(os.getenv("MODEL_BREAKER_COOLDOWN_S", 30)),
+        per_row_s=float(os.getenv("MODEL_TIMEOUT_PER_ROW_MS", 5)) / 1000.0,
+    )
@@ -0,0 +1,302 @@
+# backend/rollups.py
+"""
+Rollup tables for the population risk dashboard.
+
+The dashboard asks "how many users were at High / Moderate / Low risk per disease per
+day" and for score distributions. Instead of GROUP BY over the whole predictions table,
+those numbers are kept in small rollup tables and the aggregate API reads only these:
+
+  rollup_risk_daily        day x disease x risk -> predictions, users, score_sum
+  rollup_score_hist_daily  day x disease x bucket -> n   (HIST_BUCKET_WIDTH-point buckets)
+  rollup_user_day          day x disease x email -> that user's latest risk of the day,
+                           so `users` counts each user once per day, under the risk of
+                           their most recent submission
+
+Days are UTC dates of predictions.timestamp. Two ways to keep them current
+(ROLLUP_MODE):
+  trigger     (default) an AFTER INSERT trigger on predictions updates the rollups in
+              the same transaction as the insert
+  compaction  inserts stay untouched; compact() folds rows with id above a watermark
+              into the rollups (run by the dashboard endpoints before reading, or
+              `python rollups.py --compact` from cron)
+
+Rollups are not decremented when raw prediction rows are deleted, so they keep the
+history after old raw rows are pruned. `python rollups.py --rebuild [--since DAY]`
+recomputes them from the raw rows that still exist.
+"""
+import os
+from typing import Any, Dict, List, Optional
+
+ROLLUP_MODE = os.getenv("ROLLUP_MODE", "trigger")
+HIST_BUCKET_WIDTH = 5                      # score points per histogram bucket
+HIST_BUCKETS = 100 // HIST_BUCKET_WIDTH
+RISKS = ("High", "Moderate", "Low")
+COMPACT_CHUNK = 50000
+
+_BUCKET_SQL = f"MIN(CAST(MAX(COALESCE({{score}}, 0), 0) / {HIST_BUCKET_WIDTH} AS INTEGER), {HIST_BUCKETS - 1})"
+
+SCHEMA = f'''
+    CREATE TABLE IF NOT EXISTS rollup_risk_daily (
+        day TEXT NOT NULL,
+        disease_name TEXT NOT NULL,
+        risk TEXT NOT NULL,
+        predictions INTEGER NOT NULL DEFAULT 0,
+        users INTEGER NOT NULL DEFAULT 0,
+        score_sum REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, disease_name, risk)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS rollup_score_hist_daily (
+        day TEXT NOT NULL,
+        disease_name TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        n INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, disease_name, bucket)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS rollup_user_day (
+        day TEXT NOT NULL,
+        disease_name TEXT NOT NULL,
+        email TEXT NOT NULL,
+        risk TEXT NOT NULL,
+        PRIMARY KEY (day, disease_name, email)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS rollup_state (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+'''
+
+# Same bookkeeping as compact(), per inserted row. Order matters: the counts row must
+# exist before `users` is moved from the user's previous risk of the day to the new one.
+TRIGGER = f'''
+    CREATE TRIGGER IF NOT EXISTS predictions_rollup AFTER INSERT ON predictions
+    BEGIN
+        INSERT INTO rollup_risk_daily (day, disease_name, risk, predictions, score_sum)
+        VALUES (date(NEW.timestamp), NEW.disease_name, COALESCE(NEW.risk, 'Unknown'), 1, COALESCE(NEW.score, 0))
+        ON CONFLICT (day, disease_name, risk) DO UPDATE
+            SET predictions = predictions + 1, score_sum = score_sum + excluded.score_sum;
+
+        INSERT INTO rollup_score_hist_daily (day, disease_name, bucket, n)
+        VALUES (date(NEW.timestamp), NEW.disease_name, {_BUCKET_SQL.format(score="NEW.score")}, 1)
+        ON CONFLICT (day, disease_name, bucket) DO UPDATE SET n = n + 1;
+
+        UPDATE rollup_risk_daily SET users = users - 1
+        WHERE day = date(NEW.timestamp) AND disease_name = NEW.disease_name
+          AND risk = (SELECT risk FROM rollup_user_day
+                      WHERE day = date(NEW.timestamp) AND disease_name = NEW.disease_name
+                        AND email = NEW.email AND risk <> COALESCE(NEW.risk, 'Unknown'));
+
+        UPDATE rollup_risk_daily SET users = users + 1
+        WHERE day = date(NEW.timestamp) AND disease_name = NEW.disease_name
+          AND risk = COALESCE(NEW.risk, 'Unknown')
+          AND NOT EXISTS (SELECT 1 FROM rollup_user_day
+                          WHERE day = date(NEW.timestamp) AND disease_name = NEW.disease_name
+                            AND email = NEW.email AND risk = COALESCE(NEW.risk, 'Unknown'));
+
+        INSERT INTO rollup_user_day (day, disease_name, email, risk)
+        VALUES (date(NEW.timestamp), NEW.disease_name, NEW.email, COALESCE(NEW.risk, 'Unknown'))
+        ON CONFLICT (day, disease_name, email) DO UPDATE SET risk = excluded.risk;
+    END;
+'''
+
+# ---------------------------------------------------------------------
+# Setup / maintenance
+# ---------------------------------------------------------------------
+def _state(conn, key: str) -> Optional[str]:
+    row = conn.execute("SELECT value FROM rollup_state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def _set_state(conn, key: str, value):
+    conn.execute("INSERT INTO rollup_state (key, value) VALUES (?, ?) "
+                 "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (key, None if value is None else str(value)))
+
+def _max_id(conn) -> int:
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM predictions").fetchone()[0]
+
+def install(conn, mode: str = None):
+    """Create the rollup tables and switch to `mode` (trigger / compaction). The first
+    install backfills from the existing predictions."""
+    mode = mode or ROLLUP_MODE
+    if mode not in ("trigger", "compaction"):
+        raise ValueError(f"unknown ROLLUP_MODE {mode!r} (expected 'trigger' or 'compaction')")
+    conn.executescript(SCHEMA)
+    current = _state(conn, "mode")
+    if current is None:
+        rebuild(conn)
+    elif current == "compaction" and mode == "trigger":
+        compact(conn)   # catch up before the trigger takes over
+    if mode == "trigger":
+        conn.executescript(TRIGGER)
+    else:
+        conn.execute("DROP TRIGGER IF EXISTS predictions_rollup")
+        if current != "compaction":
+            _set_state(conn, "last_id", _max_id(conn))
+    _set_state(conn, "mode", mode)
+    conn.commit()
+
+def rebuild(conn, since: str = None):
+    """Recompute the rollups for days >= since (all days by default) from the raw rows.
+    Only use it for days that still have every raw row: days downsampled or expired by
+    maintenance.py would be recounted from what is left."""
+    if since is None:
+        first = conn.execute("SELECT MIN(date(timestamp)) FROM predictions").fetchone()[0]
+        since = first or "9999-12-31"
+    where = "date(timestamp) >= ?"
+    for table in ("rollup_risk_daily", "rollup_score_hist_daily", "rollup_user_day"):
+        conn.execute(f"DELETE FROM {table} WHERE day >= ?", (since,))
+    conn.execute(f'''
+        INSERT INTO rollup_risk_daily (day, disease_name, risk, predictions, score_sum)
+        SELECT date(timestamp), disease_name, COALESCE(risk, 'Unknown'), COUNT(*), SUM(COALESCE(score, 0))
+        FROM predictions WHERE {where}
+        GROUP BY 1, 2, 3
+    ''', (since,))
+    conn.execute(f'''
+        INSERT INTO rollup_score_hist_daily (day, disease_name, bucket, n)
+        SELECT date(timestamp), disease_name, {_BUCKET_SQL.format(score="score")}, COUNT(*)
+        FROM predictions WHERE {where}
+        GROUP BY 1, 2, 3
+    ''', (since,))
+    conn.execute(f'''
+        INSERT INTO rollup_user_day (day, disease_name, email, risk)
+        SELECT date(timestamp), disease_name, email, COALESCE(risk, 'Unknown') FROM predictions
+        WHERE id IN (SELECT MAX(id) FROM predictions WHERE {where} GROUP BY date(timestamp), disease_name, email)
+    ''', (since,))
+    conn.execute('''
+        UPDATE rollup_risk_daily SET users = (
+            SELECT COUNT(*) FROM rollup_user_day u
+            WHERE u.day = rollup_risk_daily.day AND u.disease_name = rollup_risk_daily.disease_name
+              AND u.risk = rollup_risk_daily.risk)
+        WHERE day >= ?
+    ''', (since,))
+    _set_state(conn, "last_id", _max_id(conn))
+    conn.commit()
+
+def compact(conn, chunk: int = COMPACT_CHUNK) -> int:
+    """Fold predictions with id above the watermark into the rollups (compaction mode);
+    returns the number of rows folded. A no-op in trigger mode."""
+    if _state(conn, "mode") != "compaction":
+        return 0
+    folded = 0
+    while True:
+        last_id = int(_state(conn, "last_id") or 0)
+        rows = conn.execute('''
+            SELECT id, date(timestamp), disease_name, email, COALESCE(risk, 'Unknown'), COALESCE(score, 0)
+            FROM predictions WHERE id > ? ORDER BY id LIMIT ?
+        ''', (last_id, chunk)).fetchall()
+        if not rows:
+            return folded
+
+        counts: Dict[tuple, List[float]] = {}
+        hist: Dict[tuple, int] = {}
+        latest: Dict[tuple, str] = {}
+        for _, day, disease, email, risk, score in rows:
+            c = counts.setdefault((day, disease, risk), [0, 0.0])
+            c[0] += 1
+            c[1] += score
+            bucket = min(int(max(score, 0) // HIST_BUCKET_WIDTH), HIST_BUCKETS - 1)
+            hist[(day, disease, bucket)] = hist.get((day, disease, bucket), 0) + 1
+            latest[(day, disease, email)] = risk    # rows are in id order: last one wins
+
+        users: Dict[tuple, int] = {}
+        for (day, disease, email), risk in latest.items():
+            prev = conn.execute("SELECT risk FROM rollup_user_day WHERE day = ? AND disease_name = ? AND email = ?",
+                                (day, disease, email)).fetchone()
+            if prev is not None and prev[0] == risk:
+                continue
+            if prev is not None:
+                users[(day, disease, prev[0])] = users.get((day, disease, prev[0]), 0) - 1
+            users[(day, disease, risk)] = users.get((day, disease, risk), 0) + 1
+
+        conn.executemany('''
+            INSERT INTO rollup_risk_daily (day, disease_name, risk, predictions, score_sum) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (day, disease_name, risk) DO UPDATE
+                SET predictions = predictions + excluded.predictions, score_sum = score_sum + excluded.score_sum
+        ''', [(*key, n, s) for key, (n, s) in counts.items()])
+        conn.executemany('''
+            INSERT INTO rollup_risk_daily (day, disease_name, risk, users) VALUES (?, ?, ?, ?)
+            ON CONFLICT (day, disease_name, risk) DO UPDATE SET users = users + excluded.users
+        ''', [(*key, n) for key, n in users.items() if n])
+        conn.executemany('''
+            INSERT INTO rollup_score_hist_daily (day, disease_name, bucket, n) VALUES (?, ?, ?, ?)
+            ON CONFLICT (day, disease_name, bucket) DO UPDATE SET n = n + excluded.n
+        ''', [(*key, n) for key, n in hist.items()])
+        conn.executemany('''
+            INSERT INTO rollup_user_day (day, disease_name, email, risk) VALUES (?, ?, ?, ?)
+            ON CONFLICT (day, disease_name, email) DO UPDATE SET risk = excluded.risk
+        ''', [(*key, risk) for key, risk in latest.items()])
+        _set_state(conn, "last_id", rows[-1][0])
+        conn.commit()
+        folded += len(rows)
+
+# ---------------------------------------------------------------------
+# Aggregate API (reads rollup tables only)
+# ---------------------------------------------------------------------
+def _range_filter(start: str = None, end: str = None, disease: str = None):
+    clauses, params = [], []
+    if start:
+        clauses.append("day >= ?")
+        params.append(start)
+    if end:
+        clauses.append("day <= ?")
+        params.append(end)
+    if disease:
+        clauses.append("disease_name = ?")
+        params.append(disease)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def _connections(conn) -> list:
+    """A connection, or a list of connections (one per PREDICTION_SHARDS file)."""
+    return list(conn) if isinstance(conn, (list, tuple)) else [conn]
+
+def risk_counts(conn, start: str = None, end: str = None, disease: str = None) -> List[Dict[str, Any]]:
+    """Per day and disease: {risk: {users, predictions, mean_score}} for start <= day <= end
+    (YYYY-MM-DD, inclusive, both optional). With a list of shard connections the shards
+    are summed; each user lives in exactly one shard, so user counts add up too."""
+    where, params = _range_filter(start, end, disease)
+    totals: Dict[tuple, List[float]] = {}
+    for c in _connections(conn):
+        for day, disease_name, risk, predictions, users, score_sum in c.execute(f'''
+            SELECT day, disease_name, risk, predictions, users, score_sum FROM rollup_risk_daily{where}
+        ''', params):
+            t = totals.setdefault((day, disease_name, risk), [0, 0, 0.0])
+            t[0] += predictions
+            t[1] += users
+            t[2] += score_sum
+    out: Dict[tuple, Dict[str, Any]] = {}
+    for (day, disease_name, risk), (predictions, users, score_sum) in sorted(totals.items()):
+        entry = out.setdefault((day, disease_name), {
+            "day": day, "disease": disease_name,
+            "risk": {r: {"users": 0, "predictions": 0, "mean_score": None} for r in RISKS},
+        })
+        entry["risk"][risk] = {"users": users, "predictions": predictions,
+                               "mean_score": round(score_sum / predictions, 2) if predictions else None}
+    return list(out.values())
+
+def score_histogram(conn, start: str = None, end: str = None, disease: str = None) -> Dict[str, Any]:
+    """Per disease: prediction counts per HIST_BUCKET_WIDTH-point score bucket over the range."""
+    where, params = _range_filter(start, end, disease)
+    out: Dict[str, List[int]] = {}
+    for c in _connections(conn):
+        for disease_name, bucket, n in c.execute(f'''
+            SELECT disease_name, bucket, SUM(n) FROM rollup_score_hist_daily{where} GROUP BY 1, 2
+        ''', params):
+            out.setdefault(disease_name, [0] * HIST_BUCKETS)[bucket] += n
+    return {"bucket_width": HIST_BUCKET_WIDTH, "diseases": dict(sorted(out.items()))}
+
+if __name__ == "__main__":
+    import argparse
+    from database import prediction_shards
+
+    parser = argparse.ArgumentParser(description="Maintain the dashboard rollup tables.")
+    parser.add_argument("--compact", action="store_true", help="fold new predictions (compaction mode)")
+    parser.add_argument("--rebuild", action="store_true", help="recompute rollups from raw predictions")
+    parser.add_argument("--since", help="with --rebuild: first day (YYYY-MM-DD) to recompute")
+    args = parser.parse_args()
+
+    for shard, conn in prediction_shards():
+        install(conn)
+        if args.rebuild:
+            rebuild(conn, args.since)
+            print(f"✅ Shard {shard}: rollups rebuilt{' from ' + args.since if args.since else ''}")
+        if args.compact:
+            print(f"✅ Shard {shard}: folded {compact(conn)} predictions into the rollups")
+        conn.close()
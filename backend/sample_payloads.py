@@ -0,0 +1,140 @@
+# backend/sample_payloads.py
+"""
+Patient payloads for load tests, parity checks and reference profiles.
+
+CSV-derived payloads map rows of the training datasets in model_training/models/ onto
+the frontend field names used by master_input_template (main.py); synthetic payloads
+draw plausible values at random. Only the standard library is used, so this module can
+be imported without TensorFlow/pandas.
+"""
+import os
+import csv
+import random
+from typing import Dict, Any, List, Optional, Iterable
+
+DATASET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "model_training", "models")
+
+# ---------------------------------------------------------------------
+# CSV column -> master_input_template field, per dataset
+# ---------------------------------------------------------------------
+_SEX = {"1": "Male", "0": "Female", "Male": "Male", "Female": "Female", "Fmale": "Female", "M": "Male", "F": "Female"}
+
+DATASETS = {
+    "stroke": {
+        "file": "Stroke1.csv",
+        "fields": {"Sex": "Sex", "Age": "Age", "Hypertension": "Hypertension", "Heart_disease": "heart_disease",
+                   "Married": "Married", "Work_type": "work_type", "Residence_type": "residence_type",
+                   "Glucose_level": "glucose_level", "BMI": "BMI", "Smoking_status": "smoking_status"},
+    },
+    "heart_failure": {
+        "file": "heartfailure1.csv",
+        "fields": {"Age": "Age", "Sex": "Sex", "ChestPainType": "chest_pain_type", "RestingBP": "resting_bp",
+                   "Cholesterol": "cholesterol", "RestingECG": "resting_ecg", "MaxHR": "max_hr",
+                   "ExerciseAngina": "exercise_angina", "Oldpeak": "oldpeak", "ST_Slope": "st_slope"},
+    },
+    "hypertension": {
+        "file": "Hypertension-risk-model-main.csv",
+        "fields": {"male": "Sex", "age": "Age", "currentSmoker": "smokes", "diabetes": "diabetes",
+                   "totChol": "cholesterol", "sysBP": "systolic_bp", "diaBP": "diastolic_bp", "BMI": "BMI",
+                   "heartRate": "heart_rate", "glucose": "glucose_level"},
+    },
+    "heart_attack": {
+        "file": "Medicaldataset (1).csv",
+        "fields": {"Age": "Age", "Gender": "Sex", "Heart rate": "heart_rate",
+                   "Systolic blood pressure": "systolic_bp", "Diastolic blood pressure": "diastolic_bp",
+                   "Blood sugar": "blood_sugar", "CK-MB": "CK-MB", "Troponin": "Troponin"},
+    },
+    "cad": {
+        "file": "CAD.csv",
+        "fields": {"Age": "Age", "Sex": "Sex", "BMI": "BMI", "DM": "diabetes", "HTN": "Hypertension",
+                   "Current Smoker": "smokes", "EX-Smoker": "formerly_smoked", "FH": "FH", "Obesity": "Obesity",
+                   "CRF": "CRF", "CVA": "CVA", "Airway disease": "Airway disease",
+                   "Thyroid Disease": "Thyroid Disease", "CHF": "CHF", "DLP": "DLP", "BP": "systolic_bp",
+                   "PR": "heart_rate", "Edema": "Edema", "Weak Peripheral Pulse": "Weak Peripheral Pulse",
+                   "Lung rales": "Lung rales", "Systolic Murmur": "Systolic Murmur",
+                   "Diastolic Murmur": "Diastolic Murmur", "Typical Chest Pain": "typical_angina",
+                   "Dyspnea": "Dyspnea", "Function Class": "Function Class", "Atypical": "atypical_angina",
+                   "Nonanginal": "non_anginal_pain", "Exertional CP": "Exertional CP", "LowTH Ang": "LowTH Ang",
+                   "Q Wave": "Q Wave", "St Elevation": "St Elevation", "St Depression": "St Depression",
+                   "Tinversion": "Tinversion", "LVH": "LVH", "Poor R Progression": "Poor R Progression",
+                   "BBB": "BBB", "FBS": "FBS", "CR": "CR", "TG": "triglycerides", "LDL": "LDL", "HDL": "HDL",
+                   "BUN": "BUN", "ESR": "ESR", "HB": "HB", "K": "K", "Na": "Na", "WBC": "WBC", "Lymph": "Lymph",
+                   "Neut": "Neut", "PLT": "PLT", "EF-TTE": "EF-TTE", "Region RWMA": "Region RWMA", "VHD": "VHD"},
+    },
+}
+
+def _convert(value: str):
+    value = value.strip()
+    if value in {"", "NA", "nan"}:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+def iter_csv_payloads(dataset: str, dataset_dir: str = DATASET_DIR) -> Iterable[Dict[str, Any]]:
+    """Yield one payload per CSV row of `dataset` (a key of DATASETS). Missing values are omitted."""
+    spec = DATASETS[dataset]
+    with open(os.path.join(dataset_dir, spec["file"]), newline="") as f:
+        for row in csv.DictReader(f):
+            payload = {}
+            for src, dst in spec["fields"].items():
+                value = _convert(row.get(src, ""))
+                if value is None:
+                    continue
+                if dst == "Sex":
+                    value = _SEX.get(str(value), value)
+                payload[dst] = value
+            yield payload
+
+def load_csv_payloads(limit: Optional[int] = None, seed: int = 0, datasets: Optional[List[str]] = None,
+                      dataset_dir: str = DATASET_DIR) -> List[Dict[str, Any]]:
+    """Deterministically shuffled payloads from all (or the given) datasets."""
+    payloads = []
+    for name in datasets or list(DATASETS):
+        payloads.extend(iter_csv_payloads(name, dataset_dir))
+    random.Random(seed).shuffle(payloads)
+    return payloads[:limit] if limit else payloads
+
+# ---------------------------------------------------------------------
+# Synthetic payloads
+# ---------------------------------------------------------------------
+def synthetic_payload(rng: random.Random) -> Dict[str, Any]:
+    systolic = rng.randint(95, 200)
+    ldl, hdl = rng.randint(60, 220), rng.randint(25, 90)
+    return {
+        "Age": rng.randint(18, 90),
+        "Sex": rng.choice(["Male", "Female"]),
+        "BMI": round(rng.uniform(16, 45), 1),
+        "systolic_bp": systolic,
+        "diastolic_bp": rng.randint(55, min(130, systolic - 20)),
+        "resting_bp": systolic,
+        "cholesterol": rng.randint(120, 340),
+        "LDL": ldl,
+        "HDL": hdl,
+        "ldl_hdl_ratio": round(ldl / hdl, 2),
+        "triglycerides": rng.randint(50, 400),
+        "glucose_level": rng.randint(60, 260),
+        "blood_sugar": rng.randint(60, 260),
+        "FBS": rng.randint(60, 200),
+        "Hypertension": rng.randint(0, 1),
+        "diabetes": rng.randint(0, 1),
+        "heart_disease": rng.randint(0, 1),
+        "smokes": rng.randint(0, 1),
+        "smoking_status": rng.choice(["never smoked", "formerly smoked", "smokes", "Unknown"]),
+        "heart_rate": rng.randint(45, 130),
+        "max_hr": rng.randint(80, 200),
+        "oldpeak": round(rng.uniform(0, 4), 1),
+        "chest_pain_type": rng.choice(["ATA", "NAP", "ASY", "TA"]),
+        "st_slope": rng.choice(["Up", "Flat", "Down"]),
+        "CK-MB": round(rng.uniform(0.5, 30), 2),
+        "Troponin": round(rng.uniform(0.0, 1.0), 3),
+    }
+
+def synthetic_payloads(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [synthetic_payload(rng) for _ in range(n)]
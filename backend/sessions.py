@@ -0,0 +1,67 @@
+# backend/sessions.py
+"""
+Per-user session profiles for incremental re-scoring.
+
+Each entry keeps the last merged input (master_input_template + user values) and the
+last per-disease predictions. main.predict_all_diseases_incremental() diffs a new
+submission against it and reruns only the models whose input columns (from
+{disease}_columns.json) include a changed field; the rest reuse the stored prediction.
+
+Profiles live in the memory of the process that holds the models, bounded by count
+(least recently used evicted) and idle time:
+  SESSION_MAX_PROFILES   default 10000
+  SESSION_TTL_S          default 1800
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+Clock = Callable[[], float]
+
+class SessionStore:
+    def __init__(self, max_profiles: int = None, ttl_s: float = None, clock: Clock = time.monotonic):
+        self.max_profiles = max_profiles if max_profiles is not None else int(os.getenv("SESSION_MAX_PROFILES", 10000))
+        self.ttl_s = ttl_s if ttl_s is not None else float(os.getenv("SESSION_TTL_S", 1800))
+        self._clock = clock
+        self._profiles: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._recomputed = 0
+        self._reused = 0
+
+    def get(self, key: Hashable, generation: Any) -> Optional[Dict[str, Any]]:
+        """The stored profile, unless missing, idle for longer than ttl_s, or scored by a
+        different set of loaded models (`generation`)."""
+        now = self._clock()
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is None or now - profile["updated"] > self.ttl_s or profile["generation"] != generation:
+                self._profiles.pop(key, None)
+                self._misses += 1
+                return None
+            self._profiles.move_to_end(key)
+            self._hits += 1
+            return profile
+
+    def put(self, key: Hashable, merged_input: Dict[str, Any], predictions: Dict[str, Any], generation: Any):
+        with self._lock:
+            self._profiles.pop(key, None)
+            self._profiles[key] = {"input": merged_input, "predictions": predictions,
+                                   "generation": generation, "updated": self._clock()}
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def record(self, recomputed: int, reused: int):
+        with self._lock:
+            self._recomputed += recomputed
+            self._reused += reused
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            scored = self._recomputed + self._reused
+            return {"profiles": len(self._profiles), "hits": self._hits, "misses": self._misses,
+                    "models_recomputed": self._recomputed, "models_reused": self._reused,
+                    "reuse_ratio": round(self._reused / scored, 4) if scored else None}
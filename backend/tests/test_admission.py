@@ -0,0 +1,97 @@
+# backend/tests/test_admission.py
+import pytest
+
+from admission import AdmissionController, TokenBucketLimiter, retry_after_header
+
+class FakeClock:
+    """Returns `now`; each call then moves it on by `step` (a request that waited)."""
+    def __init__(self, now: float = 100.0, step: float = 0.0):
+        self.now = now
+        self.step = step
+
+    def __call__(self) -> float:
+        now = self.now
+        self.now += self.step
+        return now
+
+# ---------------------------------------------------------------------
+# TokenBucketLimiter
+# ---------------------------------------------------------------------
+def test_burst_then_exhausted():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate_per_s=1.0, burst=3, clock=clock)
+    assert [limiter.allow("a")[0] for _ in range(3)] == [True, True, True]
+    allowed, retry_after = limiter.allow("a")
+    assert not allowed
+    assert retry_after == pytest.approx(1.0)
+    assert limiter.stats()["limited"] == 1
+
+def test_refill_is_proportional_and_capped():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate_per_s=2.0, burst=2, clock=clock)
+    limiter.allow("a")
+    limiter.allow("a")
+    clock.now += 0.25  # half a token back
+    allowed, retry_after = limiter.allow("a")
+    assert not allowed
+    assert retry_after == pytest.approx(0.25)
+    clock.now += 0.25
+    assert limiter.allow("a")[0]
+    clock.now += 3600  # never more than `burst`
+    assert [limiter.allow("a")[0] for _ in range(3)] == [True, True, False]
+
+def test_keys_have_separate_buckets():
+    limiter = TokenBucketLimiter(rate_per_s=1.0, burst=1, clock=FakeClock())
+    assert limiter.allow("10.0.0.1")[0]
+    assert not limiter.allow("10.0.0.1")[0]
+    assert limiter.allow("10.0.0.2")[0]
+
+def test_least_recent_keys_forgotten():
+    limiter = TokenBucketLimiter(rate_per_s=1.0, burst=1, clock=FakeClock(), max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.allow(key)
+    assert limiter.stats()["tracked_keys"] == 2
+    assert limiter.allow("a")[0]  # evicted, so a full bucket again
+
+@pytest.mark.parametrize("seconds, header", [(0.0, "1"), (0.001, "1"), (1.0, "1"), (1.2, "2"), (2.999, "3")])
+def test_retry_after_rounds_up(seconds, header):
+    assert retry_after_header(seconds) == header
+
+# ---------------------------------------------------------------------
+# AdmissionController
+# ---------------------------------------------------------------------
+def test_in_flight_limit_sheds_and_recovers():
+    admission = AdmissionController(max_in_flight=2, max_queue_wait_s=0, clock=FakeClock())
+    assert admission.acquire()
+    assert admission.acquire()
+    assert not admission.acquire()
+    stats = admission.stats()
+    assert (stats["in_flight"], stats["admitted"], stats["shed"]) == (2, 2, 1)
+    admission.release()
+    assert admission.acquire()
+    assert admission.stats()["in_flight"] == 2
+
+def test_queue_wait_stats():
+    clock = FakeClock(step=0.004)  # every acquire measures a 4 ms wait
+    admission = AdmissionController(max_in_flight=10, max_queue_wait_s=0, clock=clock)
+    for _ in range(3):
+        assert admission.acquire()
+    clock.step = 0.010
+    assert admission.acquire()
+    waits = admission.stats()["queue_wait_ms"]
+    assert waits["mean"] == pytest.approx(5.5)
+    assert waits["p50"] == pytest.approx(4.0)
+    assert waits["max"] == pytest.approx(10.0)
+
+def test_shed_requests_do_not_count_as_waits():
+    admission = AdmissionController(max_in_flight=1, max_queue_wait_s=0, clock=FakeClock(step=1.0))
+    assert admission.acquire()
+    assert not admission.acquire()
+    assert admission.stats()["queue_wait_ms"]["max"] == pytest.approx(1000.0)
+    assert admission.stats()["admitted"] == 1
+
+def test_rejects_bad_limits():
+    with pytest.raises(ValueError):
+        AdmissionController(max_in_flight=0)
+    with pytest.raises(ValueError):
+        TokenBucketLimiter(rate_per_s=0, burst=1)
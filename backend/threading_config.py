@@ -0,0 +1,127 @@
+# backend/threading_config.py
+"""
+One thread budget for every library that scores a request, set before any of them
+is imported.
+
+TensorFlow (intra-op / inter-op pools), the BLAS under NumPy and scikit-learn
+(OpenBLAS, MKL, OpenMP) and numexpr each size their pools from the machine's core
+count by default, and each model process gets its own. With several gunicorn workers
+or inference pool processes that is workers x cores threads fighting over the same
+cores -- and inside a container the count they see is the host's, not the cgroup quota.
+
+Here the cores actually available to this process are detected once (affinity mask
+and cgroup v1/v2 CPU quota), split between the processes that load models, and the
+per-process share is exported as the libraries' own environment variables: main.py
+(and app.py / asgi_app.py, which may load NumPy first) call apply() before any other
+import, and main.py calls configure_tensorflow() right after importing TensorFlow.
+Anything already set in the environment wins.
+
+    MODEL_PROCESSES     processes loading models on this box (set by gunicorn.conf.py
+                        from the configured worker count and by inference_pool.py;
+                        else WEB_CONCURRENCY, else 1)
+    THREADS_PER_WORKER  threads per process (default: available cores // MODEL_PROCESSES)
+    TF_INTEROP_THREADS  TensorFlow inter-op pool (default: 1, 2 from 4 threads up)
+    THREAD_CONFIG=0     leave every library at its own default
+"""
+import os
+import math
+from typing import Any, Dict, Optional
+
+ENABLED = os.getenv("THREAD_CONFIG", "1") == "1"
+
+# Variables read by the BLAS / OpenMP runtimes at load time
+BLAS_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                 "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+_applied: Dict[str, Any] = {}
+
+# ---------------------------------------------------------------------
+# Core detection
+# ---------------------------------------------------------------------
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def cgroup_cpu_quota() -> Optional[float]:
+    """CPUs allowed by the cgroup CPU quota (v2 cpu.max, else v1 cfs_quota/period);
+    None when unlimited or not in a cgroup."""
+    cpu_max = _read("/sys/fs/cgroup/cpu.max")
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+    quota = _read("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") or _read("/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_quota_us")
+    period = _read("/sys/fs/cgroup/cpu/cpu.cfs_period_us") or _read("/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_period_us")
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+def detect_cpus() -> Dict[str, Any]:
+    """Cores this process may use: the affinity mask, capped by the cgroup quota
+    (rounded up, a 1.5-CPU quota can keep two threads busy part of the time)."""
+    try:
+        affinity = len(os.sched_getaffinity(0))
+    except AttributeError:
+        affinity = os.cpu_count() or 1
+    quota = cgroup_cpu_quota()
+    available = affinity if quota is None else max(1, min(affinity, math.ceil(quota)))
+    return {"host": os.cpu_count(), "affinity": affinity, "cgroup_quota": quota, "available": available}
+
+# ---------------------------------------------------------------------
+# Split between processes
+# ---------------------------------------------------------------------
+def model_processes() -> int:
+    return max(1, int(os.getenv("MODEL_PROCESSES") or os.getenv("WEB_CONCURRENCY") or 1))
+
+def plan(cpus: int, processes: int) -> Dict[str, int]:
+    """Per-process thread counts for `processes` model-loading processes on `cpus` cores."""
+    threads = int(os.getenv("THREADS_PER_WORKER") or max(1, cpus // processes))
+    interop = int(os.getenv("TF_INTEROP_THREADS") or (2 if threads >= 4 else 1))
+    return {"threads_per_worker": threads, "tf_intra_op": threads, "tf_inter_op": interop, "blas": threads}
+
+def default_workers(cpus: int = None) -> int:
+    """gunicorn worker count with WORKERS_FROM_CORES=1: one per THREADS_PER_WORKER
+    cores (default 1, i.e. one single-threaded worker per core)."""
+    cpus = cpus or detect_cpus()["available"]
+    return max(1, cpus // int(os.getenv("THREADS_PER_WORKER") or 1))
+
+def apply() -> Dict[str, Any]:
+    """Export the plan as environment variables; must run before NumPy is imported."""
+    if _applied or not ENABLED:
+        return _applied
+    cpus = detect_cpus()
+    processes = model_processes()
+    p = plan(cpus["available"], processes)
+    for var in BLAS_ENV_VARS:
+        os.environ.setdefault(var, str(p["blas"]))
+    os.environ.setdefault("TF_NUM_INTRAOP_THREADS", str(p["tf_intra_op"]))
+    os.environ.setdefault("TF_NUM_INTEROP_THREADS", str(p["tf_inter_op"]))
+    _applied.update(cpus=cpus, model_processes=processes, plan=p)
+    return _applied
+
+def configure_tensorflow(tf) -> None:
+    """Size TensorFlow's pools from the environment; call before the first op runs."""
+    if not ENABLED:
+        return
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(int(os.environ["TF_NUM_INTRAOP_THREADS"]))
+        tf.config.threading.set_inter_op_parallelism_threads(int(os.environ["TF_NUM_INTEROP_THREADS"]))
+    except (KeyError, RuntimeError) as e:
+        # RuntimeError: TensorFlow was already initialised by an earlier import
+        print(f"⚠️ TensorFlow thread pools left at their defaults: {e}")
+    _applied["tensorflow"] = {
+        "intra_op": tf.config.threading.get_intra_op_parallelism_threads(),
+        "inter_op": tf.config.threading.get_inter_op_parallelism_threads(),
+    }
+
+def effective_settings() -> Dict[str, Any]:
+    """What this process runs with, for the health endpoint."""
+    settings = dict(_applied) if _applied else {"cpus": detect_cpus(), "model_processes": model_processes()}
+    settings["enabled"] = ENABLED
+    settings["env"] = {var: os.environ.get(var) for var in
+                       BLAS_ENV_VARS + ("TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS")}
+    return settings
@@ -0,0 +1,134 @@
+# model_training/families.py
+"""
+Train low-latency alternatives to the MLPs, per disease:
+
+  logreg : sklearn LogisticRegression
+  gbt    : shallow GradientBoostingClassifier, compiled to flat arrays (see
+           backend/fast_models.py for the vectorised evaluator)
+
+Models are fit on the same cleaned split as train.py, transformed with the preprocessor
+already deployed in backend/models/{disease}/, so they can be swapped in behind it:
+    backend/models/{disease}/{disease}_{family}.npz   (+ {disease}_{family}.json metrics)
+
+Serve with MODEL_FAMILIES, e.g. MODEL_FAMILIES="cad=logreg,heart_failure=gbt".
+
+Usage (from model_training/):
+    python families.py --families logreg,gbt
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+import joblib
+from sklearn.model_selection import train_test_split
+from sklearn.linear_model import LogisticRegression
+from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.metrics import accuracy_score, precision_score, recall_score
+
+import train
+
+GBT_PARAMS = {"n_estimators": 150, "max_depth": 3, "learning_rate": 0.1, "subsample": 0.9}
+
+def deployed_split(name: str, models_dir: str = train.BACKEND_MODELS_DIR, seed: int = train.SEED):
+    """train.py's split, transformed with the deployed preprocessor (+ SMOTE on train)."""
+    model_dir = os.path.join(models_dir, name)
+    preprocessor = joblib.load(os.path.join(model_dir, f"{name}_preprocessor.joblib"))
+    with open(os.path.join(model_dir, f"{name}_columns.json")) as f:
+        columns = json.load(f)
+    X, y = train.load_clean(name)
+    X = X[columns]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=seed, stratify=y)
+    X_res, y_res = train.smote(preprocessor.transform(X_train), y_train, seed)
+    return {
+        "X_train": np.asarray(X_res, dtype=np.float64), "y_train": np.asarray(y_res),
+        "X_test": np.asarray(preprocessor.transform(X_test), dtype=np.float64), "y_test": np.asarray(y_test),
+    }
+
+# ---------------------------------------------------------------------
+# GBT -> flat arrays
+# ---------------------------------------------------------------------
+def compile_gbt(clf: GradientBoostingClassifier, X_ref: np.ndarray) -> dict:
+    trees = [est[0].tree_ for est in clf.estimators_]
+    max_nodes = max(t.node_count for t in trees)
+    n = len(trees)
+    feature = np.zeros((n, max_nodes), dtype=np.int32)
+    threshold = np.full((n, max_nodes), np.inf)
+    left = np.tile(np.arange(max_nodes, dtype=np.int32), (n, 1))
+    right = left.copy()
+    value = np.zeros((n, max_nodes))
+    for i, t in enumerate(trees):
+        k = t.node_count
+        internal = t.children_left[:k] != -1
+        idx = np.arange(k)
+        feature[i, :k] = np.where(internal, t.feature[:k], 0)
+        threshold[i, :k] = np.where(internal, t.threshold[:k], np.inf)
+        left[i, :k] = np.where(internal, t.children_left[:k], idx)
+        right[i, :k] = np.where(internal, t.children_right[:k], idx)
+        value[i, :k] = t.value[:k, 0, 0]
+
+    # recover the prior (init) term from the public decision_function
+    row = X_ref[:1].astype(np.float32)
+    tree_sum = sum(est[0].predict(row)[0] for est in clf.estimators_)
+    init = float(clf.decision_function(row)[0] - clf.learning_rate * tree_sum)
+    return {"family": "gbt", "feature": feature, "threshold": threshold, "left": left, "right": right,
+            "value": value, "init": init, "learning_rate": clf.learning_rate,
+            "max_depth": max(t.max_depth for t in trees)}
+
+# ---------------------------------------------------------------------
+# Training
+# ---------------------------------------------------------------------
+def fit_family(family: str, data: dict):
+    if family == "logreg":
+        clf = LogisticRegression(max_iter=2000).fit(data["X_train"], data["y_train"])
+        return clf, {"family": "logreg", "coef": clf.coef_.reshape(-1), "intercept": clf.intercept_}
+    if family == "gbt":
+        clf = GradientBoostingClassifier(random_state=train.SEED, **GBT_PARAMS).fit(data["X_train"], data["y_train"])
+        return clf, compile_gbt(clf, data["X_train"])
+    raise ValueError(f"unknown family: {family}")
+
+def train_family(name: str, family: str, models_dir: str = train.BACKEND_MODELS_DIR):
+    sys.path.insert(0, os.path.join(train.HERE, "..", "backend"))
+    from fast_models import load_fast_model
+
+    data = deployed_split(name, models_dir)
+    t0 = time.perf_counter()
+    clf, arrays = fit_family(family, data)
+    fit_s = time.perf_counter() - t0
+
+    path = os.path.join(models_dir, name, f"{name}_{family}.npz")
+    np.savez(path, **arrays)
+
+    # sanity check: the compiled artifact must reproduce sklearn's probabilities
+    served = load_fast_model(path).predict(data["X_test"]).reshape(-1)
+    ref = clf.predict_proba(data["X_test"])[:, 1]
+    max_diff = float(np.max(np.abs(served - ref)))
+    if max_diff > 1e-6:
+        raise RuntimeError(f"[{name}/{family}] compiled model diverges from sklearn (max diff {max_diff})")
+
+    pred = (served > 0.5).astype(int)
+    metrics = {
+        "disease": name, "family": family, "fit_seconds": round(fit_s, 2),
+        "accuracy": float(accuracy_score(data["y_test"], pred)),
+        "precision": float(precision_score(data["y_test"], pred, zero_division=0)),
+        "recall": float(recall_score(data["y_test"], pred, zero_division=0)),
+        "max_diff_vs_sklearn": max_diff,
+    }
+    with open(os.path.join(models_dir, name, f"{name}_{family}.json"), "w") as f:
+        json.dump(metrics, f, indent=2)
+    print(f"✅ [{name}/{family}] acc={metrics['accuracy']:.4f} precision={metrics['precision']:.4f} "
+          f"recall={metrics['recall']:.4f} → {path}")
+    return metrics
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train logistic-regression / GBT alternatives per disease.")
+    parser.add_argument("--diseases", default=",".join(train.DISEASES))
+    parser.add_argument("--families", default="logreg,gbt")
+    parser.add_argument("--models-dir", default=train.BACKEND_MODELS_DIR)
+    args = parser.parse_args()
+
+    for name in [n.strip() for n in args.diseases.split(",") if n.strip()]:
+        for family in [f.strip() for f in args.families.split(",") if f.strip()]:
+            train_family(name, family, args.models_dir)
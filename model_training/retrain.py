@@ -0,0 +1,225 @@
+# model_training/retrain.py
+"""
+Warm-start refresh of the serving MLPs from follow-up outcomes (backend/outcomes.py).
+
+Instead of train.py's full run (clean, split, SMOTE, up to 200 epochs from random
+weights), each disease model is:
+
+  1. loaded from backend/models/{disease}/{disease}_model.keras, weights and all
+  2. fine-tuned at a lower learning rate (--lr-scale x the disease's rate) for a few
+     epochs on the labelled predictions recorded since the serving version was built,
+     plus a replay sample (--replay-ratio x the new rows) of the original SMOTE-balanced
+     training split so it does not forget the base data
+  3. written as a candidate next to, not over, the serving model:
+         backend/models/candidates/<timestamp>/{disease}/{disease}_model.keras
+         (+ the unchanged preprocessor / columns and {disease}_training.json)
+
+New rows are rebuilt from the feature snapshots stored with each prediction, through
+the serving code path (main.decode_input / _prepare_dataframe_for_model and the
+deployed preprocessor), so they match what the model actually scored. The preprocessor
+is not refit: the candidate must keep the serving model's input space.
+
+{disease}_training.json records the outcome ids consumed per shard
+("outcomes_through"), the metrics of the serving and the candidate model on the
+original test split and on a holdout of the new rows, and the training cost next to
+the full retrain it replaces (train.py's fit_seconds / epochs_run / train_rows for the
+serving model, or measured with --measure-full). Promote a candidate by copying its
+{disease}/ files into backend/models/{disease}/; the next run then starts from its
+watermark.
+
+Usage (from model_training/):
+    python retrain.py --diseases stroke,cad [--min-new 50] [--epochs 20] [--measure-full]
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import contextlib
+import tempfile
+from datetime import datetime, timezone
+
+import numpy as np
+
+import train
+import families
+
+BACKEND_DIR = os.path.join(train.HERE, "..", "backend")
+CANDIDATES_DIR = os.path.join(train.BACKEND_MODELS_DIR, "candidates")
+
+# ---------------------------------------------------------------------
+# New labelled rows (backend database + serving transforms)
+# ---------------------------------------------------------------------
+def _backend(db_path: str):
+    """Import the backend's database and main modules (main loads the serving models)."""
+    sys.path.insert(0, BACKEND_DIR)
+    import database
+    database.DB_NAME = db_path
+    import main
+    return database, main
+
+def new_rows(database, name: str, watermark: dict):
+    """Feature snapshots + labels recorded since `watermark` ({shard: outcome id})."""
+    import outcomes
+    feats, labels, through = [], [], dict(watermark)
+    for shard, conn in database.prediction_shards():
+        try:
+            rows = outcomes.labelled_rows(conn, name, int(watermark.get(str(shard), 0)))
+        finally:
+            conn.close()
+        for outcome_id, features, label in rows:
+            feats.append(features)
+            labels.append(label)
+        if rows:
+            through[str(shard)] = rows[-1][0]
+    return feats, np.asarray(labels, dtype=np.int64), through
+
+def transform_rows(main, name: str, feats):
+    """Snapshots -> model input matrix, exactly as predict_all_diseases() builds it."""
+    assets = main.MODELS[name]
+    with contextlib.redirect_stdout(io.StringIO()):  # column-alignment logging for every row
+        df = main._prepare_dataframe_for_model([main.decode_input(f, defaulted=False)[0] for f in feats], assets, name)
+    return np.asarray(assets["preprocessor"].transform(df), dtype=np.float32)
+
+# ---------------------------------------------------------------------
+# Fine-tuning
+# ---------------------------------------------------------------------
+def _compile(model, learning_rate: float):
+    import tensorflow as tf
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        loss='binary_crossentropy',
+        metrics=['accuracy', tf.keras.metrics.Precision(name='precision'), tf.keras.metrics.Recall(name='recall')]
+    )
+    return model
+
+def _evaluate(model, X, y) -> dict:
+    if len(y) == 0:
+        return None
+    loss, acc, precision, recall = model.evaluate(X, y, verbose=0)
+    return {"loss": float(loss), "accuracy": float(acc), "precision": float(precision), "recall": float(recall)}
+
+def _full_retrain_cost(parent: dict, name: str, measure: bool, threads: int = None) -> dict:
+    """Cost of the full train.py run the warm start replaces."""
+    keys = ("fit_seconds", "epochs_run", "train_rows")
+    if measure:
+        out = tempfile.mkdtemp(prefix="retrain_full_")
+        try:
+            metadata = train.train_one(name, out, threads=threads)
+        finally:
+            shutil.rmtree(out, ignore_errors=True)
+        return dict({k: metadata[k] for k in keys}, source="measured")
+    if parent.get("cost", {}).get("full_retrain"):
+        return parent["cost"]["full_retrain"]   # the serving model is itself a warm start
+    if all(k in parent for k in keys):
+        return dict({k: parent[k] for k in keys}, source="train.py")
+    return None
+
+def retrain_one(name: str, database, main, args, stamp: str):
+    model_dir = os.path.join(train.BACKEND_MODELS_DIR, name)
+    parent_path = os.path.join(model_dir, f"{name}_training.json")
+    parent = {}
+    if os.path.exists(parent_path):
+        with open(parent_path) as f:
+            parent = json.load(f)
+    if main.MODELS is None or main.MODELS[name]["family"] != "mlp":
+        print(f"❌ [{name}] the serving model is not a loaded Keras MLP; nothing to warm-start")
+        return None
+
+    t0 = time.perf_counter()
+    feats, y_new, through = new_rows(database, name, parent.get("outcomes_through", {}))
+    if len(y_new) < args.min_new:
+        print(f"⏭️  [{name}] {len(y_new)} new labelled predictions (< --min-new {args.min_new}); skipped")
+        return None
+    X_new = transform_rows(main, name, feats)
+
+    rng = np.random.default_rng(train.SEED)
+    order = rng.permutation(len(y_new))
+    n_holdout = int(len(order) * args.holdout)
+    hold, fit_idx = order[:n_holdout], order[n_holdout:]
+
+    base = families.deployed_split(name)
+    n_replay = min(len(base["y_train"]), int(round(args.replay_ratio * len(fit_idx))))
+    replay = rng.choice(len(base["y_train"]), size=n_replay, replace=False)
+    data = {
+        "X_train": np.concatenate([X_new[fit_idx], base["X_train"][replay].astype(np.float32)]),
+        "y_train": np.concatenate([y_new[fit_idx], base["y_train"][replay]]),
+        # early stopping watches the new holdout when there is one, else the base test split
+        "X_val": X_new[hold] if n_holdout else base["X_test"].astype(np.float32),
+        "y_val": y_new[hold] if n_holdout else base["y_test"],
+    }
+    t_data = time.perf_counter() - t0
+
+    import tensorflow as tf
+    train.seed_everything()
+    hp = dict(train.DISEASES[name]["model"])
+    hp.update(epochs=args.epochs, patience=args.patience, lr_patience=max(1, args.patience // 2),
+              learning_rate=hp["learning_rate"] * args.lr_scale)
+    serving = _compile(main.MODELS[name]["model"], hp["learning_rate"])
+    model = tf.keras.models.load_model(os.path.join(model_dir, f"{name}_model.keras"))
+    _compile(model, hp["learning_rate"])
+
+    t1 = time.perf_counter()
+    history = train.fit_model(model, data, hp)
+    t_fit = time.perf_counter() - t1
+    epochs_run = len(history.history["loss"])
+
+    full = _full_retrain_cost(parent, name, args.measure_full, args.threads)
+    warm = {"fit_seconds": round(t_fit, 2), "epochs_run": epochs_run, "train_rows": int(len(data["y_train"]))}
+    cost = {"warm_start": warm, "full_retrain": full}
+    if full:
+        cost["fit_seconds_ratio"] = round(warm["fit_seconds"] / max(full["fit_seconds"], 1e-9), 4)
+        cost["row_epochs_ratio"] = round(warm["train_rows"] * warm["epochs_run"] /
+                                         max(full["train_rows"] * full["epochs_run"], 1), 4)
+
+    metadata = {
+        "disease": name,
+        "warm_start_from": os.path.relpath(model_dir, train.BACKEND_MODELS_DIR),
+        "outcomes_through": through,
+        "new_rows": int(len(y_new)),
+        "new_positive": int(y_new.sum()),
+        "new_holdout_rows": n_holdout,
+        "replay_rows": n_replay,
+        "hyperparameters": hp,
+        "epochs_run": epochs_run,
+        "data_seconds": round(t_data, 2),
+        "fit_seconds": round(t_fit, 2),
+        "cost": cost,
+        "test": _evaluate(model, base["X_test"], base["y_test"]),
+        "serving_test": _evaluate(serving, base["X_test"], base["y_test"]),
+        "new_holdout": {"candidate": _evaluate(model, X_new[hold], y_new[hold]),
+                        "serving": _evaluate(serving, X_new[hold], y_new[hold])},
+    }
+    assets = main.MODELS[name]
+    target = train.save_artifacts(name, model, assets["preprocessor"], assets["columns"],
+                                  os.path.join(CANDIDATES_DIR, stamp), metadata)
+    ratio = f", {cost['fit_seconds_ratio']:.1%} of a full retrain" if full else ""
+    print(f"✅ [{name}] {len(y_new)} new + {n_replay} replay rows, {epochs_run} epochs in {t_fit:.1f}s{ratio}; "
+          f"test acc {metadata['serving_test']['accuracy']:.4f} → {metadata['test']['accuracy']:.4f} → {target}")
+    return metadata
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm-start the serving models on labelled outcomes.")
+    parser.add_argument("--diseases", default=",".join(train.DISEASES), help="comma-separated subset")
+    parser.add_argument("--db", default=os.path.join(BACKEND_DIR, "users.db"))
+    parser.add_argument("--min-new", type=int, default=50, help="skip a disease with fewer new labels")
+    parser.add_argument("--replay-ratio", type=float, default=3.0, help="replay rows per new row")
+    parser.add_argument("--holdout", type=float, default=0.2, help="share of new rows held out for validation")
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--patience", type=int, default=4)
+    parser.add_argument("--lr-scale", type=float, default=0.1, help="x the disease's training learning rate")
+    parser.add_argument("--measure-full", action="store_true", help="also run a full train.py fit for the cost comparison")
+    parser.add_argument("--threads", type=int, default=None, help="BLAS/TF threads for --measure-full")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.diseases.split(",") if n.strip()]
+    unknown = set(names) - set(train.DISEASES)
+    if unknown:
+        parser.error(f"unknown disease(s): {sorted(unknown)}")
+    database, main = _backend(args.db)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    results = [m for m in (retrain_one(n, database, main, args, stamp) for n in names) if m]
+    print(f"🏁 {len(results)}/{len(names)} candidate(s) in {os.path.join(CANDIDATES_DIR, stamp)}" if results
+          else "🏁 No candidates written")
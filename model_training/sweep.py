@@ -0,0 +1,236 @@
+# model_training/sweep.py
+"""
+Hyperparameter sweep with stratified k-fold cross-validation.
+
+For each disease, random configurations (layer widths, dropout, L2, learning rate,
+batch norm) are drawn from SEARCH_SPACE and evaluated on the same cached folds
+(cleaned data from train.py; per-fold preprocessing + SMOTE cached under .cache/).
+Trials run in a process pool. After every fold a trial records its running F1 in a
+Manager dict shared by all workers and is compared with the median of the other
+trials that have reached that fold, finished or still running; it is pruned if it
+falls behind (median stopping), so trials running side by side prune each other.
+
+The leaderboard reports mean precision / recall / F1 / ROC-AUC next to serving cost:
+parameter count and measured single-row and batch inference latency.
+
+Usage (from model_training/):
+    python sweep.py --diseases cad,heart_failure --trials 20 --folds 5 --jobs 4
+"""
+import os
+import csv
+import json
+import time
+import random
+import argparse
+import statistics
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+from sklearn.model_selection import StratifiedKFold
+
+import train
+
+SWEEP_DIR = os.path.join(train.HERE, "sweeps")
+
+SEARCH_SPACE = {
+    "units": [[32, 16], [64, 32], [64, 32, 16], [128, 64, 32], [256, 128, 64]],
+    "dropout": [0.1, 0.2, 0.3, 0.5],
+    "l2": [0.0, 0.0001, 0.001, 0.01],
+    "learning_rate": [0.0003, 0.0005, 0.001, 0.003],
+    "batch_norm": [False, True],
+}
+MIN_TRIALS_BEFORE_PRUNING = 3
+
+def sample_hparams(name: str, rng: random.Random) -> dict:
+    hp = dict(train.DISEASES[name]["model"])
+    hp["units"] = list(rng.choice(SEARCH_SPACE["units"]))
+    first = rng.choice(SEARCH_SPACE["dropout"])
+    # taper dropout towards the output, like the hand-tuned 0.5/0.4/0.3
+    hp["dropout"] = [round(max(0.0, first - 0.1 * i), 2) for i in range(len(hp["units"]))]
+    hp["l2"] = rng.choice(SEARCH_SPACE["l2"])
+    hp["learning_rate"] = rng.choice(SEARCH_SPACE["learning_rate"])
+    hp["batch_norm"] = rng.choice(SEARCH_SPACE["batch_norm"])
+    return hp
+
+# ---------------------------------------------------------------------
+# Cached folds
+# ---------------------------------------------------------------------
+def prepare_folds(name: str, k: int, seed: int = train.SEED, use_cache: bool = True):
+    """Write (or reuse) one npz per fold: preprocessed train (SMOTE), early-stopping
+    (train.split_validation) and held-out fold arrays."""
+    key = train.cache_key(name, "cv", k, seed, train.VAL_SIZE)
+    paths = [os.path.join(train.CACHE_DIR, f"{name}-{key}-cv{k}-fold{i}.npz") for i in range(k)]
+    if use_cache and all(os.path.exists(p) for p in paths):
+        return paths
+
+    X, y = train.load_clean(name, use_cache)
+    os.makedirs(train.CACHE_DIR, exist_ok=True)
+    skf = StratifiedKFold(n_splits=k, shuffle=True, random_state=seed)
+    for path, (tr, va) in zip(paths, skf.split(X, y)):
+        pre = train.build_preprocessor(name, X.columns.tolist())
+        X_tr = pre.fit_transform(X.iloc[tr])
+        X_va = pre.transform(X.iloc[va])
+        X_fit, X_es, y_fit, y_es = train.split_validation(X_tr, y.iloc[tr], seed)
+        X_res, y_res = train.smote(X_fit, y_fit, seed)
+        np.savez(path, X_train=np.asarray(X_res, dtype=np.float32), y_train=np.asarray(y_res),
+                 X_val=np.asarray(X_es, dtype=np.float32), y_val=np.asarray(y_es),
+                 X_test=np.asarray(X_va, dtype=np.float32), y_test=np.asarray(y.iloc[va]))
+    return paths
+
+# ---------------------------------------------------------------------
+# One trial (runs in a worker process)
+# ---------------------------------------------------------------------
+def _measure_latency(model, X: np.ndarray, repeats: int = 50):
+    row = X[:1]
+    batch = np.repeat(X, int(np.ceil(256 / len(X))), axis=0)[:256]
+    model(row, training=False)  # warm-up / trace
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        model(row, training=False)
+    per_row = (time.perf_counter() - t0) / repeats
+    model(batch, training=False)
+    t0 = time.perf_counter()
+    for _ in range(max(5, repeats // 5)):
+        model(batch, training=False)
+    per_batch = (time.perf_counter() - t0) / max(5, repeats // 5)
+    return per_row * 1000, per_batch * 1000
+
+def _threshold(progress, name: str, trial_id: int, fold: int):
+    """Median running F1 at `fold` over the other trials of `name` that have reached it
+    (None until MIN_TRIALS_BEFORE_PRUNING have)."""
+    seen = [f1 for (n, t, i), f1 in progress.items() if n == name and i == fold and t != trial_id]
+    return statistics.median(seen) if len(seen) >= MIN_TRIALS_BEFORE_PRUNING else None
+
+def run_trial(name: str, trial_id: int, hp: dict, fold_paths, progress, threads: int):
+    from sklearn.metrics import precision_score, recall_score, f1_score, roc_auc_score
+    train._configure_tf_threads(threads)
+    train.seed_everything()
+
+    t0 = time.perf_counter()
+    folds, model, status = [], None, "complete"
+    for i, path in enumerate(fold_paths):
+        data = dict(np.load(path))
+        model = train.build_model(data["X_train"].shape[1], hp)
+        train.fit_model(model, data, hp)
+        prob = model.predict(data["X_test"], verbose=0).reshape(-1)
+        pred = (prob > 0.5).astype(int)
+        y = data["y_test"]
+        folds.append({
+            "precision": float(precision_score(y, pred, zero_division=0)),
+            "recall": float(recall_score(y, pred, zero_division=0)),
+            "f1": float(f1_score(y, pred, zero_division=0)),
+            "auc": float(roc_auc_score(y, prob)) if len(set(y)) > 1 else float("nan"),
+        })
+        running_f1 = statistics.mean(f["f1"] for f in folds)
+        progress[(name, trial_id, i)] = running_f1  # one key per trial and fold: no lost updates
+        if i < len(fold_paths) - 1:
+            threshold = _threshold(progress, name, trial_id, i)
+            if threshold is not None and running_f1 < threshold:
+                status = "pruned"
+                break
+
+    per_row_ms, per_batch_ms = _measure_latency(model, data["X_test"])
+    mean = lambda k: round(statistics.mean(f[k] for f in folds), 4)
+    return {
+        "disease": name,
+        "trial": trial_id,
+        "status": status,
+        "folds_run": len(folds),
+        "hyperparameters": hp,
+        "precision": mean("precision"),
+        "recall": mean("recall"),
+        "f1": mean("f1"),
+        "auc": mean("auc"),
+        "fold_f1": [round(f["f1"], 4) for f in folds],
+        "params": int(model.count_params()),
+        "latency_row_ms": round(per_row_ms, 3),
+        "latency_batch256_ms": round(per_batch_ms, 3),
+        "seconds": round(time.perf_counter() - t0, 1),
+    }
+
+# ---------------------------------------------------------------------
+# Scheduler
+# ---------------------------------------------------------------------
+def sweep(names, n_trials: int, k: int, jobs: int, threads: int, seed: int, max_epochs: int):
+    rng = random.Random(seed)
+    queue = []
+    for name in names:
+        fold_paths = prepare_folds(name, k, seed)
+        for t in range(n_trials):
+            hp = sample_hparams(name, rng)
+            if max_epochs:
+                hp["epochs"] = max_epochs
+            queue.append((name, t, hp, fold_paths))
+    queue.reverse()
+
+    results = []
+    ctx = mp.get_context("spawn")
+    with ctx.Manager() as manager, ProcessPoolExecutor(max_workers=jobs, mp_context=ctx) as pool:
+        progress = manager.dict()  # (disease, trial, fold index) -> running f1
+        running = {}
+
+        def submit():
+            name, t, hp, paths = queue.pop()
+            fut = pool.submit(run_trial, name, t, hp, paths, progress, threads)
+            running[fut] = (name, t)
+
+        while queue and len(running) < jobs:
+            submit()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name, t = running.pop(fut)
+                try:
+                    res = fut.result()
+                except Exception as e:
+                    print(f"❌ [{name}] trial {t} failed: {e}")
+                    continue
+                results.append(res)
+                print(f"{'✂️ ' if res['status'] == 'pruned' else '✅'} [{name}] trial {t}: f1={res['f1']} "
+                      f"recall={res['recall']} params={res['params']} row={res['latency_row_ms']}ms "
+                      f"({res['status']}, {res['folds_run']}/{k} folds)")
+                if queue:
+                    submit()
+    return results
+
+def write_leaderboard(results, out_dir: str):
+    os.makedirs(out_dir, exist_ok=True)
+    ranked = sorted(results, key=lambda r: (r["disease"], r["status"] != "complete", -r["f1"], r["latency_row_ms"]))
+    with open(os.path.join(out_dir, "leaderboard.json"), "w") as f:
+        json.dump(ranked, f, indent=2)
+    fields = ["disease", "trial", "status", "folds_run", "f1", "precision", "recall", "auc",
+              "params", "latency_row_ms", "latency_batch256_ms", "seconds", "hyperparameters"]
+    with open(os.path.join(out_dir, "leaderboard.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for r in ranked:
+            writer.writerow({k: json.dumps(r[k]) if k == "hyperparameters" else r[k] for k in fields})
+    return ranked
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep with stratified k-fold CV.")
+    parser.add_argument("--diseases", default=",".join(train.DISEASES))
+    parser.add_argument("--trials", type=int, default=20, help="trials per disease")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--threads-per-job", type=int, default=None)
+    parser.add_argument("--max-epochs", type=int, default=None, help="cap epochs per fold")
+    parser.add_argument("--seed", type=int, default=train.SEED)
+    parser.add_argument("--out", default=None, help="output directory (default: sweeps/<timestamp>)")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.diseases.split(",") if n.strip()]
+    threads = args.threads_per_job or max(1, (os.cpu_count() or 1) // args.jobs)
+    train.configure_threads(threads)
+    out_dir = args.out or os.path.join(SWEEP_DIR, time.strftime("%Y%m%d-%H%M%S"))
+
+    t0 = time.perf_counter()
+    results = sweep(names, args.trials, args.folds, args.jobs, threads, args.seed, args.max_epochs)
+    ranked = write_leaderboard(results, out_dir)
+    print(f"\n🏁 {len(results)} trials in {time.perf_counter() - t0:.1f}s → {out_dir}")
+    for name in names:
+        best = next((r for r in ranked if r["disease"] == name and r["status"] == "complete"), None)
+        if best:
+            print(f"   {name}: f1={best['f1']} precision={best['precision']} recall={best['recall']} "
+                  f"params={best['params']} row={best['latency_row_ms']}ms units={best['hyperparameters']['units']}")
@@ -0,0 +1,377 @@
+# model_training/train.py
+"""
+Unified trainer for the five disease models.
+
+Each disease is one entry in DISEASES (CSV, cleaning function, feature groups, network
+hyperparameters) reproducing the original Colab scripts (cad2.py, heart_attak.py,
+heart_failure.py, hypertension.py, stroke.py). Cleaned frames and the split + SMOTE
+arrays are cached under model_training/.cache/, keyed by a hash of the CSV bytes, the
+config and the cleaning code, so re-runs skip CSV parsing, preprocessing and SMOTE.
+
+Artifacts go straight into the layout load_all_models() expects:
+    backend/models/{disease}/{disease}_model.keras
+    backend/models/{disease}/{disease}_preprocessor.joblib
+    backend/models/{disease}/{disease}_columns.json
+    backend/models/{disease}/{disease}_training.json   (metrics + training cost)
+
+Usage (from model_training/):
+    python train.py                          # all five, in parallel
+    python train.py --diseases cad,stroke --jobs 2 --threads-per-job 2
+"""
+import os
+import json
+import time
+import random
+import hashlib
+import inspect
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing as mp
+
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.impute import SimpleImputer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(HERE, "models")
+CACHE_DIR = os.path.join(HERE, ".cache")
+BACKEND_MODELS_DIR = os.path.join(HERE, "..", "backend", "models")
+SEED = 42
+# share of each training split held out (before SMOTE) for early stopping
+VAL_SIZE = 0.1
+
+# ---------------------------------------------------------------------
+# Cleaning rules (one per dataset, same as the original scripts)
+# ---------------------------------------------------------------------
+def clean_cad(df):
+    df['target'] = (df.pop('Cath') == 'Cad').astype(int)
+    df = df.rename(columns={
+        'DM': 'diabetes', 'HTN': 'hypertension', 'Current Smoker': 'smokes',
+        'EX-Smoker': 'formerly_smoked', 'BP': 'systolic_bp', 'PR': 'heart_rate',
+        'Typical Chest Pain': 'typical_angina', 'Atypical': 'atypical_angina',
+        'Nonanginal': 'non_anginal_pain', 'TG': 'triglycerides', 'Sex': 'sex'
+    }).drop(columns=['Weight', 'Length'])
+    binary_map = {'Y': 1, 'N': 0, 'Male': 1, 'Fmale': 0}
+    for col in ['sex', 'Obesity', 'CRF', 'CVA', 'Airway disease', 'Thyroid Disease', 'CHF', 'DLP',
+                'Weak Peripheral Pulse', 'Lung rales', 'Systolic Murmur', 'Diastolic Murmur', 'Dyspnea',
+                'atypical_angina', 'non_anginal_pain', 'Exertional CP', 'LowTH Ang', 'LVH', 'Poor R Progression']:
+        df[col] = df[col].map(binary_map)
+    df['ldl_hdl_ratio'] = df['LDL'] / (df['HDL'] + 1e-6)
+    df['BBB'] = df['BBB'].replace('N', 'None')
+    return df
+
+def clean_heart_attack(df):
+    df = df.rename(columns={
+        'Gender': 'sex', 'Heart rate': 'heart_rate', 'Systolic blood pressure': 'systolic_bp',
+        'Diastolic blood pressure': 'diastolic_bp', 'Blood sugar': 'blood_sugar', 'Result': 'target'
+    })
+    df['target'] = (df['target'].str.lower() == 'positive').astype(int)
+    return df
+
+def clean_heart_failure(df):
+    df['Sex'] = (df['Sex'] == 'M').astype(int)
+    df['ExerciseAngina'] = (df['ExerciseAngina'] == 'Y').astype(int)
+    return df.rename(columns={
+        'ChestPainType': 'chest_pain_type', 'RestingBP': 'resting_bp', 'Cholesterol': 'cholesterol',
+        'FastingBS': 'fasting_bs', 'RestingECG': 'resting_ecg', 'MaxHR': 'max_hr',
+        'ExerciseAngina': 'exercise_angina', 'Oldpeak': 'oldpeak', 'ST_Slope': 'st_slope'
+    })
+
+def clean_hypertension(df):
+    df = df.rename(columns={
+        'male': 'sex', 'age': 'Age', 'currentSmoker': 'smokes', 'BPMeds': 'BP_Medications',
+        'totChol': 'cholesterol', 'sysBP': 'systolic_bp', 'diaBP': 'diastolic_bp',
+        'heartRate': 'heart_rate', 'glucose': 'glucose_level', 'Risk': 'target'
+    })
+    for col in ['cigsPerDay', 'cholesterol', 'BMI', 'heart_rate', 'glucose_level']:
+        df[col] = df[col].fillna(df[col].median())
+    df['BP_Medications'] = df['BP_Medications'].fillna(df['BP_Medications'].mode()[0])
+    return df
+
+def clean_stroke(df):
+    df = df.drop(columns=['ID'], errors='ignore')
+    df = df[df['Sex'] != 'Other'].copy()
+    df['Sex'] = (df['Sex'] == 'Male').astype(int)
+    df['Age'] = np.ceil(df['Age']).astype(int)
+    df['Married'] = (df['Married'] == 'Yes').astype(int)
+    return df.rename(columns={
+        'Heart_disease': 'heart_disease', 'Glucose_level': 'glucose_level',
+        'Smoking_status': 'smoking_status', 'Work_type': 'work_type',
+        'Residence_type': 'residence_type', 'Target': 'target'
+    })
+
+# ---------------------------------------------------------------------
+# Per-disease configuration
+# ---------------------------------------------------------------------
+_MLP = {"units": [128, 64, 32], "dropout": [0.5, 0.4, 0.3], "l2": 0.001, "batch_norm": False,
+        "learning_rate": 0.001, "batch_size": 32, "epochs": 200, "patience": 15, "lr_patience": 5}
+
+DISEASES = {
+    "cad": {
+        "csv": "CAD.csv",
+        "clean": clean_cad,
+        "preprocess": "column_transformer",
+        "numerical": ['Age', 'BMI', 'systolic_bp', 'heart_rate', 'Function Class', 'FBS', 'CR',
+                      'triglycerides', 'LDL', 'HDL', 'BUN', 'ESR', 'HB', 'K', 'Na', 'WBC',
+                      'Lymph', 'Neut', 'PLT', 'EF-TTE', 'Region RWMA', 'ldl_hdl_ratio'],
+        "categorical": ['VHD', 'BBB'],
+        "impute_numerical": False,
+        "model": dict(_MLP, batch_size=16, patience=20, lr_patience=7),
+    },
+    "heart_attack": {
+        "csv": "Medicaldataset (1).csv",
+        "clean": clean_heart_attack,
+        "preprocess": "scaler",
+        "model": dict(_MLP, batch_norm=True, learning_rate=0.0005, patience=20, lr_patience=7),
+    },
+    "heart_failure": {
+        "csv": "heartfailure1.csv",
+        "clean": clean_heart_failure,
+        "preprocess": "column_transformer",
+        "numerical": ['Age', 'resting_bp', 'cholesterol', 'max_hr', 'oldpeak'],
+        "categorical": ['chest_pain_type', 'resting_ecg', 'st_slope'],
+        "impute_numerical": True,
+        "model": dict(_MLP),
+    },
+    "hypertension": {
+        "csv": "Hypertension-risk-model-main.csv",
+        "clean": clean_hypertension,
+        "preprocess": "scaler",
+        "model": dict(_MLP, batch_norm=True, learning_rate=0.0005, patience=20, lr_patience=7),
+    },
+    "stroke": {
+        "csv": "Stroke1.csv",
+        "clean": clean_stroke,
+        "preprocess": "column_transformer",
+        "numerical": ['Age', 'glucose_level', 'BMI'],
+        "categorical": ['work_type', 'residence_type', 'smoking_status'],
+        "impute_numerical": True,
+        "model": dict(_MLP),
+    },
+}
+
+# ---------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------
+def cache_key(name: str, *extra) -> str:
+    """Hash of the CSV bytes, the config (incl. cleaning code) and any extra stage params."""
+    cfg = DISEASES[name]
+    h = hashlib.sha256()
+    with open(os.path.join(DATA_DIR, cfg["csv"]), "rb") as f:
+        h.update(f.read())
+    h.update(inspect.getsource(cfg["clean"]).encode())
+    h.update(json.dumps({k: v for k, v in cfg.items() if k not in {"clean", "model"}}, sort_keys=True).encode())
+    h.update(json.dumps(extra, sort_keys=True, default=str).encode())
+    return h.hexdigest()[:16]
+
+def load_clean(name: str, use_cache: bool = True):
+    """Return (X, y) for a disease after its cleaning rules."""
+    path = os.path.join(CACHE_DIR, f"{name}-{cache_key(name)}-clean.pkl")
+    if use_cache and os.path.exists(path):
+        df = pd.read_pickle(path)
+    else:
+        cfg = DISEASES[name]
+        df = cfg["clean"](pd.read_csv(os.path.join(DATA_DIR, cfg["csv"])))
+        if use_cache:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            df.to_pickle(path)
+    return df.drop(columns="target"), df["target"].astype(int)
+
+def build_preprocessor(name: str, columns):
+    cfg = DISEASES[name]
+    if cfg["preprocess"] == "scaler":
+        return StandardScaler()
+    num, cat = cfg["numerical"], cfg["categorical"]
+    num_steps = ([('imputer', SimpleImputer(strategy='median'))] if cfg["impute_numerical"] else []) + \
+                [('scaler', StandardScaler())]
+    return ColumnTransformer(transformers=[
+        ('num', Pipeline(steps=num_steps), num),
+        ('cat', Pipeline(steps=[('onehot', OneHotEncoder(handle_unknown='ignore', drop='first'))]), cat),
+        ('pass', 'passthrough', [c for c in columns if c not in num + cat]),
+    ])
+
+def smote(X, y, seed: int = SEED):
+    from imblearn.over_sampling import SMOTE
+    return SMOTE(random_state=seed).fit_resample(X, y)
+
+def split_validation(X_train, y_train, seed: int = SEED, val_size: float = VAL_SIZE):
+    """(X_fit, X_val, y_fit, y_val): the early-stopping set comes out of the training
+    rows, before SMOTE, so the test split / CV fold is only used for evaluation."""
+    return train_test_split(X_train, y_train, test_size=val_size, random_state=seed, stratify=y_train)
+
+def prepare_dataset(name: str, use_cache: bool = True, test_size: float = 0.2, seed: int = SEED):
+    """Cleaned, split, preprocessed and SMOTE-resampled arrays (+ the fitted preprocessor)."""
+    key = cache_key(name, "split", test_size, seed, VAL_SIZE)
+    arrays_path = os.path.join(CACHE_DIR, f"{name}-{key}-split.npz")
+    preproc_path = os.path.join(CACHE_DIR, f"{name}-{key}-preprocessor.joblib")
+    X, y = load_clean(name, use_cache)
+    if use_cache and os.path.exists(arrays_path) and os.path.exists(preproc_path):
+        data = dict(np.load(arrays_path))
+        data["preprocessor"] = joblib.load(preproc_path)
+        data["columns"] = X.columns.tolist()
+        data["cache_hit"] = True
+        return data
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=seed, stratify=y)
+    preprocessor = build_preprocessor(name, X.columns.tolist())
+    X_train_p = preprocessor.fit_transform(X_train)
+    X_test_p = preprocessor.transform(X_test)
+    X_fit, X_val, y_fit, y_val = split_validation(X_train_p, y_train, seed)
+    X_res, y_res = smote(X_fit, y_fit, seed)
+    data = {
+        "X_train": np.asarray(X_res, dtype=np.float32), "y_train": np.asarray(y_res),
+        "X_val": np.asarray(X_val, dtype=np.float32), "y_val": np.asarray(y_val),
+        "X_test": np.asarray(X_test_p, dtype=np.float32), "y_test": np.asarray(y_test),
+    }
+    if use_cache:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        np.savez(arrays_path, **data)
+        joblib.dump(preprocessor, preproc_path)
+    data.update(preprocessor=preprocessor, columns=X.columns.tolist(), cache_hit=False)
+    return data
+
+# ---------------------------------------------------------------------
+# Model
+# ---------------------------------------------------------------------
+def configure_threads(threads: int):
+    """Cap BLAS/TensorFlow thread pools. The env vars only affect processes started
+    afterwards (worker processes inherit them); TensorFlow is also configured directly."""
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "TF_NUM_INTRAOP_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+def _configure_tf_threads(threads: int):
+    import tensorflow as tf
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except RuntimeError:
+        pass  # already initialised in this process
+
+def seed_everything(seed: int = SEED):
+    import tensorflow as tf
+    os.environ['PYTHONHASHSEED'] = str(seed)
+    random.seed(seed)
+    np.random.seed(seed)
+    tf.random.set_seed(seed)
+
+def build_model(n_features: int, hp: dict):
+    import tensorflow as tf
+    layers = [tf.keras.layers.Input(shape=(n_features,))]
+    for units, rate in zip(hp["units"], hp["dropout"]):
+        reg = tf.keras.regularizers.l2(hp["l2"])
+        if hp["batch_norm"]:
+            layers += [tf.keras.layers.Dense(units, kernel_regularizer=reg),
+                       tf.keras.layers.BatchNormalization(),
+                       tf.keras.layers.Activation('relu')]
+        else:
+            layers.append(tf.keras.layers.Dense(units, activation='relu', kernel_regularizer=reg))
+        layers.append(tf.keras.layers.Dropout(rate))
+    layers.append(tf.keras.layers.Dense(1, activation='sigmoid'))
+    model = tf.keras.models.Sequential(layers)
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=hp["learning_rate"]),
+        loss='binary_crossentropy',
+        metrics=['accuracy', tf.keras.metrics.Precision(name='precision'), tf.keras.metrics.Recall(name='recall')]
+    )
+    return model
+
+def fit_model(model, data: dict, hp: dict, verbose: int = 0):
+    import tensorflow as tf
+    callbacks = [
+        tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=hp["patience"], restore_best_weights=True),
+        tf.keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.2, patience=hp["lr_patience"], min_lr=0.00001),
+    ]
+    return model.fit(
+        data["X_train"], data["y_train"],
+        epochs=hp["epochs"], batch_size=hp["batch_size"],
+        validation_data=(data["X_val"], data["y_val"]),
+        callbacks=callbacks, verbose=verbose,
+    )
+
+# ---------------------------------------------------------------------
+# One disease, end to end
+# ---------------------------------------------------------------------
+def save_artifacts(name: str, model, preprocessor, columns, out_dir: str, metadata: dict = None):
+    target = os.path.join(out_dir, name)
+    os.makedirs(target, exist_ok=True)
+    model.save(os.path.join(target, f"{name}_model.keras"))
+    joblib.dump(preprocessor, os.path.join(target, f"{name}_preprocessor.joblib"))
+    with open(os.path.join(target, f"{name}_columns.json"), "w") as f:
+        json.dump(list(columns), f)
+    if metadata is not None:
+        with open(os.path.join(target, f"{name}_training.json"), "w") as f:
+            json.dump(metadata, f, indent=2)
+    return target
+
+def train_one(name: str, out_dir: str = BACKEND_MODELS_DIR, use_cache: bool = True,
+              threads: int = None, epochs: int = None, verbose: int = 0):
+    if threads:
+        _configure_tf_threads(threads)
+    seed_everything()
+    t0 = time.perf_counter()
+    data = prepare_dataset(name, use_cache)
+    t_data = time.perf_counter() - t0
+
+    hp = dict(DISEASES[name]["model"])
+    if epochs:
+        hp["epochs"] = epochs
+    model = build_model(data["X_train"].shape[1], hp)
+    history = fit_model(model, data, hp, verbose)
+    t_fit = time.perf_counter() - t0 - t_data
+
+    loss, acc, precision, recall = model.evaluate(data["X_test"], data["y_test"], verbose=0)
+    metadata = {
+        "disease": name,
+        "hyperparameters": hp,
+        "dataset_cache_hit": bool(data["cache_hit"]),
+        "train_rows": int(len(data["y_train"])),
+        "val_rows": int(len(data["y_val"])),
+        "epochs_run": len(history.history["loss"]),
+        "data_seconds": round(t_data, 2),
+        "fit_seconds": round(t_fit, 2),
+        "test": {"loss": float(loss), "accuracy": float(acc), "precision": float(precision), "recall": float(recall)},
+    }
+    target = save_artifacts(name, model, data["preprocessor"], data["columns"], out_dir, metadata)
+    print(f"✅ [{name}] acc={acc:.4f} precision={precision:.4f} recall={recall:.4f} "
+          f"({metadata['epochs_run']} epochs, {t_fit:.1f}s) → {target}")
+    return metadata
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the disease models into backend/models/.")
+    parser.add_argument("--diseases", default=",".join(DISEASES), help="comma-separated subset")
+    parser.add_argument("--jobs", type=int, default=None, help="parallel worker processes (default: one per disease)")
+    parser.add_argument("--threads-per-job", type=int, default=None, help="BLAS/TF threads per worker")
+    parser.add_argument("--out", default=BACKEND_MODELS_DIR)
+    parser.add_argument("--epochs", type=int, default=None, help="override max epochs (e.g. for smoke runs)")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.diseases.split(",") if n.strip()]
+    unknown = set(names) - set(DISEASES)
+    if unknown:
+        parser.error(f"unknown disease(s): {sorted(unknown)}")
+    jobs = max(1, min(args.jobs or len(names), len(names)))
+    threads = args.threads_per_job or max(1, (os.cpu_count() or 1) // jobs)
+
+    configure_threads(threads)  # inherited by the spawned workers before they import numpy/TF
+    print(f"🚀 Training {names} with {jobs} worker(s) × {threads} thread(s)")
+    t0 = time.perf_counter()
+    if jobs == 1:
+        results = [train_one(n, args.out, not args.no_cache, threads, args.epochs) for n in names]
+    else:
+        results = []
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=mp.get_context("spawn")) as pool:
+            futures = {pool.submit(train_one, n, args.out, not args.no_cache, threads, args.epochs): n for n in names}
+            for fut in as_completed(futures):
+                try:
+                    results.append(fut.result())
+                except Exception as e:
+                    print(f"❌ [{futures[fut]}] training failed: {e}")
+    print(f"🏁 Done: {len(results)}/{len(names)} models in {time.perf_counter() - t0:.1f}s")